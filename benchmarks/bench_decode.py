@@ -0,0 +1,73 @@
+"""
+Benchmark of response validation on large batch payloads
+
+Compares the previous two-pass validation (response.text, then
+response.json()) with the single-pass decoding of the raw body used by
+_IEXBase._validate_response, for each installed JSON decoder.
+
+Usage: python benchmarks/bench_decode.py [number of symbols]
+"""
+import json
+import sys
+import timeit
+
+import requests
+
+from iexfinance.base import _IEXBase
+from iexfinance.stock import StockReader
+from iexfinance.utils.decoders import _DECODERS
+
+
+def make_batch_payload(n_symbols):
+    quote = dict(("field%d" % i, i * 1.5) for i in range(40))
+    quote.update(symbol="AAPL", companyName="Apple Inc.", sector="Tech")
+    chart = [{"date": "2018-01-%02d" % d, "open": 1.0, "high": 2.0,
+              "low": 0.5, "close": 1.5, "volume": 1000} for d in range(1, 22)]
+    news = [{"headline": "Headline " * 5, "summary": "Summary " * 40,
+             "url": "https://example.com/news"} for _ in range(10)]
+    endpoint = {"chart": chart, "news": news}
+    data = {}
+    for n in range(n_symbols):
+        data["SYM%d" % n] = dict((e, endpoint.get(e, quote))
+                                 for e in StockReader._ENDPOINTS)
+    return json.dumps(data).encode("utf-8")
+
+
+def make_response(content):
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = content
+    return response
+
+
+def two_pass(content):
+    response = make_response(content)
+    if response.text == "Unknown symbol":
+        raise ValueError()
+    json_response = response.json()
+    if "Error Message" in json_response:
+        raise ValueError()
+    return json_response
+
+
+def main(n_symbols=100, repeat=5):
+    content = make_batch_payload(n_symbols)
+    print("Payload: %d symbols, %.1f MB" % (n_symbols, len(content) / 1e6))
+    timings = [("two-pass (previous)",
+                min(timeit.repeat(lambda: two_pass(content), number=1,
+                                  repeat=repeat)))]
+    for name, factory in _DECODERS:
+        try:
+            reader = _IEXBase(json_decoder=factory())
+        except ImportError:
+            continue
+        timings.append(("single-pass " + name, min(timeit.repeat(
+            lambda: reader._validate_response(make_response(content)),
+            number=1, repeat=repeat))))
+    baseline = timings[0][1]
+    for name, best in timings:
+        print("%-26s %8.1f ms  %5.2fx" % (name, best * 1e3, baseline / best))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,292 @@
+"""
+Benchmarks of the parsing and formatting hot paths
+
+Measures, at several universe sizes (number of symbols):
+
+- stock_refresh: StockReader.refresh, i.e. decoding and merging the two
+  all-endpoint batch responses
+- stock_dataframe: the output_format decorator building a typed DataFrame
+  (StockReader.get_quote with pandas output), including the field index
+- stock_dataframe_legacy: the same with the former implementation, building
+  the frame from the dict of quotes and transposing it to a row per symbol
+- historical_json / historical_pandas: HistoricalReader._output_format,
+  including the date slicing
+- historical_json_legacy / historical_pandas_legacy: the same with the
+  former implementation, building a DataFrame per symbol, slicing it by
+  date labels and converting JSON output with to_dict('index')
+- historical_long: the same with layout="long", building a single frame
+  indexed by (symbol, date)
+- monthly_fetch: MonthlySummaryReader.fetch and the concatenation of its
+  monthly DataFrames (the size is the number of rows per month)
+
+Responses are synthetic (see iexfinance.utils.standin) or replayed from a
+cassette recorded with iexfinance.utils.replay, and are served from memory
+so that no network time is included. Each case reports its best wall time,
+and the peak memory and net allocated blocks of one traced run
+(tracemalloc). Results are written as JSON; passing a previous results file
+with --compare reports the change of each measurement.
+
+Usage: python benchmarks/bench_hotpaths.py [--sizes 1,10,100,8000]
+           [--repeat 3] [--output results.json] [--compare old.json]
+           [--cassette cassette.json]
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import iexfinance
+from iexfinance.stats import MonthlySummaryReader
+from iexfinance.stock import HistoricalReader, StockReader
+from iexfinance.utils import _BufferedResponse
+from iexfinance.utils.ratelimit import RateLimiter
+from iexfinance.utils.replay import Cassette
+from iexfinance.utils.standin import StandInServer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_clock = getattr(time, "perf_counter", time.time)
+
+
+class PayloadSession(object):
+    """
+    Session serving pre-encoded responses from memory: recorded ones if a
+    cassette is given, synthetic ones otherwise
+    """
+    def __init__(self, server, cassette=None):
+        self.server = server
+        self.cassette = cassette
+        self._bodies = {}
+
+    def get(self, url=None, **kwargs):
+        body = self._bodies.get(url)
+        if body is None:
+            recorded = self.cassette and self.cassette.play(url)
+            if recorded:
+                body = recorded[2]
+            else:
+                body = json.dumps(self.server.payload(url)).encode("utf-8")
+            self._bodies[url] = body
+        return _BufferedResponse(body)
+
+
+def reader_options(session):
+    # Readers bypass the caches and are never throttled
+    return dict(session=session, cache=False, disk_cache=False,
+                coalesce=False, rate_limiter=RateLimiter(rate=10 ** 9))
+
+
+def symbols(n):
+    return ["SYM%d" % i for i in range(n)]
+
+
+def case_stock_refresh(n, cassette):
+    session = PayloadSession(StandInServer(), cassette)
+    reader = StockReader(symbols(n), **reader_options(session))
+    return reader.refresh
+
+
+def case_stock_dataframe(n, cassette):
+    session = PayloadSession(StandInServer(), cassette)
+    reader = StockReader(symbols(n), output_format="pandas",
+                         **reader_options(session))
+
+    def get_quote():
+        # As after a download, the field index is built again
+        reader._indexes = {}
+        return reader.get_quote()
+    return get_quote
+
+
+def case_stock_dataframe_legacy(n, cassette):
+    session = PayloadSession(StandInServer(), cassette)
+    reader = StockReader(symbols(n), **reader_options(session))
+
+    def get_quote():
+        # Former output_format decorator, for reference
+        quotes = dict((symbol, data["quote"]) for symbol, data in
+                      reader.data_set.items())
+        return pd.DataFrame(quotes).T
+    return get_quote
+
+
+def legacy_output_format(reader, out):
+    """
+    Former HistoricalReader._output_format ("dict" layout), for reference
+    """
+    result = {}
+    for symbol in reader.symlist:
+        df = pd.DataFrame(out.pop(symbol)["chart"])
+        df.set_index("date", inplace=True)
+        df = df[["open", "high", "low", "close", "volume"]]
+        df = df.loc[reader.start.strftime('%Y-%m-%d'):
+                    reader.end.strftime('%Y-%m-%d')]
+        result[symbol] = df
+    if reader.output_format == "pandas":
+        return result if len(result) > 1 else result[reader.symbols]
+    for symbol in list(result):
+        result[symbol] = result[symbol].to_dict('index')
+    return result
+
+
+def _historical_case(n, cassette, output_format, layout="dict",
+                     legacy=False):
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    syms = symbols(n) if n > 1 else "SYM0"
+    reader = HistoricalReader(syms, start, end, output_format, layout=layout,
+                              **reader_options(None))
+    # One month of bars per symbol
+    server = StandInServer(records=21)
+    recorded = cassette and cassette.play(reader._prepare_query())
+    if recorded:
+        payload = json.loads(recorded[2].decode("utf-8"))
+    else:
+        payload = server.payload(reader._prepare_query())
+    # _output_format consumes the top level of its input
+    if legacy:
+        return lambda: legacy_output_format(reader, dict(payload))
+    return lambda: reader._output_format(dict(payload))
+
+
+def case_historical_json(n, cassette):
+    return _historical_case(n, cassette, "json")
+
+
+def case_historical_pandas(n, cassette):
+    return _historical_case(n, cassette, "pandas")
+
+
+def case_historical_json_legacy(n, cassette):
+    return _historical_case(n, cassette, "json", legacy=True)
+
+
+def case_historical_pandas_legacy(n, cassette):
+    return _historical_case(n, cassette, "pandas", legacy=True)
+
+
+def case_historical_long(n, cassette):
+    return _historical_case(n, cassette, "pandas", "long")
+
+
+def case_monthly_fetch(n, cassette):
+    session = PayloadSession(StandInServer(records=n), cassette)
+    year = datetime.now().year - 1
+    reader = MonthlySummaryReader(datetime(year, 1, 1), datetime(year, 12, 31),
+                                  output_format="pandas",
+                                  **reader_options(session))
+    return reader.fetch
+
+
+CASES = [
+    ("stock_refresh", case_stock_refresh),
+    ("stock_dataframe", case_stock_dataframe),
+    ("stock_dataframe_legacy", case_stock_dataframe_legacy),
+    ("historical_json", case_historical_json),
+    ("historical_pandas", case_historical_pandas),
+    ("historical_json_legacy", case_historical_json_legacy),
+    ("historical_pandas_legacy", case_historical_pandas_legacy),
+    ("historical_long", case_historical_long),
+    ("monthly_fetch", case_monthly_fetch),
+]
+
+
+def measure(func, repeat):
+    func()  # Warm-up: fills the payload caches
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = _clock()
+        func()
+        timings.append(_clock() - start)
+    result = {"best": min(timings), "mean": sum(timings) / len(timings)}
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        result["peak_memory"] = peak
+        result["allocated_blocks"] = sum(s.count_diff for s in stats)
+    return result
+
+
+def environment():
+    return {
+        "iexfinance": iexfinance.__version__,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def compare(results, previous):
+    print("\nChange against previous results (best time, peak memory):")
+    for case, sizes in sorted(results["cases"].items()):
+        for size, current in sorted(sizes.items(), key=lambda x: int(x[0])):
+            old = previous.get("cases", {}).get(case, {}).get(size)
+            if old is None:
+                continue
+            line = "%-24s %6s  time %+6.1f%%" % (
+                case, size, 100.0 * (current["best"] / old["best"] - 1))
+            if old.get("peak_memory") and current.get("peak_memory"):
+                line += "  memory %+6.1f%%" % (100.0 * (
+                    float(current["peak_memory"]) / old["peak_memory"] - 1))
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="1,10,100,8000",
+                        help="comma-separated numbers of symbols")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", default=None,
+                        help="comma-separated case names (default: all)")
+    parser.add_argument("--output", default="bench_hotpaths.json",
+                        help="JSON file receiving the results")
+    parser.add_argument("--compare", default=None,
+                        help="previous results file to compare against")
+    parser.add_argument("--cassette", default=None,
+                        help="cassette of recorded responses to replay")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    names = args.cases.split(",") if args.cases else [c[0] for c in CASES]
+    cassette = Cassette(args.cassette) if args.cassette else None
+    results = {"environment": environment(), "cases": {}}
+    for name, factory in CASES:
+        if name not in names:
+            continue
+        for n in sizes:
+            result = measure(factory(n, cassette), args.repeat)
+            results["cases"].setdefault(name, {})[str(n)] = result
+            print("%-24s %6d  %10.2f ms  peak %8.1f MB  blocks %9s" % (
+                name, n, result["best"] * 1e3,
+                result.get("peak_memory", 0) / 1e6,
+                result.get("allocated_blocks", "-")))
+            sys.stdout.flush()
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    print("Results written to " + args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return results
+
+
+if __name__ == '__main__':
+    main()
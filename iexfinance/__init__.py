@@ -1,12 +1,25 @@
+import sys
+
 from .base import _IEXBase
 from .stock import StockReader, HistoricalReader
 from .market import TOPS, Last, DEEP, Book
 from .stats import (IntradayReader, RecentReader, RecordsReader,
                     DailySummaryReader, MonthlySummaryReader)
 from .ref import CorporateActions, Dividends, NextDay, ListedSymbolDir
+from .executor import ReaderExecutor, fetch_readers  # noqa: F401
 
 from .utils.exceptions import IEXQueryError
 
+if sys.version_info >= (3, 5):
+    from .aio import (  # noqa: F401
+        get_historical_data_async, get_available_symbols_async,
+        get_iex_corporate_actions_async, get_iex_dividends_async,
+        get_iex_next_day_ex_date_async, get_iex_listed_symbol_dir_async,
+        get_market_tops_async, get_market_last_async, get_market_deep_async,
+        get_market_book_async, get_stats_intraday_async,
+        get_stats_recent_async, get_stats_records_async,
+        get_stats_daily_async, get_stats_monthly_async)
+
 __author__ = 'Addison Lynch'
 __version__ = '0.3.0'
 
@@ -25,13 +38,15 @@ def Stock(symbols=None, displayPercent=False, _range="1m", last=10,
     Parameters
     ----------
     symbols: str or list
-        A string or list of strings that are valid symbols
+        A string or list of strings that are valid symbols. Lists of more
+        than 100 symbols are downloaded in concurrent batches of 100
     displayPercent: bool
     _range: str
     last: int
     output_format: str
     kwargs:
-        Additional request options
+        Additional request options. lazy=True defers downloads until the
+        get_* methods are called, and only downloads the endpoints they need
 
     Returns
     -------
@@ -47,8 +62,6 @@ def Stock(symbols=None, displayPercent=False, _range="1m", last=10,
     elif type(symbols) is list:
         if not symbols:
             raise ValueError("Please input a symbol or list of symbols")
-        if len(symbols) > 100:
-            raise ValueError("Invalid symbol list. Maximum 100 symbols.")
         else:
             inst = StockReader(symbols, displayPercent, _range, last,
                                output_format, **kwargs)
@@ -100,7 +113,7 @@ def get_available_symbols(**kwargs):
     data: list
         List of dictionary reference items for each symbol
     """
-    _ALL_SYMBOLS_URL = "https://api.iextrading.com/1.0/ref-data/symbols"
+    _ALL_SYMBOLS_URL = _IEXBase._IEX_API_URL + "ref-data/symbols"
     handler = _IEXBase(**kwargs)
     response = handler._execute_iex_query(_ALL_SYMBOLS_URL)
     if not response:
@@ -0,0 +1,313 @@
+"""
+Asynchronous (asyncio) execution of IEX readers
+
+Requires Python 3.5+ and `aiohttp <https://docs.aiohttp.org>`__. Every reader
+exposes ``fetch_async`` (and StockReader ``refresh_async``), and each
+top-level ``get_*`` function of iexfinance has a ``get_*_async`` coroutine
+counterpart defined here.
+
+Requests are made through a single aiohttp session per event loop, sized
+from the shared transport settings (see
+``iexfinance.utils.configure_transport``). Sessions passed to readers with the
+``session`` keyword are only used by the synchronous methods.
+"""
+import asyncio
+import copy
+import weakref
+
+from iexfinance.base import _IEXBase
+from iexfinance.market import TOPS, Last, DEEP, Book
+from iexfinance.ref import (CorporateActions, Dividends, NextDay,
+                            ListedSymbolDir)
+from iexfinance.stats import (IntradayReader, RecentReader, RecordsReader,
+                              DailySummaryReader, MonthlySummaryReader)
+from iexfinance.stock import HistoricalReader
+from iexfinance.utils import _TRANSPORT_CONFIG, _BufferedResponse
+from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.metrics import (RequestEvent, _clock, endpoint_name,
+                                      get_metrics)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# aiohttp sessions, keyed by the event loop they are bound to
+_SESSIONS = weakref.WeakKeyDictionary()
+
+
+async def _on_connection_create_start(session, context, params):
+    context.connect_start = _clock()
+
+
+async def _on_connection_create_end(session, context, params):
+    event = context.trace_request_ctx
+    if event is not None:
+        event.connect += _clock() - context.connect_start
+
+
+# Futures of the requests in flight, keyed by (event loop, query key)
+_IN_FLIGHT = {}
+
+
+def _get_session():
+    """
+    Returns the aiohttp session bound to the current event loop, creating it
+    if needed
+    """
+    if aiohttp is None:
+        raise ImportError("aiohttp is required for asynchronous requests. "
+                          "Install it with: pip install aiohttp")
+    loop = asyncio.get_event_loop()
+    session = _SESSIONS.get(loop)
+    if session is None or session.closed:
+        config = _TRANSPORT_CONFIG
+        connector = aiohttp.TCPConnector(
+            limit=config["pool_connections"] * config["pool_maxsize"],
+            limit_per_host=config["pool_maxsize"],
+            force_close=not config["keep_alive"])
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(
+            _on_connection_create_start)
+        trace_config.on_connection_create_end.append(
+            _on_connection_create_end)
+        session = aiohttp.ClientSession(connector=connector,
+                                        trace_configs=[trace_config])
+        _SESSIONS[loop] = session
+    return session
+
+
+async def close_session():
+    """
+    Closes the aiohttp session bound to the current event loop. Should be
+    awaited before the loop is closed.
+    """
+    session = _SESSIONS.pop(asyncio.get_event_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def _execute_iex_query_async(reader, url):
+    """
+    Coroutine counterpart of _IEXBase._execute_iex_query
+    """
+    cached = reader._get_cached_response(url)
+    if cached is not None:
+        get_metrics().increment(endpoint_name(url), "cache_hits")
+        return cached
+    if not reader.coalesce:
+        return await _send_iex_query_async(reader, url)
+    loop = asyncio.get_event_loop()
+    key = (loop, reader._coalesce_key(url))
+    call = _IN_FLIGHT.get(key)
+    if call is not None:
+        get_metrics().increment(endpoint_name(url), "coalesced")
+        call[1] += 1
+        return copy.deepcopy(await asyncio.shield(call[0]))
+    # The future of the query, and the number of coroutines waiting for it
+    call = _IN_FLIGHT[key] = [loop.create_future(), 0]
+    future = call[0]
+    try:
+        result = await _send_iex_query_async(reader, url)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved in case nobody else was waiting
+        future.exception()
+        raise
+    else:
+        # Waiters copy a snapshot, unaffected by changes made by the caller
+        future.set_result(copy.deepcopy(result) if call[1] else result)
+        return result
+    finally:
+        del _IN_FLIGHT[key]
+
+
+async def _send_iex_query_async(reader, url):
+    """
+    Coroutine counterpart of _IEXBase._send_iex_query
+    """
+    policy = reader.retry_policy
+    session = _get_session()
+    event = RequestEvent(endpoint_name(url), url)
+    start = _clock()
+    try:
+        for attempt in range(policy.max_retries + 1):
+            wait = reader.rate_limiter.reserve(url)
+            if wait > 0:
+                event.throttle += wait
+                await asyncio.sleep(wait)
+            event.attempts += 1
+            connect = event.connect
+            mark = _clock()
+            async with session.get(url, trace_request_ctx=event) as resp:
+                event.ttfb += max(0.0, _clock() - mark -
+                                  (event.connect - connect))
+                mark = _clock()
+                content = await resp.read()
+                event.download += _clock() - mark
+                response = _BufferedResponse(content, resp.status,
+                                             resp.headers, resp.charset)
+            event.bytes += len(content)
+            event.status = response.status_code
+            if response.status_code == 200:
+                mark = _clock()
+                result = reader._validate_response(response)
+                event.decode += _clock() - mark
+                reader._cache_response(url, response)
+                return result
+            if (not policy.is_retryable(response.status_code) or
+                    attempt == policy.max_retries):
+                break
+            await asyncio.sleep(policy.get_backoff(attempt, response))
+        raise IEXQueryError()
+    except Exception as e:
+        event.error = type(e).__name__
+        raise
+    finally:
+        event.total = _clock() - start
+        get_metrics().record(event)
+
+
+async def _fetch_async(reader):
+    """
+    Coroutine counterpart of _IEXBase.fetch. The reader's query URLs are
+    requested concurrently.
+    """
+    start = _clock()
+    urls = reader._get_urls()
+    if urls:
+        get_metrics().observe(endpoint_name(urls[0]), "prepare",
+                              _clock() - start)
+    responses = await asyncio.gather(
+        *[_execute_iex_query_async(reader, url) for url in urls],
+        return_exceptions=reader._allow_partial_failure())
+    return reader._format_responses(list(responses))
+
+
+async def get_historical_data_async(symbols=None, start=None, end=None,
+                                    output_format='json', **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_historical_data
+    """
+    return await HistoricalReader(symbols, start, end, output_format,
+                                  **kwargs).fetch_async()
+
+
+async def get_available_symbols_async(**kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_available_symbols
+    """
+    _ALL_SYMBOLS_URL = _IEXBase._IEX_API_URL + "ref-data/symbols"
+    handler = _IEXBase(**kwargs)
+    response = await _execute_iex_query_async(handler, _ALL_SYMBOLS_URL)
+    if not response:
+        raise IEXQueryError("Could not download all symbols")
+    else:
+        return response
+
+
+async def get_iex_corporate_actions_async(start=None, **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_iex_corporate_actions
+    """
+    return await CorporateActions(start=start, **kwargs).fetch_async()
+
+
+async def get_iex_dividends_async(start=None, **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_iex_dividends
+    """
+    return await Dividends(start=start, **kwargs).fetch_async()
+
+
+async def get_iex_next_day_ex_date_async(start=None, **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_iex_next_day_ex_date
+    """
+    return await NextDay(start=start, **kwargs).fetch_async()
+
+
+async def get_iex_listed_symbol_dir_async(start=None, **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_iex_listed_symbol_dir
+    """
+    return await ListedSymbolDir(start=start, **kwargs).fetch_async()
+
+
+async def get_market_tops_async(symbols=None, output_format='json',
+                                **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_market_tops
+    """
+    return await TOPS(symbols, output_format, **kwargs).fetch_async()
+
+
+async def get_market_last_async(symbols=None, output_format='json',
+                                **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_market_last
+    """
+    return await Last(symbols, output_format, **kwargs).fetch_async()
+
+
+async def get_market_deep_async(symbols=None, output_format='json',
+                                **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_market_deep
+    """
+    return await DEEP(symbols, output_format, **kwargs).fetch_async()
+
+
+async def get_market_book_async(symbols=None, output_format='json',
+                                **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_market_book
+    """
+    return await Book(symbols, output_format, **kwargs).fetch_async()
+
+
+async def get_stats_intraday_async(output_format='json', **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_stats_intraday
+    """
+    return await IntradayReader(output_format=output_format,
+                                **kwargs).fetch_async()
+
+
+async def get_stats_recent_async(output_format='json', **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_stats_recent
+    """
+    return await RecentReader(output_format=output_format,
+                              **kwargs).fetch_async()
+
+
+async def get_stats_records_async(output_format='json', **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_stats_records
+    """
+    return await RecordsReader(output_format=output_format,
+                               **kwargs).fetch_async()
+
+
+async def get_stats_daily_async(start=None, end=None, last=None,
+                                output_format='json', **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_stats_daily
+    """
+    return await DailySummaryReader(start=start, end=end, last=last,
+                                    output_format=output_format,
+                                    **kwargs).fetch_async()
+
+
+async def get_stats_monthly_async(start=None, end=None, output_format='json',
+                                  **kwargs):
+    """
+    Coroutine counterpart of iexfinance.get_stats_monthly
+    """
+    return await MonthlySummaryReader(start=start, end=end,
+                                      output_format=output_format,
+                                      **kwargs).fetch_async()
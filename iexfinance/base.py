@@ -1,9 +1,20 @@
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
-from iexfinance.utils import _init_session
+from iexfinance.utils import _BufferedResponse, _init_session
+from iexfinance.utils.cache import get_cache
+from iexfinance.utils.decoders import _resolve, json_loads
+from iexfinance.utils.diskcache import get_disk_cache
 from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.metrics import (RequestEvent, _clock, _pop_connect_time,
+                                      endpoint_name, get_metrics)
+from iexfinance.utils.ratelimit import get_rate_limiter
+from iexfinance.utils.retry import RetryPolicy
+from iexfinance.utils.singleflight import SingleFlight
+from iexfinance.utils.symbols import get_symbol_index
 
 # Data provided for free by IEX
 # Data is furnished in compliance with the guidelines promulgated in the IEX
@@ -11,6 +22,14 @@ from iexfinance.utils.exceptions import IEXQueryError
 # See https://iextrading.com/api-exhibit-a/ for additional information
 # and conditions of use
 
+# Requests currently in flight, shared by all readers
+_IN_FLIGHT = SingleFlight()
+
+if sys.version_info[0] == 2:
+    _STRING_TYPES = (basestring,)  # noqa: F821
+else:
+    _STRING_TYPES = (str,)
+
 
 class _IEXBase(object):
     """ IEX Base Class
@@ -22,10 +41,40 @@ class _IEXBase(object):
     ----------
     retry_count: int, default 3, optional
         Desired number of retries if a request fails
-    pause: float, default 0.001, optional
-        Pause time between retry attempts
+    pause: float, default 0.5, optional
+        Base pause time between retry attempts (grows exponentially)
+    retry_policy: iexfinance.utils.retry.RetryPolicy, default None, optional
+        Retry policy for failed requests. Built from retry_count and pause
+        if omitted
+    rate_limiter: RateLimiter, default None, optional
+        Client-side rate limiter (iexfinance.utils.ratelimit) consulted
+        before every request. Defaults to the process-wide limiter
+    cache: ResponseCache or bool, default None, optional
+        In-memory response cache (iexfinance.utils.cache). Defaults to the
+        process-wide cache if enabled. False disables caching
+    disk_cache: DiskCache or bool, default None, optional
+        Persistent cache of immutable data (iexfinance.utils.diskcache).
+        Defaults to the process-wide cache if enabled. False disables it
+    symbol_index: SymbolIndex or bool, default None, optional
+        Local index of the IEX symbols (iexfinance.utils.symbols) against
+        which readers validate their symbols before any request. Defaults
+        to the process-wide index if enabled. False disables validation
+    json_decoder: str or callable, default None, optional
+        JSON decoder for response bodies, by name or as a function of the
+        raw bytes (see iexfinance.utils.decoders). Defaults to the
+        process-wide decoder (standard library json unless changed)
+    coalesce: bool, default True, optional
+        Whether concurrent identical queries (same URL and session) share a
+        single request
+    max_workers: int, default 1, optional
+        Number of threads executing the query URLs of a fetch concurrently
+    filter: str or list, default None, optional
+        Fields to request (filter parameter of the API), as a list or a
+        comma-separated string. All fields if None
     session: requests.session, default None, optional
-        A cached requests-cache session
+        A cached requests-cache session. If omitted, the pooled session
+        shared by all readers is used (see
+        ``iexfinance.utils.configure_transport``)
 
     Methods
     -------
@@ -34,6 +83,8 @@ class _IEXBase(object):
     """
     # Base URL
     _IEX_API_URL = "https://api.iextrading.com/1.0/"
+    # Whether filter may give the fields of each endpoint (dict)
+    _FILTER_BY_ENDPOINT = False
 
     def __init__(self, *args, **kwargs):
         """ Initialize the class
@@ -43,22 +94,80 @@ class _IEXBase(object):
         retry_count: int
             Desired number of retries if a request fails
         pause: float
-            Pause time between retry attempts
+            Base pause time between retry attempts
+        retry_policy: iexfinance.utils.retry.RetryPolicy
+            Retry policy for failed requests
+        rate_limiter: iexfinance.utils.ratelimit.RateLimiter
+            Client-side rate limiter
+        cache: ResponseCache or bool
+            In-memory response cache
+        disk_cache: DiskCache or bool
+            Persistent cache of immutable data
+        symbol_index: SymbolIndex or bool
+            Local index of the IEX symbols
+        json_decoder: str or callable
+            JSON decoder for response bodies
+        coalesce: bool
+            Whether to share in-flight identical queries
+        max_workers: int
+            Number of threads executing the queries of a fetch
+        filter: str or list
+            Fields to request (a list or comma-separated string)
         session: requests.session
             A cached requests-cache session
         """
         self.retry_count = kwargs.pop("retry_count", 3)
-        self.pause = kwargs.pop("pause", 0.001)
-        self.session = kwargs.pop("session", _init_session(None))
+        self.pause = kwargs.pop("pause", 0.5)
+        self.retry_policy = kwargs.pop("retry_policy", None)
+        if self.retry_policy is None:
+            self.retry_policy = RetryPolicy(max_retries=self.retry_count,
+                                            backoff_factor=self.pause)
+        self.rate_limiter = kwargs.pop("rate_limiter", None)
+        if self.rate_limiter is None:
+            self.rate_limiter = get_rate_limiter()
+        self.cache = kwargs.pop("cache", None)
+        if self.cache is None:
+            self.cache = get_cache()
+        elif self.cache is False:
+            self.cache = None
+        self.disk_cache = kwargs.pop("disk_cache", None)
+        if self.disk_cache is None:
+            self.disk_cache = get_disk_cache()
+        elif self.disk_cache is False:
+            self.disk_cache = None
+        self.symbol_index = kwargs.pop("symbol_index", None)
+        if self.symbol_index is None:
+            self.symbol_index = get_symbol_index()
+        elif self.symbol_index is False:
+            self.symbol_index = None
+        self.json_decoder = kwargs.pop("json_decoder", None)
+        if self.json_decoder is None:
+            self.json_decoder = json_loads
+        else:
+            self.json_decoder = _resolve(self.json_decoder)
+        self.coalesce = kwargs.pop("coalesce", True)
+        self.max_workers = kwargs.pop("max_workers", 1)
+        self.filter = kwargs.pop("filter", None)
+        if isinstance(self.filter, _STRING_TYPES):
+            self.filter = self.filter.split(",")
+        elif not (self.filter is None or
+                  isinstance(self.filter, (list, tuple)) or
+                  isinstance(self.filter, dict) and
+                  self._FILTER_BY_ENDPOINT):
+            raise ValueError("filter must be a list of fields or a "
+                             "comma-separated string")
+        self.session = _init_session(kwargs.pop("session", None),
+                                     self.retry_count)
 
     @property
     def params(self):
         return {}
 
-    @staticmethod
-    def _validate_response(response):
+    def _validate_response(self, response):
         """ Ensures response from IEX server is valid.
 
+        The raw body is decoded in a single pass by self.json_decoder.
+
         Parameters
         ----------
         response: requests.response
@@ -77,18 +186,31 @@ class _IEXBase(object):
             If the JSON response is empty or throws an error
 
         """
-        if response.text == "Unknown symbol":
+        content = response.content
+        if content == b"Unknown symbol":
             raise IEXQueryError()
-        json_response = response.json()
-        if "Error Message" in json_response:
+        json_response = self.json_decoder(content)
+        if (isinstance(json_response, dict) and
+                "Error Message" in json_response):
             raise IEXQueryError()
         return json_response
 
     def _execute_iex_query(self, url):
         """ Executes HTTP Request
         Given a URL, execute HTTP request from IEX server. If request is
-        unsuccessful, attempt is made self.retry_count times with pause of
-        self.pause in between.
+        unsuccessful with a retryable status (429 or 5xx by default), it is
+        retried according to self.retry_policy with exponential backoff.
+        Other statuses fail immediately. Every attempt first waits for
+        self.rate_limiter.
+
+        The timings of every query sent are recorded as a RequestEvent in the
+        process-wide metrics registry (see iexfinance.utils.metrics), along
+        with cache hits and coalesced queries.
+
+        Fresh responses held by self.cache (or immutable ones held by
+        self.disk_cache) are returned without a request.
+        If self.coalesce is set, a query identical to one already in flight
+        waits for it and receives a copy of its parsed response instead.
 
         Parameters
         ----------
@@ -105,14 +227,133 @@ class _IEXBase(object):
         IEXQueryError
             If problems arise when making the query
         """
-        pause = self.pause
-        for i in range(self.retry_count+1):
+        cached = self._get_cached_response(url)
+        if cached is not None:
+            get_metrics().increment(endpoint_name(url), "cache_hits")
+            return cached
+        if not self.coalesce:
+            return self._send_iex_query(url)
+        sent = []
+
+        def send():
+            sent.append(url)
+            return self._send_iex_query(url)
+        result = _IN_FLIGHT.do(self._coalesce_key(url), send)
+        if not sent:
+            get_metrics().increment(endpoint_name(url), "coalesced")
+        return result
 
-            response = self.session.get(url=url)
-            if response.status_code == requests.codes.ok:
-                return self._validate_response(response)
-            time.sleep(pause)
-        raise IEXQueryError()
+    def _execute_iex_queries(self, urls, return_exceptions=False):
+        """ Executes the queries to urls, on up to self.max_workers
+        threads
+
+        Parameters
+        ----------
+        urls: list
+            Properly-formatted urls
+        return_exceptions: bool, default False
+            Whether failed queries return their exception (in place of their
+            response) instead of raising it
+
+        Returns
+        -------
+        responses: list
+            Parsed responses (or exceptions), in the order of urls
+        """
+        def execute(url):
+            try:
+                return self._execute_iex_query(url)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+        if self.max_workers <= 1 or len(urls) < 2:
+            return [execute(url) for url in urls]
+        with ThreadPoolExecutor(min(self.max_workers, len(urls))) as pool:
+            return list(pool.map(execute, urls))
+
+    def _allow_partial_failure(self):
+        """ Whether _format_responses accepts the exceptions of failed
+        queries in place of their responses
+        """
+        return False
+
+    def _coalesce_key(self, url):
+        """ Key identifying equivalent queries: same URL, session and
+        response validation
+        """
+        return (url, id(self.session), type(self)._validate_response)
+
+    def _get_cached_response(self, url):
+        """ Returns the validated cached response to url, or None
+        """
+        content = None
+        if self.cache is not None:
+            content = self.cache.get(url)
+        if content is None and self.disk_cache is not None:
+            content = self.disk_cache.get(url)
+            if content is not None and self.cache is not None:
+                self.cache.put(url, content)
+        if content is None:
+            return None
+        return self._validate_response(_BufferedResponse(content))
+
+    def _cache_response(self, url, response):
+        """ Stores a valid response in self.cache and self.disk_cache
+        """
+        if self.cache is not None:
+            self.cache.put(url, response.content)
+        if self.disk_cache is not None:
+            self.disk_cache.put(url, response.content)
+
+    def _send_iex_query(self, url):
+        """ Sends the query, applying rate limiting and retries (see
+        _execute_iex_query)
+        """
+        policy = self.retry_policy
+        event = RequestEvent(endpoint_name(url), url)
+        start = _clock()
+        try:
+            for attempt in range(policy.max_retries + 1):
+                mark = _clock()
+                self.rate_limiter.acquire(url)
+                event.throttle += _clock() - mark
+                event.attempts += 1
+                _pop_connect_time()
+                mark = _clock()
+                response = self.session.get(url=url, stream=True)
+                elapsed = _clock() - mark
+                connect = _pop_connect_time()
+                event.connect += connect
+                event.ttfb += max(0.0, elapsed - connect)
+                mark = _clock()
+                content = response.content
+                event.download += _clock() - mark
+                event.bytes += len(content or b"")
+                event.status = response.status_code
+                if response.status_code == requests.codes.ok:
+                    mark = _clock()
+                    result = self._validate_response(response)
+                    event.decode += _clock() - mark
+                    self._cache_response(url, response)
+                    return result
+                if (not policy.is_retryable(response.status_code) or
+                        attempt == policy.max_retries):
+                    break
+                time.sleep(policy.get_backoff(attempt, response))
+            raise IEXQueryError()
+        except Exception as e:
+            event.error = type(e).__name__
+            raise
+        finally:
+            event.total = _clock() - start
+            get_metrics().record(event)
+
+    def _filter_fields(self):
+        """ Returns the fields requested by the query being prepared, or
+        None for all fields
+        """
+        return self.filter
 
     def _prepare_query(self):
         """ Prepares the query URL
@@ -122,11 +363,39 @@ class _IEXBase(object):
         url: str
             A formatted URL
         """
+        params = self.params
+        fields = self._filter_fields()
+        if fields:
+            params = dict(params, filter=",".join(fields))
         params = "?" + "&".join(
-            "{}={}".format(*i) for i in self.params.items())
+            "{}={}".format(*i) for i in params.items())
         url = self._IEX_API_URL + self.url + params
         return url
 
+    def _get_urls(self):
+        """ Lists the query URLs needed to complete a fetch
+
+        Returns
+        -------
+        urls: list
+            Formatted URLs, queried in order
+        """
+        return [self._prepare_query()]
+
+    def _format_responses(self, responses):
+        """ Builds the output of a fetch from the parsed responses
+
+        Parameters
+        ----------
+        responses: list
+            Parsed JSON responses, one per URL from _get_urls
+
+        Returns
+        -------
+        The formatted output
+        """
+        return responses[0]
+
     def fetch(self):
         """Fetches latest data
 
@@ -137,6 +406,27 @@ class _IEXBase(object):
         response: requests.response
             A response object
         """
-        url = self._prepare_query()
-        response = self._execute_iex_query(url)
-        return response
+        start = _clock()
+        urls = self._get_urls()
+        if urls:
+            get_metrics().observe(endpoint_name(urls[0]), "prepare",
+                                  _clock() - start)
+        responses = self._execute_iex_queries(
+            urls, self._allow_partial_failure())
+        return self._format_responses(responses)
+
+    def fetch_async(self):
+        """Fetches latest data asynchronously
+
+        Coroutine equivalent of fetch, for use with asyncio (Python 3.5+ and
+        aiohttp required). The query URLs of the reader are requested
+        concurrently through an aiohttp session bound to the running event
+        loop.
+
+        Returns
+        -------
+        coroutine
+            Resolves to the same output as fetch
+        """
+        from iexfinance.aio import _fetch_async
+        return _fetch_async(self)
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Data provided for free by IEX
+# Data is furnished in compliance with the guidelines promulgated in the IEX
+# API terms of service and manual
+# See https://iextrading.com/api-exhibit-a/ for additional information
+# and conditions of use
+
+
+class ReaderResult(object):
+    """
+    Outcome of fetching a single reader through a ReaderExecutor
+
+    Attributes
+    ----------
+    index: int
+        Position of the reader in the submitted list
+    reader: _IEXBase
+        The reader which was fetched
+    result:
+        Output of the reader's fetch, or None if it failed
+    error: Exception
+        Exception raised by the reader's fetch, or None if it succeeded
+    """
+    __slots__ = ("index", "reader", "result", "error")
+
+    def __init__(self, index, reader, result=None, error=None):
+        self.index = index
+        self.reader = reader
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else repr(self.error)
+        return "ReaderResult({}, {}, {})".format(
+            self.index, type(self.reader).__name__, status)
+
+
+def _fetch_reader(index, reader):
+    try:
+        return ReaderResult(index, reader, result=reader.fetch())
+    except Exception as e:
+        return ReaderResult(index, reader, error=e)
+
+
+class ReaderExecutor(object):
+    """
+    Fetches many readers concurrently on a bounded thread pool
+
+    Readers share the pooled transport (see
+    ``iexfinance.utils.configure_transport``), so max_workers should not
+    exceed the transport's per-host pool size. A failing reader does not
+    abort the others: its exception is collected in its ReaderResult.
+
+    Parameters
+    ----------
+    max_workers: int, default 8
+        Maximum number of readers fetched at once
+
+    Examples
+    --------
+    >>> with ReaderExecutor(max_workers=4) as executor:
+    ...     results = executor.fetch([TOPS("AAPL"), Last("TSLA")])
+    """
+    def __init__(self, max_workers=8):
+        if int(max_workers) < 1:
+            raise ValueError("max_workers must be a positive integer")
+        self.max_workers = int(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        """
+        Releases the worker threads
+        """
+        self._pool.shutdown(wait=wait)
+
+    def _submit(self, readers):
+        return [self._pool.submit(_fetch_reader, i, reader)
+                for i, reader in enumerate(readers)]
+
+    def fetch(self, readers):
+        """
+        Fetches all readers and returns their results in submission order
+
+        Parameters
+        ----------
+        readers: list
+            Readers (_IEXBase instances) to fetch
+
+        Returns
+        -------
+        list
+            One ReaderResult per reader, in the order given
+        """
+        return [future.result() for future in self._submit(readers)]
+
+    def fetch_as_completed(self, readers):
+        """
+        Fetches all readers, yielding results as they complete
+
+        Parameters
+        ----------
+        readers: list
+            Readers (_IEXBase instances) to fetch
+
+        Returns
+        -------
+        generator
+            ReaderResult objects in completion order
+        """
+        for future in as_completed(self._submit(readers)):
+            yield future.result()
+
+
+def fetch_readers(readers, max_workers=8):
+    """
+    Fetches readers concurrently on a temporary ReaderExecutor
+
+    Parameters
+    ----------
+    readers: list
+        Readers (_IEXBase instances) to fetch
+    max_workers: int, default 8
+        Maximum number of readers fetched at once
+
+    Returns
+    -------
+    list
+        One ReaderResult per reader, in the order given
+    """
+    with ReaderExecutor(max_workers=max_workers) as executor:
+        return executor.fetch(readers)
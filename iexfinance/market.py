@@ -2,6 +2,7 @@ import pandas as pd
 
 from .base import _IEXBase
 from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.metrics import format_timer
 
 # Data provided for free by IEX
 # Data is furnished in compliance with the guidelines promulgated in the IEX
@@ -59,7 +60,8 @@ class Market(_IEXBase):
             return response
         elif self.output_format == 'pandas' and self.acc_pandas:
             try:
-                df = pd.DataFrame(response)
+                with format_timer(self.url, "pandas"):
+                    df = pd.DataFrame(response)
                 return df
             except ValueError:
                 raise IEXQueryError()
@@ -68,8 +70,8 @@ class Market(_IEXBase):
         else:
             raise ValueError("Please input valid output format")
 
-    def fetch(self):
-        """ Fetch latest market data
+    def _format_responses(self, responses):
+        """ Formats the latest market data
         Returns
         -------
         response: dict or DataFrame
@@ -82,8 +84,7 @@ class Market(_IEXBase):
         IEXQueryError
             If issues arise while making the request
         """
-        response = super(Market, self).fetch()
-        return self._output_format(response)
+        return self._output_format(responses[0])
 
     @property
     def acc_pandas(self):
@@ -4,6 +4,7 @@ import pandas as pd
 
 from .base import _IEXBase
 from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.metrics import format_timer
 # Data provided for free by IEX
 # Data is furnished in compliance with the guidelines promulgated in the IEX
 # API terms of service and manual
@@ -28,7 +29,8 @@ class Stats(_IEXBase):
             return response
         elif self.output_format == 'pandas' and self.acc_pandas:
             try:
-                df = pd.DataFrame(response)
+                with format_timer(self.url, "pandas"):
+                    df = pd.DataFrame(response)
                 return df
             except ValueError:
                 raise IEXQueryError()
@@ -65,8 +67,8 @@ class Stats(_IEXBase):
     def url(self):
         return "stats"
 
-    def fetch(self):
-        return self._output_format(super(Stats, self).fetch())
+    def _format_responses(self, responses):
+        return self._output_format(responses[0])
 
 
 class IntradayReader(Stats):
@@ -155,9 +157,8 @@ class DailySummaryReader(Stats):
         raise ValueError("Please enter a date range or number of days for "
                          "retrieval period.")
 
-    @staticmethod
-    def _validate_response(response):
-        return response.json()
+    def _validate_response(self, response):
+        return self.json_decoder(response.content)
 
     @property
     def url(self):
@@ -176,31 +177,37 @@ class DailySummaryReader(Stats):
             p['last'] = self.last
         return p
 
-    def fetch(self):
+    def _get_urls(self):
         """Unfortunately, IEX's API can only retrieve data one day or one month
         at a time. Rather than specifying a date range, we will have to run
         the read function for each date provided.
+        """
+        self._validate_params()
+        if self.islast:
+            return super(DailySummaryReader, self)._get_urls()
+        tlen = self.end - self.start
+        urls = []
+        for date in (self.start + timedelta(n) for n in range(tlen.days)):
+            self.curr_date = date
+            urls.append(self._prepare_query())
+        return urls
 
+    def _format_responses(self, responses):
+        """
         :return: DataFrame
         """
-        self._validate_params()
         if self.islast:
-            data = super(DailySummaryReader, self).fetch()
+            data = self._output_format(responses[0])
         else:
-            data = self._fetch_dates()
+            data = self._format_dates(responses)
         if self.output_format == 'pandas':
             data.set_index('date', inplace=True)
             return data
         else:
             return data
 
-    def _fetch_dates(self):
-        tlen = self.end - self.start
-        dfs = []
-        for date in (self.start + timedelta(n) for n in range(tlen.days)):
-            self.curr_date = date
-            tdf = super(DailySummaryReader, self).fetch()
-            dfs.append(tdf)
+    def _format_dates(self, responses):
+        dfs = [self._output_format(response) for response in responses]
         if self.output_format == 'pandas':
             return pd.concat(dfs)
         else:
@@ -250,15 +257,10 @@ class MonthlySummaryReader(Stats):
             p['date'] = self.curr_date.strftime(self.date_format)
         return p
 
-    def fetch(self):
-        """Unfortunately, IEX's API can only retrieve data one day or one month
-         at a time. Rather than specifying a date range, we will have to run
-         the read function for each date provided.
-
-        :return: DataFrame
-        """
+    @property
+    def months(self):
+        """List of the first day of each month within the given range"""
         tlen = self.end - self.start
-        dfs = []
 
         # Build list of all dates within the given range
         lrange = [x for x in (self.start + timedelta(n)
@@ -268,11 +270,26 @@ class MonthlySummaryReader(Stats):
         for dt in lrange:
             if datetime(dt.year, dt.month, 1) not in mrange:
                 mrange.append(datetime(dt.year, dt.month, 1))
-        lrange = mrange
+        return mrange
 
-        for date in lrange:
+    def _get_urls(self):
+        """Unfortunately, IEX's API can only retrieve data one day or one month
+         at a time. Rather than specifying a date range, we will have to run
+         the read function for each date provided.
+        """
+        urls = []
+        for date in self.months:
             self.curr_date = date
-            tdf = super(MonthlySummaryReader, self).fetch()
+            urls.append(self._prepare_query())
+        return urls
+
+    def _format_responses(self, responses):
+        """
+        :return: DataFrame
+        """
+        dfs = []
+        for date, response in zip(self.months, responses):
+            tdf = self._output_format(response)
 
             # We may not return data if this was a weekend/holiday:
             if self.output_format == 'pandas':
@@ -1,10 +1,21 @@
+import bisect
+import calendar
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import wraps
 
+import numpy as np
 import pandas as pd
 
 from .base import _IEXBase
-from iexfinance.utils.exceptions import IEXSymbolError, IEXEndpointError
+from iexfinance.utils.cache import DEFAULT_TTLS
+from iexfinance.utils.compact import compact, deep_sizeof, expand
+from iexfinance.utils.exceptions import (IEXSymbolError, IEXEndpointError,
+                                         IEXFieldError)
+from iexfinance.utils.metrics import format_timer
+from iexfinance.utils.schema import (SCHEMAS, DAILY_BAR, OHLCV,
+                                     build_chart_frame, build_frame)
 
 # Data provided for free by IEX
 # Data is furnished in compliance with the guidelines promulgated in the IEX
@@ -12,8 +23,24 @@ from iexfinance.utils.exceptions import IEXSymbolError, IEXEndpointError
 # See https://iextrading.com/api-exhibit-a/ for additional information
 # and conditions of use
 
+_clock = getattr(time, "monotonic", time.time)
+_today = datetime.date.today
 
-def output_format(override=None):
+
+def _months_before(day, months):
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    return day.replace(year=year, month=month,
+                       day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def output_format(override=None, endpoints=None):
     """
     Decorator in charge of giving the output its correct format, either
     json or pandas
@@ -24,28 +51,80 @@ def output_format(override=None):
         The function to be decorated
     override: str
         Override the internal format of the call, default none
+    endpoints: list, default None, optional
+        Stock endpoints the call reads, downloaded first if needed. All
+        endpoints if None
+
+    Notes
+    -----
+    Endpoints with a schema (see iexfinance.utils.schema) give typed
+    DataFrames with a row per symbol, built from the field index of the
+    data set.
     """
+    schema = None
+    if endpoints is not None and len(endpoints) == 1:
+        schema = SCHEMAS.get(endpoints[0])
+
     def _output_format(func):
 
         @wraps(func)
         def _format_wrapper(self, *args, **kwargs):
-            response = func(self, *args, **kwargs)
-            if self.output_format is 'pandas':
-                if override is None:
+            self._ensure_endpoints(endpoints)
+            name = "stock/" + func.__name__[4:]
+            if self.output_format == 'pandas' and override is None:
+                if schema is not None:
+                    with format_timer(name, "pandas"):
+                        index = self._field_index(endpoints[0])
+                        return build_frame(index.symbols, index.columns,
+                                           schema)
+                response = self._expand(func(self, *args, **kwargs))
+                with format_timer(name, "pandas"):
                     df = pd.DataFrame(response)
-                    return df
-                else:
-                    import warnings
-                    warnings.warn("Pandas output not supported for this "
-                                  "endpoint. Defaulting to JSON.")
+                return df
+            response = self._expand(func(self, *args, **kwargs))
+            if self.output_format == 'pandas':
+                import warnings
+                warnings.warn("Pandas output not supported for this "
+                              "endpoint. Defaulting to JSON.")
             else:
-                if self.key is 'share':
+                if self.key == 'share':
                     return response[self.symbols[0]]
                 return response
         return _format_wrapper
     return _output_format
 
 
+class _FieldIndex(object):
+    """
+    Columnar view of one endpoint of a StockReader data set: the row of each
+    symbol and, for each field, the column of its values across symbols.
+    Symbols missing a field have None in its column. Values of a compact
+    data set are expanded (see iexfinance.utils.compact)
+    """
+    def __init__(self, data_set, endpoint, compacted=False):
+        records = [(symbol, data[endpoint]) for symbol, data in
+                   data_set.items() if isinstance(data.get(endpoint), dict)]
+        self.symbols = [symbol for symbol, _ in records]
+        self.rows = dict((symbol, i) for i, symbol in enumerate(self.symbols))
+        self.columns = {}
+        for i, (_, record) in enumerate(records):
+            for field, value in record.items():
+                column = self.columns.get(field)
+                if column is None:
+                    column = self.columns[field] = [None] * len(records)
+                column[i] = expand(value) if compacted else value
+
+    def column(self, symbols, field):
+        """
+        Returns the values of field for symbols (None for missing symbols)
+        """
+        column = self.columns[field]
+        if symbols == self.symbols:
+            return list(column)
+        rows = self.rows
+        return [column[rows[s]] if s in rows else None for s in symbols]
+
+
 class StockReader(_IEXBase):
     """
     Base class for obtaining data from the Stock endpoints of IEX. Subclass of
@@ -60,6 +139,12 @@ class StockReader(_IEXBase):
                   "volume-by-venue", "ohlc"]
     ALL_ENDPOINTS_STR_1 = ",".join(_ENDPOINTS[:10])
     ALL_ENDPOINTS_STR_2 = ','.join(_ENDPOINTS[10:20])
+    # Endpoints searched by get_fields, in order
+    _FIELD_ENDPOINTS = ["quote", "stats"]
+    # Maximum number of types and symbols in a single batch request
+    _MAX_TYPES = 10
+    _MAX_SYMBOLS = 100
+    _FILTER_BY_ENDPOINT = True
 
     def __init__(self, symbols=None, displayPercent=False, _range="1m",
                  last=10, output_format='json', **kwargs):
@@ -77,8 +162,48 @@ class StockReader(_IEXBase):
             A desired news range between 1 and 50
         output_format: str
             Desired output format
+        lazy: bool, default False, optional
+            If True, nothing is downloaded at construction. Each get_*
+            method then downloads only the endpoints it needs (along with
+            those declared with require), in as few batch requests as
+            possible
+        max_workers: int, default 4, optional
+            Number of batch requests sent concurrently when more than 100
+            symbols are given
+        ttls: dict, default None, optional
+            Freshness (in seconds) per endpoint used by refresh_stale, merged
+            over iexfinance.utils.cache.DEFAULT_TTLS. None never expires
+        compact: bool, default False, optional
+            If True, the data set is stored in a compact form (see
+            iexfinance.utils.compact): shared keys, and lists of records
+            (chart, news...) stored by column. Records are rebuilt when
+            returned by the get_* methods
+        memory_budget: int, default None, optional
+            Estimated size (in bytes, see memory_report) above which the
+            least recently used endpoints are dropped from the data set
+            after a download. Dropped endpoints are downloaded again when
+            next used. The endpoints downloaded at construction (or by
+            refresh) count as used, and are kept by that download
+        filter: str, list or dict, default None, optional
+            Fields to request (filter parameter of the API): a list (or
+            comma-separated string) for all endpoints, or a list of fields
+            per endpoint (e.g. {"quote": ["latestPrice"]}), other endpoints
+            being requested in full
+
+        Notes
+        -----
+        Symbols are requested in batches of 100. When there are several
+        batches, failed batches and unknown symbols do not abort the download:
+        they are left out of the data set and reported in failures.
         """
+        self.lazy = kwargs.pop("lazy", False)
+        self.compact = kwargs.pop("compact", False)
+        self.memory_budget = kwargs.pop("memory_budget", None)
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(kwargs.pop("ttls", None) or {})
         self.symbols = list(map(lambda x: x.upper(), symbols))
+        if len(self.symbols) > self._MAX_SYMBOLS:
+            kwargs.setdefault("max_workers", 4)
         if len(symbols) == 1:
             self.key = "share"
         else:
@@ -97,25 +222,305 @@ class StockReader(_IEXBase):
         elif int(self.last) > 50 or int(self.last) < 1:
             raise ValueError(
                 "Invalid news last range. Enter a value between 1 and 50.")
-        self.refresh()
+        if isinstance(self.filter, dict):
+            for endpoint in self.filter:
+                if endpoint not in self._ENDPOINTS:
+                    raise IEXEndpointError(endpoint)
+        self.data_set = {}
+        # (symbols, exception) of failed batches and unknown symbols, and of
+        # the symbols missing from the symbol index
+        self.failures = []
+        self._invalid = []
+        if self.symbol_index is not None:
+            self._validate_symbols()
+        # Endpoints downloaded (with the time of their last download), and
+        # declared for the next download
+        self._fetched = set()
+        self._fetched_at = {}
+        self._required = set()
+        self._types = []
+        # Symbols of the batch being prepared, and of each query URL
+        self._chunk = self.symbols
+        self._url_chunks = []
+        # Whether the next download replaces the data set (see refresh), and
+        # whether the current one does
+        self._refreshing = False
+        self._url_refresh = False
+        # Fields of the query being prepared (None for all fields)
+        self._query_filter = None
+        # Field indexes of the current data set, built on first use
+        self._indexes = {}
+        # Order of the last use of each endpoint
+        self._uses = 0
+        self._used_at = {}
+        if not self.lazy:
+            self.refresh()
+
+    def _validate_symbols(self):
+        """ Normalizes the symbols with the symbol index. Unknown symbols
+        raise IEXSymbolError, or are reported in failures when batches may
+        fail independently
+        """
+        symbols, unknown = self.symbol_index.validate(self.symbols)
+        if unknown and (not self._allow_partial_failure() or not symbols):
+            raise IEXSymbolError(unknown[0])
+        self._invalid = [([symbol], IEXSymbolError(symbol))
+                         for symbol in unknown]
+        self.failures = list(self._invalid)
+        self.symbols = symbols
 
     def _default_options(self):
         return (self.range == '1m' and self.last == 10 and
                 self.displayPercent is False)
 
+    def _refresh_types(self):
+        if not self.lazy:
+            return list(self._ENDPOINTS)
+        required = self._fetched | self._required
+        return [e for e in self._ENDPOINTS if e in required]
+
     def refresh(self):
         """
         Downloads latest data from all Stock endpoints
+
+        In lazy mode, only the endpoints downloaded so far (and those
+        declared with require) are downloaded again. The data set is
+        replaced once the download succeeds, and kept if it fails.
         """
-        self.endpoints = self.ALL_ENDPOINTS_STR_1
-        self.data_set = self.fetch()
-        self.endpoints = self.ALL_ENDPOINTS_STR_2
-        data2 = self.fetch()
+        self._types = self._refresh_types()
+        self._use(self._types)
+        self._refreshing = True
+        self.fetch()
 
-        for symbol in self.symbols:
-            if symbol not in self.data_set:
-                raise IEXSymbolError(symbol)
-            self.data_set[symbol].update(data2[symbol])
+    def refresh_async(self):
+        """
+        Coroutine which downloads latest data from all Stock endpoints
+        (see _IEXBase.fetch_async)
+        """
+        self._types = self._refresh_types()
+        self._use(self._types)
+        self._refreshing = True
+        return self.fetch_async()
+
+    def _stale_endpoints(self):
+        now = _clock()
+        stale = []
+        for endpoint in self._ENDPOINTS:
+            if endpoint not in self._fetched:
+                continue
+            ttl = self.ttls.get(endpoint, 0)
+            if ttl is not None and now - self._fetched_at[endpoint] >= ttl:
+                stale.append(endpoint)
+        return stale
+
+    def refresh_stale(self):
+        """
+        Downloads again the endpoints whose data has expired, according to
+        their freshness policy (see ttls)
+
+        Real-time endpoints (quote, price, ohlc...) expire within seconds,
+        while daily data (company, logo, peers, financials...) lasts for
+        hours. The new data is merged into data_set in place: symbols whose
+        batch fails keep their previous data, and are reported in failures.
+
+        Returns
+        -------
+        list
+            The endpoints downloaded again
+        """
+        stale = self._stale_endpoints()
+        if stale:
+            self._types = stale
+            self.failures = list(self._invalid)
+            self.fetch()
+        return stale
+
+    def require(self, endpoints):
+        """
+        Declares endpoints needed later, so that they are downloaded along
+        with the next endpoints fetched (lazy mode)
+
+        Parameters
+        ----------
+        endpoints: str or list
+            Valid Stock endpoints
+        """
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        for endpoint in endpoints:
+            if endpoint not in self._ENDPOINTS:
+                raise IEXEndpointError(endpoint)
+        self._required.update(endpoints)
+
+    def _use(self, endpoints, new_use=True):
+        """ Records a use of endpoints (see _enforce_budget) """
+        if new_use:
+            self._uses += 1
+        for endpoint in endpoints:
+            self._used_at[endpoint] = self._uses
+
+    def _ensure_endpoints(self, endpoints=None, new_use=True):
+        """
+        Downloads the given endpoints (all if None) and the required ones if
+        they are missing from the data set
+
+        Endpoints of the current use are kept within the memory budget.
+        Successive calls with new_use=False belong to the same use
+        """
+        if endpoints is None:
+            endpoints = self._ENDPOINTS
+        self._use(endpoints, new_use)
+        if all(e in self._fetched for e in endpoints):
+            return
+        needed = self._required.union(endpoints) - self._fetched
+        self._types = [e for e in self._ENDPOINTS if e in needed]
+        self.fetch()
+
+    def _filter_groups(self):
+        """ Splits the endpoints to download into (endpoints, fields)
+        groups, each requested with its own filter
+        """
+        if not isinstance(self.filter, dict):
+            return [(self._types, self.filter)]
+        filtered = [e for e in self._types if self.filter.get(e)]
+        plain = [e for e in self._types if e not in filtered]
+        groups = [(plain, None)] if plain else []
+        if filtered:
+            # Fields of the filtered endpoints are requested together
+            fields = []
+            for endpoint in filtered:
+                fields.extend(f for f in self.filter[endpoint]
+                              if f not in fields)
+            groups.append((filtered, fields))
+        return groups
+
+    def _filter_fields(self):
+        return self._query_filter
+
+    def _get_urls(self):
+        urls = []
+        self._url_chunks = []
+        self._url_refresh, self._refreshing = self._refreshing, False
+        groups = self._filter_groups()
+        for i in range(0, len(self.symbols), self._MAX_SYMBOLS):
+            self._chunk = self.symbols[i:i + self._MAX_SYMBOLS]
+            for types, self._query_filter in groups:
+                for j in range(0, len(types), self._MAX_TYPES):
+                    self.endpoints = ",".join(types[j:j + self._MAX_TYPES])
+                    urls.append(self._prepare_query())
+                    self._url_chunks.append(self._chunk)
+        self._chunk = self.symbols
+        self._query_filter = None
+        return urls
+
+    def _allow_partial_failure(self):
+        return len(self.symbols) > self._MAX_SYMBOLS
+
+    def _format_responses(self, responses):
+        partial = self._allow_partial_failure()
+        if self._url_refresh:
+            # Built apart, so that a failed refresh keeps the previous data
+            data_set = {}
+            failures = list(self._invalid)
+        else:
+            data_set = self.data_set
+            failures = self.failures
+        failed = set()
+        for chunk, response in zip(self._url_chunks, responses):
+            if isinstance(response, Exception):
+                failures.append((chunk, response))
+                failed.update(chunk)
+                continue
+            for symbol in chunk:
+                if symbol in response:
+                    data = response[symbol]
+                    if self.compact:
+                        data = compact(data)
+                    data_set.setdefault(symbol, {}).update(data)
+                elif not partial:
+                    raise IEXSymbolError(symbol)
+                elif symbol not in failed:
+                    failures.append(([symbol], IEXSymbolError(symbol)))
+                    failed.add(symbol)
+        for symbol in failed:
+            # Data refreshed in place is kept if the new download fails
+            previous = data_set.get(symbol, {})
+            if not all(endpoint in previous for endpoint in self._types):
+                data_set.pop(symbol, None)
+        if responses and not data_set and failures:
+            raise failures[0][1]
+        self.data_set = data_set
+        self.failures = failures
+        self._indexes = {}
+        now = _clock()
+        for endpoint in self._types:
+            self._fetched_at[endpoint] = now
+        self._fetched.update(self._types)
+        self._required.difference_update(self._types)
+        if self.memory_budget is not None:
+            self._enforce_budget()
+        return data_set
+
+    def _expand(self, response):
+        return expand(response) if self.compact else response
+
+    def memory_report(self):
+        """
+        Estimates the memory used by each endpoint of the data set
+
+        Returns
+        -------
+        dict
+            Size in bytes of each downloaded endpoint, for all symbols
+        """
+        report = {}
+        for endpoint in self._ENDPOINTS:
+            seen = set()
+            values = [data[endpoint] for data in self.data_set.values()
+                      if endpoint in data]
+            if values:
+                report[endpoint] = sum(deep_sizeof(value, seen)
+                                       for value in values)
+        return report
+
+    def _drop_endpoint(self, endpoint):
+        for data in self.data_set.values():
+            data.pop(endpoint, None)
+        self._fetched.discard(endpoint)
+        self._fetched_at.pop(endpoint, None)
+        self._indexes.pop(endpoint, None)
+
+    def _enforce_budget(self):
+        """ Drops the least recently used endpoints, largest first, until
+        the data set fits in the memory budget. Endpoints of the current
+        use are kept
+        """
+        report = self.memory_report()
+        total = sum(report.values())
+        candidates = sorted(
+            (e for e in report if self._used_at.get(e) != self._uses),
+            key=lambda e: (self._used_at.get(e, 0), -report[e]))
+        for endpoint in candidates:
+            if total <= self.memory_budget:
+                break
+            self._drop_endpoint(endpoint)
+            total -= report[endpoint]
+
+    def _field_index(self, endpoint):
+        index = self._indexes.get(endpoint)
+        if index is None:
+            index = self._indexes[endpoint] = _FieldIndex(
+                self.data_set, endpoint, self.compact)
+        return index
+
+    def _get_field(self, endpoint, field):
+        """
+        Returns the values of a field of endpoint, indexed by symbol
+        """
+        index = self._field_index(endpoint)
+        if field not in index.columns:
+            raise IEXFieldError(endpoint, field)
+        return dict(zip(index.symbols, index.columns[field]))
 
     @property
     def url(self):
@@ -124,7 +529,7 @@ class StockReader(_IEXBase):
     @property
     def params(self):
         params = {
-            "symbols": ','.join(self.symbols),
+            "symbols": ','.join(self._chunk),
             "types": self.endpoints
         }
         if not self._default_options():
@@ -144,7 +549,7 @@ class StockReader(_IEXBase):
         """
         return self.data_set
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=[])
     def get_select_endpoints(self, endpoints=[]):
         """
         Universal selector method to obtain specific endpoints from the
@@ -170,8 +575,9 @@ class StockReader(_IEXBase):
             endpoints = [endpoints]
         elif not endpoints:
             raise ValueError("Please provide a valid list of endpoints")
+        self._ensure_endpoints([e for e in endpoints if e in self._ENDPOINTS])
         result = {}
-        for symbol in self.symbols:
+        for symbol in self.data_set:
             temp = {}
             try:
                 ds = self.data_set[symbol]
@@ -186,8 +592,60 @@ class StockReader(_IEXBase):
             result[symbol] = temp
         return result
 
+    def get_fields(self, fields, endpoint=None):
+        """
+        Returns fields of the quote or key stats endpoints for all symbols
+
+        Each field is looked up in the quote endpoint, then in the stats
+        endpoint, unless endpoint is given. Fields are read from a columnar
+        index of the data set, built once per download.
+
+        Parameters
+        ----------
+        fields: str or list
+            Desired fields (e.g. companyName, latestPrice, beta)
+        endpoint: str, default None, optional
+            Endpoint holding the fields
+
+        Returns
+        -------
+        DataFrame or dict
+            A DataFrame indexed by symbol with a column per field (pandas
+            output), or a dict of lists holding the symbols (under "symbol")
+            and the values of each field, in the same order
+
+        Raises
+        ------
+        IEXFieldError
+            If a field is not found
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+        if endpoint is not None and endpoint not in self._ENDPOINTS:
+            raise IEXEndpointError(endpoint)
+        endpoints = [endpoint] if endpoint else self._FIELD_ENDPOINTS
+        # Endpoint of each field, downloading the endpoints searched, all
+        # kept until the columns are read
+        sources = []
+        self._uses += 1
+        for field in fields:
+            for name in endpoints:
+                self._ensure_endpoints([name], new_use=False)
+                if field in self._field_index(name).columns:
+                    sources.append(name)
+                    break
+            else:
+                raise IEXFieldError(endpoints[-1], field)
+        symbols = list(self.data_set)
+        columns = dict((field, self._field_index(name).column(symbols, field))
+                       for field, name in zip(fields, sources))
+        if self.output_format == 'pandas':
+            return pd.DataFrame(columns, index=symbols, columns=fields)
+        columns["symbol"] = symbols
+        return columns
+
     # endpoint methods
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["quote"])
     def get_quote(self):
         """
         Reference: https://iextrading.com/developer/docs/#quote
@@ -200,7 +658,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["quote"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["book"])
     def get_book(self):
         """
         Reference: https://iextrading.com/developer/docs/#book
@@ -213,22 +671,32 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["book"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override='json')
-    def get_chart(self):
+    def get_chart(self, layout="long"):
         """
         Reference: https://iextrading.com/developer/docs/#chart
 
-        Notes
-        -----
-        Pandas not supported for this method. list will be returned.
+        Parameters
+        ----------
+        layout: str, default "long"
+            Layout of the pandas output: "long" for a single DataFrame
+            indexed by (symbol, date), "wide" for a DataFrame indexed by
+            date with (field, symbol) columns
 
         Returns
         -------
-        list
+        list or pandas.DataFrame
             Stocks Chart endpoint data
         """
-        return {symbol: self.data_set[symbol]["chart"] for symbol in
-                self.data_set.keys()}
+        self._ensure_endpoints(["chart"])
+        charts = dict((symbol, self.data_set[symbol]["chart"]) for symbol in
+                      self.data_set.keys())
+        if self.output_format == 'pandas':
+            with format_timer("stock/chart", "pandas"):
+                return build_chart_frame(charts, layout=layout)
+        charts = self._expand(charts)
+        if self.key == 'share':
+            return charts[self.symbols[0]]
+        return charts
 
     def get_open_close(self):
         """
@@ -246,7 +714,7 @@ class StockReader(_IEXBase):
         """
         return self.get_ohlc()
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["previous"])
     def get_previous(self):
         """
         Reference: https://iextrading.com/developer/docs/#previous
@@ -259,7 +727,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["previous"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["company"])
     def get_company(self):
         """
         Reference: https://iextrading.com/developer/docs/#company
@@ -272,7 +740,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["company"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["stats"])
     def get_key_stats(self):
         """
         Reference: https://iextrading.com/developer/docs/#key-stats
@@ -285,7 +753,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["stats"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["peers"])
     def get_peers(self):
         """
         Reference:https://iextrading.com/developer/docs/#peers
@@ -298,7 +766,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["peers"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["relevant"])
     def get_relevant(self):
         """
         Reference: https://iextrading.com/developer/docs/#relevant
@@ -311,7 +779,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["relevant"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["news"])
     def get_news(self):
         """Returns the Stocks News endpoint (list or pandas)
 
@@ -325,7 +793,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["news"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["financials"])
     def get_financials(self):
         """
         Reference: https://iextrading.com/developer/docs/#financials
@@ -338,7 +806,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["financials"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["earnings"])
     def get_earnings(self):
         """
         Reference: https://iextrading.com/developer/docs/#earnings
@@ -351,7 +819,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["earnings"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["dividends"])
     def get_dividends(self):
         """
         Reference: https://iextrading.com/developer/docs/#dividends
@@ -364,7 +832,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["dividends"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["splits"])
     def get_splits(self):
         """
         Reference: https://iextrading.com/developer/docs/#splits
@@ -377,7 +845,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["splits"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["logo"])
     def get_logo(self):
         """
         Reference: https://iextrading.com/developer/docs/#logo
@@ -390,7 +858,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["logo"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["price"])
     def get_price(self):
         """
         Reference: https://iextrading.com/developer/docs/#price
@@ -407,7 +875,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["price"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["delayed-quote"])
     def get_delayed_quote(self):
         """
         Reference: https://iextrading.com/developer/docs/#delayed-quote
@@ -420,7 +888,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["delayed-quote"] for symbol in
                 self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["effective-spread"])
     def get_effective_spread(self):
         """
         Reference:  https://iextrading.com/developer/docs/#effective-spread
@@ -433,7 +901,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["effective-spread"] for symbol
                 in self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["volume-by-venue"])
     def get_volume_by_venue(self):
         """
         Reference:  https://iextrading.com/developer/docs/#volume-by-venue
@@ -446,7 +914,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["volume-by-venue"] for symbol
                 in self.data_set.keys()}
 
-    @output_format(override=None)
+    @output_format(override=None, endpoints=["ohlc"])
     def get_ohlc(self):
         """
         Reference:  https://iextrading.com/developer/docs/#ohlc
@@ -459,7 +927,7 @@ class StockReader(_IEXBase):
         return {symbol: self.data_set[symbol]["ohlc"] for symbol
                 in self.data_set.keys()}
 
-    def get_time_series(self):
+    def get_time_series(self, layout="long"):
         """
         Reference: https://iextrading.com/developer/docs/#time-series
 
@@ -473,117 +941,76 @@ class StockReader(_IEXBase):
         list or pandas.DataFrame
             Stocks Time Series (Chart) endpoint data
         """
-        return self.get_chart()
+        return self.get_chart(layout=layout)
 
     # field methods
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_company_name(self):
-        return {symbol: self.get_quote()[symbol]["companyName"]
-                if self.key == 'batch' else self.get_quote()['companyName']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "companyName")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_primary_exchange(self):
-        return {symbol: self.get_quote()[symbol]["primaryExchange"]
-                if self.key == 'batch' else self.get_quote()['primaryExchange']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "primaryExchange")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_sector(self):
-        return {symbol: self.get_quote()[symbol]["sector"]
-                if self.key == 'batch' else self.get_quote()['sector']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "sector")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_open(self):
-        return {symbol: self.get_quote()[symbol]["open"]
-                if self.key == 'batch' else self.get_quote()['open']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "open")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_close(self):
-        return {symbol: self.get_quote()[symbol]["close"]
-                if self.key == 'batch' else self.get_quote()['close']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "close")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_years_high(self):
-        return {symbol: self.get_quote()[symbol]["week52High"]
-                if self.key == 'batch' else self.get_quote()['week52High']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "week52High")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_years_low(self):
-        return {symbol: self.get_quote()[symbol]["week52Low"]
-                if self.key == 'batch' else self.get_quote()['week52Low']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "week52Low")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_ytd_change(self):
-        return {symbol: self.get_quote()[symbol]["ytdChange"]
-                if self.key == 'batch' else self.get_quote()['ytdChange']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "ytdChange")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_volume(self):
-        return {symbol: self.get_quote()[symbol]["latestVolume"]
-                if self.key == 'batch' else self.get_quote()['latestVolume']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "latestVolume")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["quote"])
     def get_market_cap(self):
-        return {symbol: self.get_quote()[symbol]["marketCap"]
-                if self.key == 'batch' else self.get_quote()['marketCap']
-                for symbol in self.data_set.keys()}
+        return self._get_field("quote", "marketCap")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_beta(self):
-        return {symbol: self.get_key_stats()[symbol]["beta"]
-                if self.key == 'batch' else
-                self.get_key_stats()['beta'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "beta")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_short_interest(self):
-        return {symbol: self.get_key_stats()[symbol]["shortInterest"]
-                if self.key == 'batch' else
-                self.get_key_stats()['shortInterest'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "shortInterest")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_short_ratio(self):
-        return {symbol: self.get_key_stats()[symbol]["shortRatio"]
-                if self.key == 'batch' else
-                self.get_key_stats()['shortRatio'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "shortRatio")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_latest_eps(self):
-        return {symbol: self.get_key_stats()[symbol]["latestEPS"]
-                if self.key == 'batch' else
-                self.get_key_stats()['latestEPS'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "latestEPS")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_shares_outstanding(self):
-        return {symbol: self.get_key_stats()[symbol]["sharesOutstanding"]
-                if self.key == 'batch' else
-                self.get_key_stats()['sharesOutstanding'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "sharesOutstanding")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_float(self):
-        return {symbol: self.get_key_stats()[symbol]["float"]
-                if self.key == 'batch' else
-                self.get_key_stats()['float'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "float")
 
-    @output_format(override='json')
+    @output_format(override='json', endpoints=["stats"])
     def get_eps_consensus(self):
-        return {symbol: self.get_key_stats()[symbol]["consensusEPS"]
-                if self.key == 'batch' else
-                self.get_key_stats()['consensusEPS'] for symbol in
-                self.data_set.keys()}
+        return self._get_field("stats", "consensusEPS")
 
 
 class HistoricalReader(_IEXBase):
@@ -597,9 +1024,35 @@ class HistoricalReader(_IEXBase):
 
     Keyword Arguments:
         output_format: Desired output format (json by default)
+        layout: Layout of the pandas output: "dict" (default) for a
+            DataFrame per symbol, "long" for a single DataFrame indexed by
+            (symbol, date), "wide" for a DataFrame indexed by date with
+            (field, symbol) columns
+        store: BarStore (see iexfinance.utils.barstore) storing the bars.
+            Defaults to the persistent cache, if enabled
+        max_workers: Number of queries sent concurrently (4 by default)
+
+    The smallest chart range reaching back to start is downloaded. Settled
+    bars (up to the previous day) are stored in the bar store or the
+    persistent cache if one is enabled (see iexfinance.utils.diskcache):
+    symbols whose stored bars cover start to end are not downloaded again,
+    and symbols whose stored bars cover the beginning of the period are only
+    downloaded from the day after their last stored bar.
+
+    Symbols are downloaded in batches of at most 100 symbols and about
+    25,000 bars (e.g. 19 symbols for 5y), sent concurrently. iter_fetch
+    yields the output of each batch as soon as it is downloaded.
 
     Reference: https://iextrading.com/developer/docs/#chart
     """
+    # Chart ranges, and the number of months they cover
+    _CHART_RANGES = [("1m", 1), ("3m", 3), ("6m", 6), ("1y", 12), ("2y", 24),
+                     ("5y", 60)]
+    # Maximum number of symbols and of expected bars (about 21 per month)
+    # in a single batch request
+    _MAX_SYMBOLS = 100
+    _MAX_BARS = 25000
+    _BARS_PER_MONTH = 21
 
     def __init__(self, symbols, start, end, output_format='json', **kwargs):
         if isinstance(symbols, list) and len(symbols) > 1:
@@ -614,7 +1067,31 @@ class HistoricalReader(_IEXBase):
         self.start = start
         self.end = end
         self.output_format = output_format
+        self.layout = kwargs.pop("layout", "dict")
+        if self.layout not in ("dict", "long", "wide"):
+            raise ValueError("Invalid layout: " + str(self.layout))
+        # Symbols downloaded, with the first date requested, the last stored
+        # date of those downloaded from the day after it, and the symbols
+        # and range of each URL
+        self._query_symbols = self.symlist
+        self._since = {}
+        self._stored_until = {}
+        self._batch = self.symlist
+        self._range = None
+        self._url_chunks = []
+        store = kwargs.pop("store", None)
+        kwargs.setdefault("max_workers", 4)
         super(HistoricalReader, self).__init__(**kwargs)
+        if self.filter:
+            # Bars are stored and formatted with all their OHLCV fields
+            raise ValueError("filter is not supported for historical data")
+        if self.symbol_index is not None:
+            symlist, unknown = self.symbol_index.validate(self.symlist)
+            if unknown:
+                raise IEXSymbolError(unknown[0])
+            self.symlist = self._query_symbols = self._batch = symlist
+            self.symbols = symlist if self.type == "Batch" else symlist[0]
+        self.store = store if store is not None else self.disk_cache
 
     @property
     def url(self):
@@ -624,60 +1101,203 @@ class HistoricalReader(_IEXBase):
     def key(self):
         return self.type
 
-    @property
-    def chart_range(self):
-        """ Calculates the chart range from start and end. Downloads larger
-        datasets (5y and 2y) when necessary, but defaults to 1y for performance
-        reasons
-        """
-        delta = datetime.datetime.now().year - self.start.year
-        if 2 <= delta <= 5:
-            return "5y"
-        elif 1 <= delta <= 2:
-            return "2y"
-        elif 0 <= delta < 1:
-            return "1y"
-        else:
+    def _chart_range(self, since):
+        """ Returns the smallest chart range reaching back to the date since
+        """
+        today = _today()
+        starts = [(_months_before(today, months), name) for name, months
+                  in self._CHART_RANGES]
+        starts.append((datetime.date(today.year, 1, 1), "ytd"))
+        covering = [s for s in starts if s[0] <= since]
+        if not covering:
             raise ValueError(
                 "Invalid date specified. Must be within past 5 years.")
+        return max(covering)[1]
+
+    @property
+    def chart_range(self):
+        """ The smallest chart range covering start to the current date
+        """
+        return self._chart_range(_as_date(self.start))
 
     @property
     def params(self):
-        if self.type is "Batch":
-            syms = ",".join(self.symbols)
-        else:
-            syms = self.symbols
         params = {
-            "symbols": syms,
+            "symbols": ",".join(self._batch),
             "types": "chart",
-            "range": self.chart_range
+            "range": self._range or self.chart_range
         }
         return params
 
-    def fetch(self):
-        response = super(HistoricalReader, self).fetch()
+    def _is_stored(self, symbol):
+        return (self.store is not None and
+                self.store.covers(symbol, self.start, self.end))
+
+    def _store_bars(self, symbol, bars):
+        if self.store is None or not bars:
+            return
+        # The bars cover the dates requested, the first bar may be later
+        first = min(bar["date"] for bar in bars)
+        since = self._since.get(symbol)
+        if since is not None:
+            first = min(first, since.strftime("%Y-%m-%d"))
+        settled = (_today() - datetime.timedelta(days=1)).strftime(
+            "%Y-%m-%d")
+        if first <= settled:
+            self.store.put_bars(symbol, bars, first, settled)
+
+    def _first_missing_date(self, symbol, start):
+        """ Returns the day after the stored bars of symbol if they cover
+        start, or start
+        """
+        if self.store is None:
+            return start
+        coverage = self.store.get_coverage(symbol)
+        if coverage is None:
+            return start
+        last = datetime.datetime.strptime(coverage[1], "%Y-%m-%d").date()
+        following = last + datetime.timedelta(days=1)
+        if coverage[0] <= start.strftime("%Y-%m-%d") and start <= following:
+            self._stored_until[symbol] = coverage[1]
+            return following
+        return start
+
+    def _chunk_size(self, chart_range):
+        """ Returns the number of symbols downloaded per query for a range
+        """
+        months = dict(self._CHART_RANGES).get(chart_range, _today().month)
+        bars = months * self._BARS_PER_MONTH
+        return max(1, min(self._MAX_SYMBOLS, self._MAX_BARS // bars))
+
+    def _get_urls(self):
+        start = _as_date(self.start)
+        self._since = {}
+        self._stored_until = {}
+        self._query_symbols = []
+        self._url_chunks = []
+        groups = {}
+        ranges = []
         for sym in self.symlist:
-            if sym not in list(response):
-                raise IEXSymbolError(sym)
-        return self._output_format(response)
+            if self._is_stored(sym):
+                continue
+            self._query_symbols.append(sym)
+            since = self._since[sym] = self._first_missing_date(sym, start)
+            chart_range = self._chart_range(since)
+            if chart_range not in groups:
+                ranges.append(chart_range)
+            groups.setdefault(chart_range, []).append(sym)
+        urls = []
+        # Queries per range, so that each symbol only gets what it lacks
+        for chart_range in ranges:
+            self._range = chart_range
+            symbols = groups[chart_range]
+            size = self._chunk_size(chart_range)
+            for i in range(0, len(symbols), size):
+                self._batch = symbols[i:i + size]
+                urls.append(self._prepare_query())
+                self._url_chunks.append(self._batch)
+        self._range = None
+        self._batch = self.symlist
+        return urls
+
+    def _load_stored(self):
+        """ Returns the stored bars of the symbols not downloaded
+        """
+        return dict((sym, {"chart": self.store.get_bars(sym, self.start,
+                                                        self.end)})
+                    for sym in self.symlist if sym not in self._query_symbols)
 
-    def _output_format(self, out):
-        result = {}
-        for symbol in self.symlist:
-            d = out.pop(symbol)["chart"]
-            df = pd.DataFrame(d)
-            df.set_index("date", inplace=True)
-            values = ["open", "high", "low", "close", "volume"]
-            df = df[values]
-            sstart = self.start.strftime('%Y-%m-%d')
-            send = self.end.strftime('%Y-%m-%d')
-            df = df.loc[sstart:send]
-            result.update({symbol: df})
-        if self.output_format is "pandas":
-            if len(result) > 1:
-                return result
-            return result[self.symbols]
-        else:
-            for sym in list(result):
-                result[sym] = result[sym].to_dict('index')
+    def _load_chunk(self, symbols, response):
+        """ Stores the downloaded bars of symbols, completed with their
+        stored bars
+        """
+        out = {}
+        for sym in symbols:
+            if sym not in response:
+                raise IEXSymbolError(sym)
+            bars = response[sym]["chart"]
+            self._store_bars(sym, bars)
+            stored_until = self._stored_until.get(sym)
+            if stored_until is not None:
+                bars = self.store.get_bars(sym, self.start, stored_until) + [
+                    bar for bar in bars if bar["date"] > stored_until]
+            out[sym] = {"chart": bars}
+        return out
+
+    def _format_responses(self, responses):
+        out = self._load_stored()
+        for chunk, response in zip(self._url_chunks, responses):
+            out.update(self._load_chunk(chunk, response))
+        return self._output_format(out)
+
+    def iter_fetch(self):
+        """ Downloads the batches of symbols concurrently, yielding the
+        output of each batch as soon as it is downloaded
+
+        Symbols read from the bar store are yielded first. Each output holds
+        the symbols of its batch, in the output format and layout of the
+        reader, so that large downloads are parsed while the following
+        batches are downloading.
+        """
+        urls = self._get_urls()
+        chunks = list(self._url_chunks)
+        stored = [sym for sym in self.symlist
+                  if sym not in self._query_symbols]
+        if stored:
+            yield self._output_format(self._load_stored(), stored)
+        if not urls:
+            return
+        with ThreadPoolExecutor(max(1, min(self.max_workers,
+                                           len(urls)))) as pool:
+            futures = dict((pool.submit(self._execute_iex_query, url), chunk)
+                           for url, chunk in zip(urls, chunks))
+            for future in as_completed(futures):
+                chunk = futures[future]
+                yield self._output_format(
+                    self._load_chunk(chunk, future.result()), chunk)
+
+    def _output_format(self, out, symbols=None):
+        symbols = symbols or self.symlist
+        if self.output_format == "pandas" and self.layout != "dict":
+            charts = dict((symbol, out.pop(symbol)["chart"])
+                          for symbol in symbols)
+            with format_timer("stock/chart", self.output_format):
+                return build_chart_frame(charts, OHLCV, self.start, self.end,
+                                         self.layout)
+        with format_timer("stock/chart", self.output_format):
+            result = {}
+            for symbol in symbols:
+                bars = self._slice_bars(out.pop(symbol)["chart"])
+                if self.output_format == "pandas":
+                    result[symbol] = self._bar_frame(bars)
+                else:
+                    result[symbol] = dict(
+                        (bar["date"], dict((name, bar.get(name))
+                                           for name, _ in DAILY_BAR))
+                        for bar in bars)
+            if self.output_format == "pandas" and self.type != "Batch":
+                return result[self.symbols]
             return result
+
+    def _slice_bars(self, bars):
+        """ Returns the bars dated from start to end (inclusive), ordered by
+        date
+        """
+        dates = [bar["date"] for bar in bars]
+        if dates != sorted(dates):
+            order = sorted(range(len(bars)), key=dates.__getitem__)
+            bars = [bars[i] for i in order]
+            dates = [dates[i] for i in order]
+        first = bisect.bisect_left(dates, self.start.strftime('%Y-%m-%d'))
+        last = bisect.bisect_right(dates, self.end.strftime('%Y-%m-%d'))
+        return bars[first:last]
+
+    @staticmethod
+    def _bar_frame(bars):
+        """ Builds the typed OHLCV frame of bars, indexed by date
+        """
+        columns = dict((name, [bar.get(name) for bar in bars])
+                       for name, _ in DAILY_BAR)
+        dates = np.array([bar["date"] for bar in bars], dtype="M8[D]")
+        index = pd.DatetimeIndex(dates, name="date")
+        return build_frame(index, columns, DAILY_BAR)
@@ -1,7 +1,162 @@
-import requests
-
-
-def _init_session(session, retry_count=3):
-    if session is None:
-        session = requests.session()
-    return session
+import threading
+
+import requests
+from requests.packages.urllib3.util.retry import Retry
+
+from iexfinance.utils.decoders import json_loads
+from iexfinance.utils.metrics import InstrumentedAdapter
+
+# Default transport settings shared by every reader. pool_connections is the
+# number of per-host connection pools kept alive, pool_maxsize the maximum
+# number of connections kept open to a single host.
+_TRANSPORT_DEFAULTS = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "pool_block": False,
+    "keep_alive": True
+}
+_TRANSPORT_CONFIG = dict(_TRANSPORT_DEFAULTS)
+
+# Shared sessions, keyed by (retry_count, transport settings)
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def configure_transport(**kwargs):
+    """
+    Configures the pooled HTTP transport shared by all readers
+
+    Parameters
+    ----------
+    pool_connections: int, default 10
+        Number of per-host connection pools to cache
+    pool_maxsize: int, default 10
+        Maximum number of connections kept open to a single host
+    pool_block: bool, default False
+        Whether to block when the pool for a host is exhausted rather than
+        opening (and then discarding) an extra connection
+    keep_alive: bool, default True
+        Whether to reuse connections between requests
+
+    Notes
+    -----
+    Sessions created with the previous settings are closed. Readers
+    constructed afterwards use the new settings.
+    """
+    for key in kwargs:
+        if key not in _TRANSPORT_DEFAULTS:
+            raise ValueError("Invalid transport option: " + key)
+    with _SESSIONS_LOCK:
+        _TRANSPORT_CONFIG.update(kwargs)
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+def reset_transport():
+    """
+    Restores the default transport settings and closes shared sessions
+    """
+    with _SESSIONS_LOCK:
+        _TRANSPORT_CONFIG.clear()
+        _TRANSPORT_CONFIG.update(_TRANSPORT_DEFAULTS)
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
+
+
+def _build_session(retry_count, pool_connections, pool_maxsize, pool_block,
+                   keep_alive):
+    session = requests.session()
+    # Adapter-level retries only cover connection and read failures; HTTP
+    # status codes are left to the reader's own retry logic.
+    retries = Retry(total=retry_count, status=0, raise_on_status=False,
+                    respect_retry_after_header=False)
+    adapter = InstrumentedAdapter(pool_connections=pool_connections,
+                                  pool_maxsize=pool_maxsize,
+                                  pool_block=pool_block,
+                                  max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def _init_session(session, retry_count=3):
+    """
+    Returns the given session, or the shared pooled session for retry_count
+    if session is None
+    """
+    if session is None:
+        key = (retry_count,) + tuple(sorted(_TRANSPORT_CONFIG.items()))
+        with _SESSIONS_LOCK:
+            session = _SESSIONS.get(key)
+            if session is None:
+                session = _build_session(retry_count, **_TRANSPORT_CONFIG)
+                _SESSIONS[key] = session
+    return session
+
+
+def get_transport_stats(session=None):
+    """
+    Reports connection pool usage
+
+    Parameters
+    ----------
+    session: requests.Session, default None, optional
+        Session to inspect. If omitted, all shared sessions are inspected.
+
+    Returns
+    -------
+    list
+        One dictionary per host pool, containing the host, the number of
+        connections opened and requests made, the number of idle pooled
+        connections, and the pool's maximum size
+    """
+    if session is None:
+        with _SESSIONS_LOCK:
+            sessions = list(_SESSIONS.values())
+    else:
+        sessions = [session]
+    stats = []
+    for sess in sessions:
+        seen = set()
+        for adapter in sess.adapters.values():
+            if id(adapter) in seen or not hasattr(adapter, "poolmanager"):
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats.append({
+                    "host": "{}://{}:{}".format(pool.scheme, pool.host,
+                                                pool.port),
+                    "num_connections": pool.num_connections,
+                    "num_requests": pool.num_requests,
+                    "idle": pool.pool.qsize() if pool.pool else 0,
+                    "maxsize": pool.pool.maxsize if pool.pool else 0
+                })
+    return stats
+
+
+class _BufferedResponse(object):
+    """
+    Fully-read response body exposing the subset of the requests.Response
+    interface used by the readers' response validators
+    """
+    def __init__(self, content, status_code=200, headers=None,
+                 encoding=None):
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, "replace")
+
+    def json(self):
+        return json_loads(self.content)
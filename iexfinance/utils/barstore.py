@@ -0,0 +1,276 @@
+"""
+Local columnar store of daily chart bars
+
+Each symbol's bars are kept in a file of fixed-size binary records (date,
+open, high, low, close and volume), sorted by date, which is memory-mapped
+for reading. New bars are appended to the end of the file, so nightly
+updates only write the bars of the day, and date ranges are located by
+binary search without loading the file.
+
+A BarStore can be passed to HistoricalReader (and get_historical_data) with
+the ``store`` keyword: settled bars are stored as they are downloaded, and
+only the bars missing from the store are downloaded::
+
+    store = BarStore("/path/to/bars")
+    get_historical_data(symbols, start, end, store=store)
+    frame = store.load(symbols, start, end)
+
+Writes are serialized within a process. A store should not be updated by
+several processes at once.
+"""
+import datetime
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from iexfinance.utils.diskcache import _date_str, _default_directory
+
+_replace = getattr(os, "replace", os.rename)
+
+
+def _day(date):
+    return np.datetime64(_date_str(date), "D")
+
+
+class BarStore(object):
+    """
+    Per-symbol, memory-mapped files of settled daily chart bars
+
+    Along with its bars, the date range each symbol's downloads covered is
+    recorded (see get_coverage), as some days of a range have no bars.
+
+    Parameters
+    ----------
+    directory: str, default None, optional
+        Directory of the files. Defaults to ~/.cache/iexfinance/bars
+    """
+    FIELDS = ("open", "high", "low", "close", "volume")
+    # Volumes are stored as integers, as downloaded
+    DTYPE = np.dtype([("date", "<M8[D]")] + [(f, "<f8") for f in FIELDS[:-1]]
+                     + [("volume", "<i8")])
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(_default_directory(),
+                                                   "bars")
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, suffix=".bars"):
+        name = symbol.upper().replace(os.sep, "_")
+        return os.path.join(self.directory, name + suffix)
+
+    def _records(self, symbol):
+        """
+        Returns the stored records of symbol, memory-mapped
+        """
+        path = self._path(symbol)
+        try:
+            count = os.path.getsize(path) // self.DTYPE.itemsize
+        except OSError:
+            count = 0
+        if not count:
+            return np.empty(0, dtype=self.DTYPE)
+        return np.memmap(path, dtype=self.DTYPE, mode="r", shape=(count,))
+
+    def _to_records(self, bars):
+        records = np.empty(len(bars), dtype=self.DTYPE)
+        records["date"] = np.array([bar["date"] for bar in bars],
+                                   dtype="M8[D]")
+        for field in self.FIELDS[:-1]:
+            records[field] = np.array([bar.get(field) for bar in bars],
+                                      dtype="f8")
+        # A missing volume is stored as 0, integers having no NaN
+        records["volume"] = [bar.get("volume") or 0 for bar in bars]
+        if not len(records):
+            return records
+        records = records[np.argsort(records["date"], kind="mergesort")]
+        # Keep the last of several bars of the same date
+        last = np.append(records["date"][1:] != records["date"][:-1], True)
+        return records[last]
+
+    def _write(self, symbol, records):
+        path = self._path(symbol)
+        with open(path + ".tmp", "wb") as f:
+            f.write(records.tobytes())
+        _replace(path + ".tmp", path)
+
+    def _append(self, symbol, records, later_only=False):
+        stored = self._records(symbol)
+        if len(stored) and later_only:
+            records = records[records["date"] > stored["date"][-1]]
+        elif len(stored):
+            # Settled bars never change: only new dates are written
+            records = records[~np.isin(records["date"], stored["date"])]
+        if not len(records):
+            return 0
+        if not len(stored) or records["date"][0] > stored["date"][-1]:
+            path = self._path(symbol)
+            with open(path, "ab") as f:
+                # Drop a record left incomplete by an interrupted write
+                size = f.tell()
+                f.truncate(size - size % self.DTYPE.itemsize)
+                f.write(records.tobytes())
+            return len(records)
+        # Bars before or among the stored ones: the file is rewritten
+        merged = np.concatenate([np.array(stored), records])
+        merged = merged[np.argsort(merged["date"], kind="mergesort")]
+        del stored
+        self._write(symbol, merged)
+        return len(records)
+
+    def append(self, symbol, bars):
+        """
+        Appends the bars of symbol later than its last stored bar
+
+        Parameters
+        ----------
+        symbol: str
+            Symbol of the bars
+        bars: list
+            Chart records (dictionaries with a "date" key)
+
+        Returns
+        -------
+        int
+            The number of bars stored
+        """
+        records = self._to_records(bars)
+        with self._lock:
+            return self._append(symbol, records, later_only=True)
+
+    def symbols(self):
+        """
+        Returns the stored symbols
+        """
+        return sorted(name[:-len(".bars")] for name in
+                      os.listdir(self.directory) if name.endswith(".bars"))
+
+    def delete(self, symbol):
+        """
+        Removes the bars of symbol
+        """
+        with self._lock:
+            for suffix in (".bars", ".range"):
+                try:
+                    os.remove(self._path(symbol, suffix))
+                except OSError:
+                    pass
+
+    def clear(self):
+        """
+        Removes all stored bars
+        """
+        for symbol in self.symbols():
+            self.delete(symbol)
+
+    def _slice(self, symbol, start=None, end=None):
+        records = self._records(symbol)
+        dates = records["date"]
+        first = 0 if start is None else np.searchsorted(dates, _day(start))
+        last = (len(records) if end is None else
+                np.searchsorted(dates, _day(end), side="right"))
+        return records[first:last]
+
+    def read(self, symbol, start=None, end=None):
+        """
+        Returns the stored bars of symbol between start and end (inclusive)
+
+        Returns
+        -------
+        pandas.DataFrame
+            OHLCV bars indexed by date
+        """
+        records = self._slice(symbol, start, end)
+        return pd.DataFrame(
+            dict((field, np.array(records[field])) for field in self.FIELDS),
+            index=pd.DatetimeIndex(np.array(records["date"]), name="date"),
+            columns=list(self.FIELDS))
+
+    def load(self, symbols=None, start=None, end=None):
+        """
+        Loads the stored bars of several symbols into a single frame
+
+        Parameters
+        ----------
+        symbols: list, default None, optional
+            Symbols to load. All stored symbols if None
+        start: str or datetime.date, default None, optional
+            First date loaded
+        end: str or datetime.date, default None, optional
+            Last date loaded
+
+        Returns
+        -------
+        pandas.DataFrame
+            OHLCV bars indexed by (symbol, date)
+        """
+        if symbols is None:
+            symbols = self.symbols()
+        parts = [self._slice(symbol, start, end) for symbol in symbols]
+        records = (np.concatenate(parts) if parts else
+                   np.empty(0, dtype=self.DTYPE))
+        owners = np.repeat(np.array(symbols, dtype=object),
+                           [len(part) for part in parts])
+        index = pd.MultiIndex.from_arrays(
+            [owners, pd.DatetimeIndex(records["date"])],
+            names=["symbol", "date"])
+        return pd.DataFrame(
+            dict((field, records[field]) for field in self.FIELDS),
+            index=index, columns=list(self.FIELDS))
+
+    # Interface shared with DiskCache, used by HistoricalReader
+    def get_coverage(self, symbol):
+        """
+        Returns the (start, end) dates (YYYY-MM-DD) covered by the stored
+        bars of symbol, or None
+        """
+        try:
+            with open(self._path(symbol, ".range")) as f:
+                return tuple(f.read().split())
+        except IOError:
+            return None
+
+    def covers(self, symbol, start, end):
+        """
+        Returns True if the stored bars of symbol cover [start, end]
+        """
+        coverage = self.get_coverage(symbol)
+        return (coverage is not None and coverage[0] <= _date_str(start) and
+                _date_str(end) <= coverage[1])
+
+    def put_bars(self, symbol, bars, start, end):
+        """
+        Stores settled chart bars of symbol downloaded for [start, end]
+        (see DiskCache.put_bars)
+        """
+        start, end = _date_str(start), _date_str(end)
+        records = self._to_records([bar for bar in bars
+                                    if bar["date"] <= end])
+        with self._lock:
+            self._append(symbol, records)
+            coverage = self.get_coverage(symbol)
+            if coverage is not None:
+                # Merge with the existing range when the two overlap
+                prev = (datetime.datetime.strptime(start, "%Y-%m-%d") -
+                        datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+                if coverage[0] <= end and prev <= coverage[1]:
+                    start = min(start, coverage[0])
+                    end = max(end, coverage[1])
+            path = self._path(symbol, ".range")
+            with open(path + ".tmp", "w") as f:
+                f.write(start + " " + end)
+            _replace(path + ".tmp", path)
+
+    def get_bars(self, symbol, start, end):
+        """
+        Returns the stored chart bars of symbol between start and end
+        (inclusive), ordered by date
+        """
+        records = self._slice(symbol, start, end)
+        dates = np.datetime_as_string(records["date"])
+        columns = [records[field].tolist() for field in self.FIELDS]
+        return [dict(zip(self.FIELDS, values), date=date)
+                for date, values in zip(dates.tolist(), zip(*columns))]
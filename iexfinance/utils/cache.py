@@ -0,0 +1,256 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+_clock = getattr(time, "monotonic", time.time)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Freshness (in seconds) per endpoint. None caches forever, 0 disables
+# caching. Stock endpoints are keyed by type, other endpoints by path.
+DEFAULT_TTLS = {
+    # Stocks - real-time
+    "quote": 5,
+    "price": 5,
+    "book": 1,
+    "ohlc": 5,
+    "open-close": 5,
+    "delayed-quote": 5,
+    "effective-spread": MINUTE,
+    "volume-by-venue": MINUTE,
+    # Stocks - intraday
+    "chart": MINUTE,
+    "news": 5 * MINUTE,
+    # Stocks - daily
+    "previous": HOUR,
+    "stats": HOUR,
+    "relevant": HOUR,
+    "financials": 12 * HOUR,
+    "earnings": 12 * HOUR,
+    "dividends": 12 * HOUR,
+    "splits": 12 * HOUR,
+    "company": 12 * HOUR,
+    "logo": 12 * HOUR,
+    "peers": 12 * HOUR,
+    # IEX Market Data
+    "tops": 1,
+    "tops/last": 1,
+    "deep": 1,
+    "deep/book": 1,
+    # IEX Stats. Historical summaries of past periods never change
+    "stats/intraday": MINUTE,
+    "stats/recent": 5 * MINUTE,
+    "stats/records": HOUR,
+    "stats/historical": HOUR,
+    "stats/historical/daily": 5 * MINUTE,
+    "stats/historical/past": None,
+    # Reference Data
+    "ref-data/symbols": DAY,
+    "daily-list": HOUR
+}
+
+
+def _api_path(url):
+    """
+    Returns the endpoint path of a query URL, without the API version
+    (e.g. stock/market/batch) and its query parameters
+    """
+    parsed = urlparse(url)
+    segments = [s for s in parsed.path.split("/") if s]
+    if segments and segments[0][0].isdigit():
+        segments = segments[1:]
+    return "/".join(segments), parse_qs(parsed.query)
+
+
+def cache_ttl(url, ttls=None, now=None):
+    """
+    Returns the freshness (in seconds) of the response to a query URL
+
+    Batch queries are as fresh as their most volatile type. Historical
+    summaries of past months and days never expire.
+
+    Parameters
+    ----------
+    url: str
+        Query URL
+    ttls: dict, default None, optional
+        Freshness per endpoint, defaults to DEFAULT_TTLS
+    now: datetime.datetime, default None, optional
+        Current time, used to find past historical periods
+
+    Returns
+    -------
+    float or None
+        Seconds until the response expires (None never expires, 0 is not
+        cacheable)
+    """
+    ttls = DEFAULT_TTLS if ttls is None else ttls
+    path, params = _api_path(url)
+    segments = path.split("/")
+    if segments[0] == "stock":
+        if segments[1:3] == ["market", "batch"]:
+            types = ",".join(params.get("types", [])).split(",")
+        else:
+            types = segments[2:3]
+        values = [ttls.get(t, 0) for t in types if t]
+        if not values:
+            return 0
+        finite = [v for v in values if v is not None]
+        return min(finite) if finite else None
+    if path in ("stats/historical", "stats/historical/daily"):
+        date = params.get("date", [None])[0]
+        now = now or datetime.now()
+        if date is not None and date < now.strftime("%Y%m%d")[:len(date)]:
+            return ttls.get("stats/historical/past", 0)
+    if segments[0] == "daily-list":
+        path = "daily-list"
+    return ttls.get(path, 0)
+
+
+class ResponseCache(object):
+    """
+    Thread-safe in-memory cache of raw API responses, keyed by URL
+
+    Entries expire according to per-endpoint freshness policies (see
+    cache_ttl) and the least recently used entries are evicted once the
+    cached bodies exceed max_bytes.
+
+    Parameters
+    ----------
+    max_bytes: int, default 64 MiB
+        Budget for the total size of cached response bodies
+    ttls: dict, default None, optional
+        Freshness per endpoint, merged over DEFAULT_TTLS
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttls=None):
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url):
+        """
+        Returns the cached response body for url, or None
+        """
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                content, expires = entry
+                if expires is None or expires > _clock():
+                    # Re-insert as most recently used
+                    self._entries[url] = entry
+                    self.hits += 1
+                    return content
+                self.size -= len(content)
+            self.misses += 1
+            return None
+
+    def put(self, url, content, ttl=False):
+        """
+        Caches a response body
+
+        Parameters
+        ----------
+        url: str
+            Query URL
+        content: bytes
+            Raw response body
+        ttl: float or None, optional
+            Freshness in seconds (None never expires). Computed from the
+            endpoint policies if omitted
+        """
+        if ttl is False:
+            ttl = cache_ttl(url, self.ttls)
+        if ttl == 0 or len(content) > self.max_bytes:
+            return
+        expires = None if ttl is None else _clock() + ttl
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[url] = (content, expires)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def get_stats(self):
+        """
+        Returns the cache's hit/miss counters and size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_bytes": self.max_bytes
+            }
+
+
+_CACHE = None
+
+
+def enable_cache(max_bytes=64 * 1024 * 1024, ttls=None):
+    """
+    Enables the process-wide response cache used by all readers
+
+    Parameters
+    ----------
+    max_bytes: int, default 64 MiB
+        Budget for the total size of cached response bodies
+    ttls: dict, default None, optional
+        Freshness per endpoint, merged over DEFAULT_TTLS
+
+    Returns
+    -------
+    ResponseCache
+        The process-wide cache
+    """
+    global _CACHE
+    _CACHE = ResponseCache(max_bytes=max_bytes, ttls=ttls)
+    return _CACHE
+
+
+def disable_cache():
+    """
+    Disables the process-wide response cache
+    """
+    global _CACHE
+    _CACHE = None
+
+
+def get_cache():
+    """
+    Returns the process-wide response cache, or None if disabled
+    """
+    return _CACHE
@@ -0,0 +1,192 @@
+"""
+Compact in-memory representation of decoded responses
+
+Decoded JSON holds a dict per record and a Python object per value. For
+large data sets (e.g. a StockReader of many symbols keeping every
+endpoint), compact stores:
+
+- the keys of all dictionaries as a single shared string per field name
+- lists of records (chart bars, news, dividends...) as Records, which hold
+  a column per field, numeric columns being numpy arrays
+
+expand gives back the plain structure, so that compacted data is only
+materialized when it is read.
+"""
+import sys
+
+import numpy as np
+
+# Shared field names (see compact)
+_KEYS = {}
+
+# Placeholder of the fields missing from a record
+_MISSING = object()
+
+# Minimum length of the numeric columns stored as arrays, below which an
+# array takes more memory than the values
+_MIN_ARRAY = 16
+
+
+def _key(key):
+    return _KEYS.setdefault(key, key)
+
+
+def _column(values):
+    """
+    Returns a numpy array of values if they are all integers or all floats,
+    or values otherwise
+    """
+    if len(values) < _MIN_ARRAY:
+        return values
+    types = set(type(value) for value in values)
+    if types == {int}:
+        try:
+            return np.array(values, dtype="int64")
+        except OverflowError:
+            return values
+    if types == {float}:
+        return np.array(values, dtype="float64")
+    return values
+
+
+class Records(object):
+    """
+    Read-only sequence of records (dictionaries) stored by column
+
+    Records are rebuilt, as dictionaries of plain Python values, when
+    accessed.
+
+    Parameters
+    ----------
+    records: list
+        Dictionaries with string keys
+    """
+    __slots__ = ("fields", "columns", "_length")
+
+    def __init__(self, records):
+        fields = []
+        known = set()
+        for record in records:
+            for field in record:
+                if field not in known:
+                    known.add(field)
+                    fields.append(field)
+        self.fields = tuple(_key(field) for field in fields)
+        self.columns = tuple(
+            _column([compact(record.get(field, _MISSING))
+                     for record in records]) for field in fields)
+        self._length = len(records)
+
+    def __len__(self):
+        return self._length
+
+    def _record(self, values):
+        return dict((field, value) for field, value in zip(self.fields, values)
+                    if value is not _MISSING)
+
+    def __iter__(self):
+        columns = [column.tolist() if isinstance(column, np.ndarray)
+                   else column for column in self.columns]
+        for values in zip(*columns):
+            yield expand(self._record(values))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("record index out of range")
+        return expand(self._record(
+            column[i].item() if isinstance(column, np.ndarray)
+            else column[i] for column in self.columns))
+
+    def __eq__(self, other):
+        if isinstance(other, Records):
+            other = list(other)
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Records(%d records, fields: %s)" % (
+            self._length, ", ".join(self.fields))
+
+    def tolist(self):
+        """
+        Returns the records as a list of dictionaries
+        """
+        return list(self)
+
+
+def compact(obj):
+    """
+    Returns a compact copy of decoded JSON: dictionary keys are shared and
+    lists of dictionaries become Records
+    """
+    if isinstance(obj, dict):
+        return dict((_key(key), compact(value)) for key, value in obj.items())
+    if isinstance(obj, list):
+        if len(obj) > 1 and all(isinstance(item, dict) for item in obj):
+            return Records(obj)
+        return [compact(item) for item in obj]
+    return obj
+
+
+def expand(obj):
+    """
+    Returns obj with all Records turned back into lists of dictionaries.
+    Containers without Records are returned as they are
+    """
+    if isinstance(obj, Records):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        expanded = None
+        for key, value in obj.items():
+            new = expand(value)
+            if new is not value:
+                if expanded is None:
+                    expanded = dict(obj)
+                expanded[key] = new
+        return obj if expanded is None else expanded
+    if isinstance(obj, list):
+        items = [expand(item) for item in obj]
+        if any(new is not old for new, old in zip(items, obj)):
+            return items
+    return obj
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Estimates the memory used by obj and the objects it holds, in bytes
+
+    Objects reached several times (e.g. shared keys) are counted once.
+
+    Parameters
+    ----------
+    obj: object
+        Decoded JSON, possibly compacted
+    seen: set, default None, optional
+        Identifiers of the objects already counted, updated in place
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    elif isinstance(obj, Records):
+        size += deep_sizeof(obj.fields, seen)
+        size += deep_sizeof(obj.columns, seen)
+    elif isinstance(obj, np.ndarray) and obj.base is not None:
+        size += obj.nbytes
+    return size
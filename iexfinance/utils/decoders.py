@@ -0,0 +1,101 @@
+import json
+import sys
+
+# json.loads only accepts bytes from Python 3.6
+_STDLIB_BYTES = sys.version_info[0] == 2 or sys.version_info >= (3, 6)
+
+
+def _stdlib_loads(content):
+    if not _STDLIB_BYTES and isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return json.loads(content)
+
+
+def _orjson():
+    import orjson
+    return orjson.loads
+
+
+def _ujson():
+    import ujson
+    return ujson.loads
+
+
+def _rapidjson():
+    import rapidjson
+    return rapidjson.loads
+
+
+def _simplejson():
+    import simplejson
+    return simplejson.loads
+
+
+# Decoder factories, fastest first. Each returns a function decoding the
+# raw (UTF-8) bytes of a JSON document, or raises ImportError.
+_DECODERS = [
+    ("orjson", _orjson),
+    ("ujson", _ujson),
+    ("rapidjson", _rapidjson),
+    ("simplejson", _simplejson),
+    ("json", lambda: _stdlib_loads)
+]
+
+
+def get_json_decoder(name):
+    """
+    Returns a JSON decoding function by name
+
+    Parameters
+    ----------
+    name: str
+        One of "json" (standard library), "orjson", "ujson", "rapidjson",
+        "simplejson", or "auto" for the fastest one installed
+
+    Raises
+    ------
+    ImportError
+        If the decoder's package is not installed
+    ValueError
+        If the name is not recognised
+    """
+    if name == "auto":
+        for _, factory in _DECODERS:
+            try:
+                return factory()
+            except ImportError:
+                continue
+    for decoder_name, factory in _DECODERS:
+        if decoder_name == name:
+            return factory()
+    raise ValueError("Invalid JSON decoder: " + str(name))
+
+
+def _resolve(decoder):
+    if callable(decoder):
+        return decoder
+    return get_json_decoder(decoder)
+
+
+_JSON_DECODER = _stdlib_loads
+
+
+def set_json_decoder(decoder):
+    """
+    Sets the JSON decoder used by all readers
+
+    Parameters
+    ----------
+    decoder: str or callable
+        A decoder name (see get_json_decoder) or a function decoding the raw
+        bytes of a response body
+    """
+    global _JSON_DECODER
+    _JSON_DECODER = _resolve(decoder)
+
+
+def json_loads(content):
+    """
+    Decodes raw JSON bytes with the process-wide decoder
+    """
+    return _JSON_DECODER(content)
@@ -0,0 +1,255 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from iexfinance.utils.cache import cache_ttl
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    content BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chart_bars (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    bar TEXT NOT NULL,
+    PRIMARY KEY (symbol, date)
+);
+CREATE TABLE IF NOT EXISTS chart_coverage (
+    symbol TEXT PRIMARY KEY,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL
+);
+"""
+
+
+def _default_directory():
+    return os.path.join(os.path.expanduser("~"), ".cache", "iexfinance")
+
+
+def _date_str(date):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.strftime("%Y-%m-%d")
+    return date
+
+
+class DiskCache(object):
+    """
+    Persistent SQLite cache of immutable IEX data
+
+    Stores zlib-compressed responses of endpoints which never change (see
+    cache_ttl, e.g. IEX Stats historical summaries of past months and days)
+    and the settled daily chart bars downloaded by HistoricalReader, along
+    with the date range each symbol's bars cover.
+
+    The database uses write-ahead logging, so it can be shared by several
+    processes and threads. Nothing is loaded up front: lookups are served
+    from the database indexes.
+
+    Parameters
+    ----------
+    directory: str, default None, optional
+        Directory of the cache database (cache.sqlite). Defaults to
+        ~/.cache/iexfinance
+    timeout: float, default 30
+        Seconds to wait for a lock held by another process
+    """
+    FILENAME = "cache.sqlite"
+
+    def __init__(self, directory=None, timeout=30):
+        self.directory = directory or _default_directory()
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.path = os.path.join(self.directory, self.FILENAME)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """
+        Closes the current thread's database connection
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # Responses
+    def get(self, url):
+        """
+        Returns the cached response body for url, or None
+        """
+        row = self._connection().execute(
+            "SELECT content FROM responses WHERE url = ?", (url,)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+        return zlib.decompress(row[0])
+
+    def put(self, url, content):
+        """
+        Caches a response body if the endpoint's data is immutable
+        """
+        if cache_ttl(url) is not None:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)",
+                         (url, sqlite3.Binary(zlib.compress(content))))
+
+    # Chart bars
+    def get_coverage(self, symbol):
+        """
+        Returns the (start, end) dates (YYYY-MM-DD) covered by the stored
+        bars of symbol, or None
+        """
+        row = self._connection().execute(
+            "SELECT start, end FROM chart_coverage WHERE symbol = ?",
+            (symbol,)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def covers(self, symbol, start, end):
+        """
+        Returns True if the stored bars of symbol cover [start, end]
+        """
+        coverage = self.get_coverage(symbol)
+        covered = (coverage is not None and
+                   coverage[0] <= _date_str(start) and
+                   _date_str(end) <= coverage[1])
+        self._count(covered)
+        return covered
+
+    def put_bars(self, symbol, bars, start, end):
+        """
+        Stores settled chart bars of symbol downloaded for [start, end]
+
+        Parameters
+        ----------
+        symbol: str
+            Symbol of the bars
+        bars: list
+            Chart records (dictionaries with a "date" key)
+        start: str or datetime.date
+            First date covered by the download
+        end: str or datetime.date
+            Last settled date covered by the download. Bars after it are not
+            stored
+        """
+        start, end = _date_str(start), _date_str(end)
+        rows = [(symbol, bar["date"], json.dumps(bar)) for bar in bars
+                if bar["date"] <= end]
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chart_bars VALUES (?, ?, ?)", rows)
+            coverage = conn.execute(
+                "SELECT start, end FROM chart_coverage WHERE symbol = ?",
+                (symbol,)).fetchone()
+            if coverage is not None:
+                # Merge with the existing range when the two overlap
+                prev = (datetime.datetime.strptime(start, "%Y-%m-%d") -
+                        datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+                if coverage[0] <= end and prev <= coverage[1]:
+                    start = min(start, coverage[0])
+                    end = max(end, coverage[1])
+            conn.execute("INSERT OR REPLACE INTO chart_coverage "
+                         "VALUES (?, ?, ?)", (symbol, start, end))
+
+    def get_bars(self, symbol, start, end):
+        """
+        Returns the stored chart bars of symbol between start and end
+        (inclusive), ordered by date
+        """
+        rows = self._connection().execute(
+            "SELECT bar FROM chart_bars WHERE symbol = ? AND date >= ? AND "
+            "date <= ? ORDER BY date",
+            (symbol, _date_str(start), _date_str(end))).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear(self):
+        """
+        Removes all cached data
+        """
+        conn = self._connection()
+        with conn:
+            for table in ("responses", "chart_bars", "chart_coverage"):
+                conn.execute("DELETE FROM " + table)
+
+    def get_stats(self):
+        """
+        Returns hit/miss counters and the number of stored entries
+        """
+        conn = self._connection()
+        counts = dict((table, conn.execute(
+            "SELECT COUNT(*) FROM " + table).fetchone()[0])
+            for table in ("responses", "chart_bars", "chart_coverage"))
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "responses": counts["responses"],
+                "bars": counts["chart_bars"],
+                "symbols": counts["chart_coverage"],
+                "size": os.path.getsize(self.path)
+            }
+
+
+_DISK_CACHE = None
+
+
+def enable_disk_cache(directory=None):
+    """
+    Enables the process-wide persistent cache used by all readers
+
+    Parameters
+    ----------
+    directory: str, default None, optional
+        Directory of the cache database. Defaults to ~/.cache/iexfinance
+
+    Returns
+    -------
+    DiskCache
+        The process-wide persistent cache
+    """
+    global _DISK_CACHE
+    _DISK_CACHE = DiskCache(directory)
+    return _DISK_CACHE
+
+
+def disable_disk_cache():
+    """
+    Disables the process-wide persistent cache
+    """
+    global _DISK_CACHE
+    _DISK_CACHE = None
+
+
+def get_disk_cache():
+    """
+    Returns the process-wide persistent cache, or None if disabled
+    """
+    return _DISK_CACHE
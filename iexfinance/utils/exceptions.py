@@ -42,3 +42,15 @@ class IEXQueryError(Exception):
     """
     def __str__(self):
         return "An error occurred while making the query."
+
+
+class IEXReplayError(Exception):
+    """
+    This error is thrown when a query replayed from a cassette has no
+    recorded response
+    """
+    def __init__(self, url):
+        self.url = url
+
+    def __str__(self):
+        return "No recorded response for " + self.url
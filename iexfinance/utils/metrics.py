@@ -0,0 +1,318 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import (HTTPConnection,
+                                                  HTTPSConnection)
+from requests.packages.urllib3.connectionpool import (HTTPConnectionPool,
+                                                      HTTPSConnectionPool)
+
+from iexfinance.utils.cache import _api_path
+
+_clock = getattr(time, "perf_counter", time.time)
+
+# Time spent opening connections (DNS, TCP and TLS) by the current thread
+_connect = threading.local()
+
+
+def _pop_connect_time():
+    elapsed = getattr(_connect, "elapsed", 0.0)
+    _connect.elapsed = 0.0
+    return elapsed
+
+
+def endpoint_name(url):
+    """
+    Returns the name under which queries to url are recorded: the endpoint
+    path, with stock symbols removed (e.g. stock/quote, stock/batch, tops,
+    stats/historical/daily)
+    """
+    path, _ = _api_path(url)
+    segments = path.split("/")
+    if segments[0] == "stock" and len(segments) > 2:
+        if segments[1:3] == ["market", "batch"]:
+            return "stock/batch"
+        return "/".join(["stock"] + segments[2:])
+    if segments[0] == "daily-list":
+        return "daily-list"
+    return path
+
+
+class _TimedConnectMixin(object):
+    def connect(self):
+        start = _clock()
+        try:
+            return super(_TimedConnectMixin, self).connect()
+        finally:
+            _connect.elapsed = (getattr(_connect, "elapsed", 0.0) +
+                                _clock() - start)
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections record the time spent connecting (DNS
+    resolution, TCP and TLS handshakes)
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super(InstrumentedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool
+        }
+
+
+class RequestEvent(object):
+    """
+    Timings of a single query to the IEX API
+
+    All durations are in seconds. connect is the time spent opening new
+    connections (DNS, TCP and TLS; zero when a pooled connection was reused,
+    None when unknown), ttfb the time from sending the request until the
+    response headers were received (excluding connect), download the time
+    reading the body and decode the time parsing it. throttle is the time
+    spent waiting for the rate limiter. Retried queries sum the durations
+    of every attempt.
+    """
+    __slots__ = ("endpoint", "url", "status", "attempts", "bytes",
+                 "throttle", "connect", "ttfb", "download", "decode",
+                 "total", "error")
+
+    kind = "request"
+
+    def __init__(self, endpoint, url):
+        self.endpoint = endpoint
+        self.url = url
+        self.status = None
+        self.attempts = 0
+        self.bytes = 0
+        self.throttle = 0.0
+        self.connect = 0.0
+        self.ttfb = 0.0
+        self.download = 0.0
+        self.decode = 0.0
+        self.total = 0.0
+        self.error = None
+
+    @property
+    def retries(self):
+        return max(0, self.attempts - 1)
+
+    def to_dict(self):
+        d = dict((name, getattr(self, name)) for name in self.__slots__)
+        d["kind"] = self.kind
+        d["retries"] = self.retries
+        return d
+
+    def __repr__(self):
+        return "RequestEvent({}, status={}, total={:.4f})".format(
+            self.endpoint, self.status, self.total)
+
+
+class FormatEvent(object):
+    """
+    Duration of an output formatting step (e.g. DataFrame construction)
+    """
+    __slots__ = ("endpoint", "output_format", "duration")
+
+    kind = "format"
+
+    def __init__(self, endpoint, output_format, duration):
+        self.endpoint = endpoint
+        self.output_format = output_format
+        self.duration = duration
+
+    def to_dict(self):
+        d = dict((name, getattr(self, name)) for name in self.__slots__)
+        d["kind"] = self.kind
+        return d
+
+    def __repr__(self):
+        return "FormatEvent({}, {}, duration={:.4f})".format(
+            self.endpoint, self.output_format, self.duration)
+
+
+class Histogram(object):
+    """
+    Latency histogram with fixed, roughly logarithmic buckets (seconds)
+    """
+    BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0,
+              2.0, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """
+        Returns an upper estimate of the q-th percentile (0 < q <= 100): the
+        upper bound of the bucket holding it
+        """
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": dict(zip([str(b) for b in self.BOUNDS] + ["inf"],
+                                self.counts))
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe, in-process registry of query metrics
+
+    Keeps latency histograms per endpoint and stage (prepare, connect, ttfb,
+    download, decode, total, format) and counters per endpoint (requests,
+    errors, retries, bytes, cache_hits and coalesced). Events are also
+    passed to registered listeners.
+    """
+    STAGES = ("connect", "ttfb", "download", "decode", "total")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._listeners = []
+
+    def _observe(self, endpoint, stage, value):
+        key = (endpoint, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def _count(self, endpoint, counter, value=1):
+        counters = self._counters.setdefault(endpoint, {})
+        counters[counter] = counters.get(counter, 0) + value
+
+    def record(self, event):
+        """
+        Records a RequestEvent or FormatEvent and notifies listeners
+        """
+        with self._lock:
+            if event.kind == "request":
+                for stage in self.STAGES:
+                    value = getattr(event, stage)
+                    if value is not None:
+                        self._observe(event.endpoint, stage, value)
+                self._count(event.endpoint, "requests")
+                self._count(event.endpoint, "retries", event.retries)
+                self._count(event.endpoint, "bytes", event.bytes)
+                if event.error is not None:
+                    self._count(event.endpoint, "errors")
+            else:
+                self._observe(event.endpoint, "format", event.duration)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(event)
+
+    def observe(self, endpoint, stage, seconds):
+        """
+        Adds a duration to the latency histogram of an endpoint's stage
+        """
+        with self._lock:
+            self._observe(endpoint, stage, seconds)
+
+    def increment(self, endpoint, counter, value=1):
+        """
+        Increments a counter of endpoint
+        """
+        with self._lock:
+            self._count(endpoint, counter, value)
+
+    def add_listener(self, listener):
+        """
+        Registers a function called with every recorded event
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def reset(self):
+        """
+        Clears all histograms and counters (listeners are kept)
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def get_stats(self):
+        """
+        Returns counters and latency histograms, keyed by endpoint
+        """
+        with self._lock:
+            stats = {}
+            for endpoint, counters in self._counters.items():
+                stats.setdefault(endpoint, {}).update(counters)
+            for (endpoint, stage), histogram in self._histograms.items():
+                stats.setdefault(endpoint, {})[stage] = histogram.to_dict()
+            return stats
+
+
+_REGISTRY = MetricsRegistry()
+
+
+def get_metrics():
+    """
+    Returns the process-wide metrics registry
+    """
+    return _REGISTRY
+
+
+@contextmanager
+def format_timer(endpoint, output_format):
+    """
+    Records the duration of an output formatting step as a FormatEvent
+    """
+    start = _clock()
+    try:
+        yield
+    finally:
+        _REGISTRY.record(FormatEvent(endpoint, output_format,
+                                     _clock() - start))
@@ -0,0 +1,226 @@
+import threading
+import time
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+_clock = getattr(time, "monotonic", time.time)
+
+# IEX limits requests to 100 per second per IP
+# See https://iextrading.com/developer/docs/#request-limits
+DEFAULT_RATE = 100
+
+# Endpoint families, keyed by the first path segment of the query URL
+_FAMILIES = {
+    "stock": "stock",
+    "tops": "market",
+    "deep": "market",
+    "hist": "market",
+    "stats": "stats",
+    "ref-data": "ref-data",
+    "daily-list": "ref-data"
+}
+
+
+def _endpoint_family(url):
+    """
+    Returns the endpoint family (stock, market, stats or ref-data) of a
+    query URL, or None if it is not recognised
+    """
+    for segment in urlparse(url).path.split("/"):
+        if not segment or segment[0].isdigit():
+            # Skip the API version segment (e.g. 1.0)
+            continue
+        return _FAMILIES.get(segment)
+    return None
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket
+
+    Tokens are added at ``rate`` per second up to ``capacity``. Requests
+    reserve a token and are told how long to wait before it is available,
+    so the wait itself happens outside the lock (with time.sleep or
+    asyncio.sleep).
+
+    Parameters
+    ----------
+    rate: float
+        Tokens added per second
+    capacity: float, default None, optional
+        Maximum burst size. Defaults to rate (one second's worth)
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if capacity is None:
+            capacity = rate
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._last = _clock()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self, tokens=1):
+        """
+        Reserves tokens and returns the time (in seconds) to wait before
+        using them
+        """
+        with self._lock:
+            self._refill(_clock())
+            self._tokens -= tokens
+            wait = max(0.0, -self._tokens / self.rate)
+            self.requests += 1
+            if wait > 0:
+                self.delayed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    @property
+    def wait_time(self):
+        """
+        Time (in seconds) a request made now would wait
+        """
+        with self._lock:
+            self._refill(_clock())
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def get_stats(self):
+        """
+        Returns the bucket's configuration and wait-time statistics
+        """
+        wait_time = self.wait_time
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "requests": self.requests,
+                "delayed": self.delayed,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "mean_wait": (self.total_wait / self.requests
+                              if self.requests else 0.0),
+                "wait_time": wait_time
+            }
+
+
+class RateLimiter(object):
+    """
+    Client-side rate limiter consulted before every request
+
+    Holds an optional overall token bucket applied to every request, and
+    optional buckets per endpoint family (stock, market, stats, ref-data).
+    A request waits for a token from both.
+
+    Parameters
+    ----------
+    rate: float, default None, optional
+        Overall requests per second. None disables the overall limit
+    capacity: float, default None, optional
+        Overall burst size
+    """
+    FAMILIES = ("stock", "market", "stats", "ref-data")
+
+    def __init__(self, rate=None, capacity=None):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.set_limit(None, rate, capacity)
+
+    def set_limit(self, family, rate, capacity=None):
+        """
+        Sets the rate limit of an endpoint family
+
+        Parameters
+        ----------
+        family: str
+            One of FAMILIES, or None for the overall limit
+        rate: float
+            Requests per second. None removes the limit
+        capacity: float, default None, optional
+            Burst size. Defaults to rate
+        """
+        if family is not None and family not in self.FAMILIES:
+            raise ValueError("Invalid endpoint family. Must be one of: " +
+                             ", ".join(self.FAMILIES))
+        with self._lock:
+            if rate is None:
+                self._buckets.pop(family, None)
+            else:
+                self._buckets[family] = TokenBucket(rate, capacity)
+
+    def reserve(self, url):
+        """
+        Reserves a request to url and returns the time (in seconds) to wait
+        before making it
+        """
+        with self._lock:
+            buckets = [self._buckets.get(None),
+                       self._buckets.get(_endpoint_family(url))]
+        return max([b.reserve() for b in buckets if b is not None] or [0.0])
+
+    def acquire(self, url):
+        """
+        Blocks until a request to url is allowed. Returns the time waited
+        """
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def get_stats(self):
+        """
+        Returns wait-time statistics per bucket, keyed by family ("all" for
+        the overall limit)
+        """
+        with self._lock:
+            buckets = dict(self._buckets)
+        return dict((family or "all", bucket.get_stats())
+                    for family, bucket in buckets.items())
+
+
+_RATE_LIMITER = RateLimiter(rate=DEFAULT_RATE)
+
+
+def get_rate_limiter():
+    """
+    Returns the process-wide rate limiter used by all readers
+    """
+    return _RATE_LIMITER
+
+
+def set_rate_limit(family, rate, capacity=None):
+    """
+    Sets a limit on the process-wide rate limiter (see RateLimiter.set_limit)
+    """
+    _RATE_LIMITER.set_limit(family, rate, capacity)
+
+
+def get_rate_limit_stats():
+    """
+    Returns wait-time statistics of the process-wide rate limiter
+    """
+    return _RATE_LIMITER.get_stats()
+
+
+def reset_rate_limits():
+    """
+    Restores the default limits of the process-wide rate limiter
+    """
+    for family in RateLimiter.FAMILIES:
+        _RATE_LIMITER.set_limit(family, None)
+    _RATE_LIMITER.set_limit(None, DEFAULT_RATE)
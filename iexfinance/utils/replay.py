@@ -0,0 +1,204 @@
+"""
+Record/replay transport for offline testing and benchmarking
+
+A RecordingSession wraps a live session and records every response into a
+Cassette. A ReplaySession serves the recorded responses without touching the
+network. Both are drop-in replacements for the ``session`` keyword of every
+reader::
+
+    with RecordingSession("quotes.json") as session:
+        Stock(["AAPL", "TSLA"], session=session).get_quote()
+
+    Stock(["AAPL", "TSLA"], session=ReplaySession("quotes.json")).get_quote()
+
+Queries are matched on their path and query parameters, ignoring the host, so
+cassettes recorded against the IEX API can be replayed whatever the value of
+``_IEXBase._IEX_API_URL``.
+"""
+import base64
+import io
+import json
+import threading
+
+from iexfinance.utils import _BufferedResponse, _init_session
+from iexfinance.utils.exceptions import IEXReplayError
+
+try:
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:
+    from urlparse import parse_qsl, urlparse
+
+
+def request_key(url):
+    """
+    Returns the key under which queries to url are recorded: the path
+    followed by the sorted query parameters
+    """
+    parsed = urlparse(url)
+    params = sorted(parse_qsl(parsed.query, keep_blank_values=True))
+    query = "&".join("{}={}".format(k, v) for k, v in params)
+    return parsed.path.lstrip("/") + ("?" + query if query else "")
+
+
+class Cassette(object):
+    """
+    Recorded responses, keyed by request_key
+
+    Several responses to the same query are replayed in the order they were
+    recorded, the last one being repeated once the others are exhausted.
+
+    Parameters
+    ----------
+    path: str, default None, optional
+        JSON file holding the cassette. Loaded if it exists
+    """
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions = {}
+        self._played = {}
+        if path is not None:
+            try:
+                with io.open(path, encoding="utf-8") as f:
+                    self._load(json.load(f))
+            except IOError:
+                pass
+
+    def __len__(self):
+        return sum(len(v) for v in self._interactions.values())
+
+    def _load(self, data):
+        for item in data["interactions"]:
+            if item.get("encoding") == "base64":
+                body = base64.b64decode(item["body"])
+            else:
+                body = item["body"].encode("utf-8")
+            self._interactions.setdefault(item["key"], []).append(
+                (item["status"], item["headers"], body))
+
+    def record(self, url, status_code, headers, content):
+        """
+        Adds a response to a query
+        """
+        with self._lock:
+            self._interactions.setdefault(request_key(url), []).append(
+                (status_code, dict(headers), content))
+
+    def play(self, url):
+        """
+        Returns the next (status, headers, body) recorded for url, or None
+        """
+        key = request_key(url)
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                return None
+            index = self._played.get(key, 0)
+            self._played[key] = index + 1
+            return recorded[min(index, len(recorded) - 1)]
+
+    def rewind(self):
+        """
+        Replays every query from its first recorded response again
+        """
+        with self._lock:
+            self._played.clear()
+
+    def save(self, path=None):
+        """
+        Writes the cassette to path (defaults to the path it was loaded from)
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No cassette path given")
+        interactions = []
+        with self._lock:
+            for key in sorted(self._interactions):
+                for status, headers, body in self._interactions[key]:
+                    item = {"key": key, "status": status, "headers": headers}
+                    try:
+                        item["body"] = body.decode("utf-8")
+                    except UnicodeDecodeError:
+                        item["body"] = base64.b64encode(body).decode("ascii")
+                        item["encoding"] = "base64"
+                    interactions.append(item)
+        data = json.dumps({"version": self.VERSION,
+                           "interactions": interactions}, indent=1,
+                          sort_keys=True)
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(data if isinstance(data, type(u"")) else
+                    data.decode("utf-8"))
+
+
+def _as_cassette(cassette):
+    if isinstance(cassette, Cassette):
+        return cassette
+    return Cassette(cassette)
+
+
+class RecordingSession(object):
+    """
+    Session recording the responses of a live session into a cassette
+
+    Parameters
+    ----------
+    cassette: Cassette or str
+        Cassette, or path of the cassette file
+    session: requests.Session, default None, optional
+        Session making the requests. Defaults to the shared pooled session
+
+    Notes
+    -----
+    Used as a context manager, the cassette is saved on exit.
+    """
+    def __init__(self, cassette, session=None):
+        self.cassette = _as_cassette(cassette)
+        self.session = _init_session(session)
+
+    def get(self, url=None, **kwargs):
+        response = self.session.get(url=url, **kwargs)
+        self.cassette.record(url, response.status_code, response.headers,
+                             response.content)
+        return response
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cassette.save()
+
+
+class ReplaySession(object):
+    """
+    Session serving the responses recorded in a cassette
+
+    Parameters
+    ----------
+    cassette: Cassette or str
+        Cassette, or path of the cassette file
+    strict: bool, default True
+        Whether queries without a recorded response raise IEXReplayError.
+        Otherwise they receive a 404 response
+    """
+    def __init__(self, cassette, strict=True):
+        self.cassette = _as_cassette(cassette)
+        self.strict = strict
+        self.urls = []
+
+    def get(self, url=None, **kwargs):
+        self.urls.append(url)
+        recorded = self.cassette.play(url)
+        if recorded is None:
+            if self.strict:
+                raise IEXReplayError(url)
+            return _BufferedResponse(b"Not Found", 404)
+        status, headers, content = recorded
+        return _BufferedResponse(content, status, dict(headers))
+
+    def close(self):
+        pass
@@ -0,0 +1,91 @@
+import random
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+
+class RetryPolicy(object):
+    """
+    Retry policy for requests made to the IEX API
+
+    Failed requests are retried with exponential backoff and full jitter:
+    the n-th retry waits a random time between 0 and
+    min(max_backoff, backoff_factor * 2 ** n) seconds. A ``Retry-After``
+    header sent by the server takes precedence over the computed backoff.
+
+    Attributes
+    ----------
+    max_retries: int, default 3
+        Maximum number of retries after the first attempt
+    backoff_factor: float, default 0.5
+        Base backoff time in seconds
+    max_backoff: float, default 30.0
+        Upper bound on a single pause, in seconds
+    jitter: bool, default True
+        Whether to apply full jitter to the computed backoff
+    retry_statuses: iterable, default (429, 500, 502, 503, 504)
+        HTTP status codes which are retried. All other non-200 statuses fail
+        immediately.
+    respect_retry_after: bool, default True
+        Whether to honour the server's ``Retry-After`` header
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0,
+                 jitter=True, retry_statuses=None, respect_retry_after=True):
+        if int(max_retries) < 0:
+            raise ValueError("max_retries must be a non-negative integer")
+        if backoff_factor < 0 or max_backoff < 0:
+            raise ValueError("Backoff times must be non-negative")
+        self.max_retries = int(max_retries)
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        if retry_statuses is None:
+            retry_statuses = self.RETRY_STATUSES
+        self.retry_statuses = frozenset(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+
+    def is_retryable(self, status_code):
+        """
+        Returns True if a response with status_code should be retried
+        """
+        return status_code in self.retry_statuses
+
+    @staticmethod
+    def _parse_retry_after(value):
+        """
+        Parses a Retry-After header (delta-seconds or HTTP-date) into a
+        number of seconds, or None if it cannot be parsed
+        """
+        if value is None:
+            return None
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+    def get_backoff(self, attempt, response=None):
+        """
+        Returns the pause (in seconds) before retry number attempt
+
+        Parameters
+        ----------
+        attempt: int
+            Zero-based index of the retry
+        response: requests.Response, default None, optional
+            The failed response, inspected for a Retry-After header
+        """
+        if self.respect_retry_after and response is not None:
+            retry_after = self._parse_retry_after(
+                response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
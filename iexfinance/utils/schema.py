@@ -0,0 +1,281 @@
+"""
+Typed DataFrame construction for the Stock endpoints
+
+Each schema lists the fields of an endpoint with their dtype, so that
+row-per-symbol frames can be built column by column from the records
+(see build_frame) instead of inferring object columns from a dict of dicts.
+
+Dtypes are:
+
+- float: float64
+- int: int64 (float64 if values are missing or not integers)
+- bool: bool (object if values are missing)
+- category: pandas Categorical
+- timestamp: datetime64 from epoch milliseconds
+- date: datetime64 from date strings (e.g. 2018-01-31)
+- object: left as is (strings, lists...)
+
+A field may be read from a nested record by giving its path, e.g. the
+price of the open key of the OHLC endpoint. Chart bars of several symbols are
+assembled into a single frame by build_chart_frame.
+"""
+import numbers
+
+import numpy as np
+import pandas as pd
+
+_STR = type(u"")
+
+
+def _fields(names, dtype):
+    return [(name, dtype) for name in names.split()]
+
+
+QUOTE = (
+    _fields("companyName", "object") +
+    _fields("primaryExchange sector calculationPrice latestSource",
+            "category") +
+    [("open", "float"), ("openTime", "timestamp"),
+     ("close", "float"), ("closeTime", "timestamp")] +
+    _fields("high low latestPrice", "float") +
+    [("latestTime", "object"), ("latestUpdate", "timestamp"),
+     ("latestVolume", "int"), ("iexRealtimePrice", "float"),
+     ("iexRealtimeSize", "int"), ("iexLastUpdated", "timestamp"),
+     ("delayedPrice", "float"), ("delayedPriceTime", "timestamp")] +
+    _fields("previousClose change changePercent iexMarketPercent", "float") +
+    _fields("iexVolume avgTotalVolume", "int") +
+    [("iexBidPrice", "float"), ("iexBidSize", "int"),
+     ("iexAskPrice", "float"), ("iexAskSize", "int"),
+     ("marketCap", "int")] +
+    _fields("peRatio week52High week52Low ytdChange", "float")
+)
+
+STATS = (
+    _fields("companyName", "object") +
+    _fields("marketcap", "int") +
+    _fields("beta week52high week52low week52change", "float") +
+    [("shortInterest", "int"), ("shortDate", "date")] +
+    _fields("dividendRate dividendYield", "float") +
+    [("exDividendDate", "date"), ("latestEPS", "float"),
+     ("latestEPSDate", "date")] +
+    _fields("sharesOutstanding float", "int") +
+    _fields("returnOnEquity consensusEPS", "float") +
+    _fields("numberOfEstimates EBITDA revenue grossProfit cash debt", "int") +
+    _fields("ttmEPS revenuePerShare revenuePerEmployee peRatioHigh "
+            "peRatioLow EPSSurpriseDollar EPSSurprisePercent returnOnAssets "
+            "returnOnCapital profitMargin priceToSales priceToBook "
+            "day200MovingAvg day50MovingAvg institutionPercent "
+            "insiderPercent shortRatio year5ChangePercent "
+            "year2ChangePercent year1ChangePercent ytdChangePercent "
+            "month6ChangePercent month3ChangePercent month1ChangePercent "
+            "day5ChangePercent", "float")
+)
+
+OHLC = [
+    ("open", "float", ("open", "price")),
+    ("openTime", "timestamp", ("open", "time")),
+    ("close", "float", ("close", "price")),
+    ("closeTime", "timestamp", ("close", "time")),
+    ("high", "float"),
+    ("low", "float")
+]
+
+PREVIOUS = (
+    [("date", "date")] +
+    _fields("open high low close", "float") +
+    _fields("volume unadjustedVolume", "int") +
+    _fields("change changePercent vwap", "float")
+)
+
+COMPANY = (
+    _fields("companyName", "object") +
+    _fields("exchange industry", "category") +
+    _fields("website description CEO", "object") +
+    _fields("issueType sector", "category") +
+    [("tags", "object")]
+)
+
+DELAYED_QUOTE = [
+    ("delayedPrice", "float"),
+    ("high", "float"),
+    ("low", "float"),
+    ("delayedSize", "int"),
+    ("delayedPriceTime", "timestamp"),
+    ("processedTime", "timestamp")
+]
+
+LOGO = [("url", "object")]
+
+CHART = (
+    _fields("open high low close volume", "float") +
+    [("unadjustedVolume", "int")] +
+    _fields("change changePercent vwap changeOverTime", "float") +
+    [("label", "object")]
+)
+
+OHLCV = CHART[:5]
+
+# Bars of the per-symbol frames of HistoricalReader
+DAILY_BAR = OHLCV[:4] + [("volume", "int")]
+
+SCHEMAS = {
+    "quote": QUOTE,
+    "stats": STATS,
+    "ohlc": OHLC,
+    "open-close": OHLC,
+    "previous": PREVIOUS,
+    "company": COMPANY,
+    "delayed-quote": DELAYED_QUOTE,
+    "logo": LOGO
+}
+
+
+def _as_float(values):
+    try:
+        return np.array(values, dtype="float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values), errors="coerce").values
+
+
+def _as_int(values):
+    if all(isinstance(v, numbers.Integral) for v in values):
+        try:
+            return np.array(values, dtype="int64")
+        except OverflowError:
+            pass
+    return _as_float(values)
+
+
+def _as_object(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _as_bool(values):
+    if any(v is None for v in values):
+        return _as_object(values)
+    return np.array(values, dtype=bool)
+
+
+def _as_timestamp(values):
+    return pd.to_datetime(_as_float(values), unit="ms")
+
+
+def _as_date(values):
+    return pd.to_datetime([v if isinstance(v, _STR) and v else None
+                           for v in values], errors="coerce")
+
+
+CONVERTERS = {
+    "float": _as_float,
+    "int": _as_int,
+    "bool": _as_bool,
+    "category": pd.Categorical,
+    "timestamp": _as_timestamp,
+    "date": _as_date,
+    "object": _as_object
+}
+
+
+def build_frame(symbols, columns, schema):
+    """
+    Builds a typed DataFrame, indexed by symbol, from columns of records
+
+    Parameters
+    ----------
+    symbols: list
+        The symbol of each row
+    columns: dict
+        Values of each field (one per symbol, None when missing)
+    schema: list
+        (name, dtype) or (name, dtype, path) of the known fields. Fields
+        missing from every record are left out, and fields outside the
+        schema (except symbol) are appended with inferred dtypes
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    data = {}
+    names = []
+    used = {"symbol"}
+    for entry in schema:
+        name, dtype = entry[:2]
+        path = entry[2] if len(entry) > 2 else (name,)
+        values = columns.get(path[0])
+        if values is None:
+            continue
+        used.add(path[0])
+        for key in path[1:]:
+            values = [v.get(key) if isinstance(v, dict) else None
+                      for v in values]
+        data[name] = CONVERTERS[dtype](values)
+        names.append(name)
+    for field in sorted(set(columns) - used):
+        data[field] = columns[field]
+        names.append(field)
+    return pd.DataFrame(data, index=symbols, columns=names)
+
+
+LAYOUTS = ("long", "wide")
+
+
+def build_chart_frame(charts, schema=CHART, start=None, end=None,
+                      layout="long"):
+    """
+    Builds a single DataFrame from the chart bars of several symbols
+
+    Parameters
+    ----------
+    charts: dict
+        Bars (list of dicts) of each symbol
+    schema: list, default CHART
+        Fields of the bars, as in build_frame. Fields missing from every
+        bar are left out
+    start: datetime.datetime, default None, optional
+        First date kept
+    end: datetime.datetime, default None, optional
+        Last date kept (included)
+    layout: str, default "long"
+        "long" gives a frame indexed by (symbol, date), "wide" a frame
+        indexed by date with (field, symbol) columns
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if layout not in LAYOUTS:
+        raise ValueError("Invalid layout: " + str(layout))
+    symbols = list(charts)
+    bars = [bar for symbol in symbols for bar in charts[symbol]]
+    owners = np.repeat(np.array(symbols, dtype=object),
+                       [len(charts[symbol]) for symbol in symbols])
+    # Intraday bars are dated by day and minute
+    dates = pd.to_datetime([bar["date"] + " " + bar["minute"]
+                            if "minute" in bar else bar["date"]
+                            for bar in bars])
+    if start is not None or end is not None:
+        keep = np.ones(len(bars), dtype=bool)
+        if start is not None:
+            keep &= dates >= pd.Timestamp(start).normalize()
+        if end is not None:
+            keep &= dates < (pd.Timestamp(end).normalize() +
+                             pd.Timedelta(days=1))
+        bars = [bar for bar, kept in zip(bars, keep) if kept]
+        owners = owners[keep]
+        dates = dates[keep]
+    data = {}
+    names = []
+    for name, dtype in schema:
+        values = [bar.get(name) for bar in bars]
+        if bars and all(v is None for v in values):
+            continue
+        data[name] = CONVERTERS[dtype](values)
+        names.append(name)
+    index = pd.MultiIndex.from_arrays([owners, dates],
+                                      names=["symbol", "date"])
+    frame = pd.DataFrame(data, index=index, columns=names)
+    if layout == "wide":
+        return frame.unstack("symbol")
+    return frame
@@ -0,0 +1,80 @@
+import copy
+import threading
+
+
+class _Call(object):
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls sharing the same key
+
+    The first caller for a key (the leader) runs the function; callers
+    arriving while it is in flight wait for it and receive a deep copy of its
+    result, or have its exception re-raised. Copies keep callers from seeing
+    each other's changes to the parsed response: they are made from a
+    snapshot taken before the leader's caller gets the result.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Runs func, or waits for the in-flight call with the same key
+
+        Parameters
+        ----------
+        key: hashable
+            Identifies equivalent calls
+        func: callable
+            Function called without arguments by the leader
+
+        Returns
+        -------
+        The result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        result = None
+        try:
+            result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            # No waiter can join once the call is removed
+            if call.waiters and call.error is None:
+                try:
+                    call.result = copy.deepcopy(result)
+                except Exception as e:
+                    call.error = e
+            call.event.set()
+        return result
+
+    @property
+    def in_flight(self):
+        """
+        Number of calls currently in flight
+        """
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,419 @@
+"""
+Local stand-in for the IEX API
+
+StandInServer is a small threaded HTTP server serving synthetic, deterministic
+responses for the routes used by iexfinance's readers: ``stock/market/batch``,
+``tops``, ``tops/last``, ``deep``, ``deep/book``, ``stats/*``,
+``daily-list/*`` and ``ref-data/symbols``. The ``filter`` parameter is
+applied as by IEX. Latency, payload size and errors can be configured, so
+throughput can be measured and regression-tested offline::
+
+    with StandInServer(latency=0.05, error_rate=0.1) as server:
+        Stock(["AAPL", "TSLA"]).get_quote()
+
+Used as a context manager, the server is started and
+``_IEXBase._IEX_API_URL`` points to it until exit.
+"""
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+
+from iexfinance.base import _IEXBase
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+# Calendar days of chart data per range
+_RANGE_DAYS = {"1m": 30, "3m": 91, "6m": 182, "1y": 365, "2y": 730,
+               "5y": 1826}
+
+
+def _seed(*parts):
+    return zlib.crc32("/".join(str(p) for p in parts).encode("utf-8"))
+
+
+def _project(value, fields):
+    """
+    Keeps the given fields of a record, or of each record of a list, as the
+    filter parameter of the API does
+    """
+    if isinstance(value, dict):
+        return dict((k, v) for k, v in value.items() if k in fields)
+    if isinstance(value, list):
+        return [_project(item, fields) for item in value]
+    return value
+
+
+def _weekdays(end, days):
+    start = end - datetime.timedelta(days=days)
+    return [start + datetime.timedelta(n) for n in range(1, days + 1)
+            if (start + datetime.timedelta(n)).weekday() < 5]
+
+
+class _Payloads(object):
+    """
+    Builds deterministic synthetic payloads, seeded by symbol and endpoint
+    """
+    def __init__(self, records=None, padding=0):
+        self.records = records
+        self.padding = padding
+
+    def _pad(self, record):
+        if self.padding:
+            record["padding"] = "x" * self.padding
+        return record
+
+    def _count(self, default):
+        return default if self.records is None else self.records
+
+    def quote(self, symbol):
+        rng = random.Random(_seed(symbol, "quote"))
+        price = round(rng.uniform(5, 500), 2)
+        return self._pad({
+            "symbol": symbol,
+            "companyName": symbol + " Inc.",
+            "primaryExchange": "Nasdaq Global Select",
+            "sector": "Technology",
+            "open": price,
+            "close": price,
+            "high": round(price * 1.02, 2),
+            "low": round(price * 0.98, 2),
+            "latestPrice": price,
+            "latestVolume": rng.randint(10 ** 5, 10 ** 8),
+            "latestTime": "4:00:00 PM",
+            "change": 0.0,
+            "changePercent": 0.0,
+            "marketCap": rng.randint(10 ** 8, 10 ** 12),
+            "peRatio": round(rng.uniform(5, 60), 2),
+            "week52High": round(price * 1.3, 2),
+            "week52Low": round(price * 0.7, 2),
+            "ytdChange": round(rng.uniform(-0.5, 0.5), 4)
+        })
+
+    def stats(self, symbol):
+        rng = random.Random(_seed(symbol, "stats"))
+        return self._pad({
+            "symbol": symbol,
+            "companyName": symbol + " Inc.",
+            "beta": round(rng.uniform(0.5, 2), 4),
+            "shortInterest": rng.randint(10 ** 5, 10 ** 7),
+            "shortRatio": round(rng.uniform(0, 5), 4),
+            "latestEPS": round(rng.uniform(-2, 10), 2),
+            "sharesOutstanding": rng.randint(10 ** 7, 10 ** 10),
+            "float": rng.randint(10 ** 7, 10 ** 10),
+            "consensusEPS": round(rng.uniform(-2, 10), 2)
+        })
+
+    def chart(self, symbol, chart_range):
+        days = _RANGE_DAYS.get(chart_range)
+        today = datetime.date.today()
+        if days is None:
+            days = (today - datetime.date(today.year, 1, 1)).days or 1
+        dates = _weekdays(today, days)
+        if self.records is not None:
+            dates = _weekdays(today, self.records * 2)[-self.records:]
+        rng = random.Random(_seed(symbol, "chart"))
+        price = rng.uniform(5, 500)
+        bars = []
+        for date in dates:
+            price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+            bars.append(self._pad({
+                "date": date.strftime("%Y-%m-%d"),
+                "open": round(price, 2),
+                "high": round(price * 1.01, 2),
+                "low": round(price * 0.99, 2),
+                "close": round(price, 2),
+                "volume": rng.randint(10 ** 5, 10 ** 7),
+                "change": 0.0,
+                "changePercent": 0.0,
+                "vwap": round(price, 2)
+            }))
+        return bars
+
+    def news(self, symbol, last):
+        return [self._pad({"headline": "{} headline {}".format(symbol, i),
+                           "source": "stand-in", "related": symbol,
+                           "datetime": "2018-01-01T00:00:00-05:00"})
+                for i in range(self._count(last))]
+
+    def stock_type(self, symbol, type_, query):
+        if type_ in ("quote", "delayed-quote"):
+            return self.quote(symbol)
+        if type_ == "stats":
+            return self.stats(symbol)
+        if type_ == "chart":
+            return self.chart(symbol, query.get("range", "1m"))
+        if type_ == "news":
+            return self.news(symbol, int(query.get("last", 10)))
+        if type_ == "price":
+            return self.quote(symbol)["latestPrice"]
+        if type_ == "peers":
+            return ["PEER%d" % i for i in range(self._count(5))]
+        if type_ == "logo":
+            return {"url": "https://example.com/{}.png".format(symbol)}
+        if type_ == "company":
+            return self._pad({"symbol": symbol,
+                              "companyName": symbol + " Inc.",
+                              "exchange": "Nasdaq Global Select",
+                              "industry": "Software", "sector": "Technology"})
+        if type_ in ("open-close", "ohlc"):
+            quote = self.quote(symbol)
+            return self._pad({
+                "open": {"price": quote["open"], "time": 1500039000000},
+                "close": {"price": quote["close"], "time": 1500062400000},
+                "high": quote["high"], "low": quote["low"]})
+        if type_ == "previous":
+            quote = self.quote(symbol)
+            date = _weekdays(datetime.date.today(), 7)[-1]
+            return self._pad({
+                "symbol": symbol, "date": date.strftime("%Y-%m-%d"),
+                "open": quote["open"], "high": quote["high"],
+                "low": quote["low"], "close": quote["close"],
+                "volume": quote["latestVolume"],
+                "unadjustedVolume": quote["latestVolume"],
+                "change": 0.0, "changePercent": 0.0,
+                "vwap": quote["latestPrice"]})
+        if type_ == "book":
+            quote = self.quote(symbol)
+            return self._pad(dict((k, quote[k]) for k in
+                                  ("symbol", "open", "close", "high", "low")))
+        records = [self._pad({"symbol": symbol, "type": type_, "index": i})
+                   for i in range(self._count(4))]
+        if type_ in ("financials", "earnings"):
+            return {"symbol": symbol, type_: records}
+        return records
+
+    def batch(self, symbols, types, query):
+        return dict((symbol, dict((t, self.stock_type(symbol, t, query))
+                                  for t in types))
+                    for symbol in symbols)
+
+    def tops(self, symbols):
+        if not symbols:
+            symbols = ["SYM%d" % i for i in range(self._count(100))]
+        return [self._pad({"symbol": s,
+                           "lastSalePrice": self.quote(s)["latestPrice"],
+                           "lastSaleSize": 100, "volume": 1000,
+                           "lastUpdated": 1500000000000})
+                for s in symbols]
+
+    def deep(self, symbols):
+        quote = self.quote(symbols[0] if symbols else "SYM0")
+        return self._pad({"symbol": quote["symbol"],
+                          "lastSalePrice": quote["latestPrice"],
+                          "bids": [], "asks": [], "trades": []})
+
+    def stats_rows(self, route, query):
+        date = query.get("date")
+        if route == "stats/historical/daily" and date is not None:
+            day = datetime.datetime.strptime(date, "%Y%m%d")
+            if day.weekday() >= 5:
+                return []
+            dates = [date]
+        else:
+            count = int(query.get("last", self._count(5)))
+            dates = [d.strftime("%Y%m%d") for d in
+                     _weekdays(datetime.date.today(), count * 2)[-count:]]
+        return [self._pad({"date": d, "volume": 10 ** 8,
+                           "routedVolume": 10 ** 7, "marketShare": 0.025,
+                           "isHalfday": False, "averageDailyVolume": 10 ** 8})
+                for d in dates]
+
+    def daily_list(self, endpoint):
+        return [self._pad({"RecordID": "{}-{}".format(endpoint, i),
+                           "SymbolinINETSymbology": "SYM%d" % i,
+                           "DailyListTimestamp": "2018-01-01T00:00:00"})
+                for i in range(self._count(10))]
+
+    def symbols(self):
+        return [self._pad({"symbol": "SYM%d" % i, "name": "Company %d" % i,
+                           "date": "2018-01-01", "isEnabled": True,
+                           "type": "cs", "iexId": str(i)})
+                for i in range(self._count(100))]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server.standin
+        server._hit(self.path)
+        if server.latency:
+            time.sleep(server.latency)
+        if server._inject_error():
+            return self._send(server.error_status, b"Service Unavailable")
+        body = server.payload(self.path)
+        if body is None:
+            return self._send(404, b"Not Found")
+        return self._send(200, json.dumps(body).encode("utf-8"))
+
+    def _send(self, status, content):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInServer(object):
+    """
+    Local HTTP server emulating the IEX API with synthetic data
+
+    Parameters
+    ----------
+    host: str, default "127.0.0.1"
+        Interface to listen on
+    port: int, default 0
+        Port to listen on (0 picks a free port)
+    latency: float, default 0
+        Seconds to wait before answering each request
+    records: int, default None, optional
+        Number of records in list payloads (chart bars, news, TOPS, stats
+        rows, daily lists, symbols). Defaults to realistic sizes (e.g. chart
+        bars follow the requested range)
+    padding: int, default 0
+        Bytes of filler added to every record, to inflate payloads
+    error_rate: float, default 0
+        Fraction of requests answered with error_status
+    error_status: int, default 503
+        HTTP status of injected errors
+    unknown_symbols: iterable, default ()
+        Symbols left out of batch responses, as IEX does for unknown symbols
+    seed: int, default None, optional
+        Seed of the error injection
+
+    Attributes
+    ----------
+    paths: list
+        Request paths received, in order
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, records=None,
+                 padding=0, error_rate=0.0, error_status=503,
+                 unknown_symbols=(), seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.unknown_symbols = set(unknown_symbols)
+        self.payloads = _Payloads(records, padding)
+        self.paths = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self._saved_url = None
+
+    @property
+    def url(self):
+        """
+        Base URL of the stand-in API, a drop-in for _IEXBase._IEX_API_URL
+        """
+        return "http://{}:{}/1.0/".format(self.host, self.port)
+
+    def _hit(self, path):
+        with self._lock:
+            self.paths.append(path)
+
+    def _inject_error(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def payload(self, url):
+        """
+        Returns the (decoded) response to a query URL or path, or None if the
+        route is not served. Payloads can be built without starting the
+        server, e.g. for benchmarks
+        """
+        parsed = urlparse(url)
+        query = dict((k, v[0]) for k, v in parse_qs(parsed.query).items())
+        segments = [s for s in parsed.path.split("/") if s]
+        if segments and segments[0][0].isdigit():
+            segments = segments[1:]
+        route = "/".join(segments)
+        payload = self._route(route, query)
+        if "filter" not in query or payload is None:
+            return payload
+        fields = set(query["filter"].split(","))
+        if route == "stock/market/batch":
+            return dict((symbol, dict((t, _project(v, fields))
+                                      for t, v in data.items()))
+                        for symbol, data in payload.items())
+        return _project(payload, fields)
+
+    def _route(self, route, query):
+        p = self.payloads
+        symbols = [s for s in query.get("symbols", "").split(",") if s]
+        if route == "stock/market/batch":
+            types = [t for t in query.get("types", "").split(",") if t]
+            symbols = [s for s in symbols if s not in self.unknown_symbols]
+            return p.batch(symbols, types, query)
+        if route in ("tops", "tops/last"):
+            return p.tops(symbols)
+        if route in ("deep", "deep/book"):
+            return p.deep(symbols)
+        if route.startswith("stats/"):
+            return p.stats_rows(route, query)
+        if route.startswith("daily-list/"):
+            return p.daily_list(route.split("/")[1])
+        if route == "ref-data/symbols":
+            return p.symbols()
+        return None
+
+    def reset(self):
+        """
+        Clears the recorded request paths
+        """
+        with self._lock:
+            del self.paths[:]
+
+    def start(self):
+        """
+        Starts serving in a background thread
+        """
+        self._httpd = _ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.standin = self
+        self.port = self._httpd.server_port
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server
+        """
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = self._thread = None
+
+    def __enter__(self):
+        self.start()
+        self._saved_url = _IEXBase._IEX_API_URL
+        _IEXBase._IEX_API_URL = self.url
+        return self
+
+    def __exit__(self, *exc):
+        _IEXBase._IEX_API_URL = self._saved_url
+        self.stop()
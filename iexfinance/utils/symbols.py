@@ -0,0 +1,242 @@
+"""
+Local index of the symbols supported by IEX
+
+SymbolIndex keeps the reference data of get_available_symbols in memory,
+for constant-time lookups and prefix searches, and persists it to disk so
+that later processes do not download the symbol list again. The list is
+downloaded again once older than max_age; if that download fails, the
+stale list is still used and the download is tried again a minute later.
+
+Readers given an index (or using the process-wide one, see
+enable_symbol_index) normalize their symbols and reject unknown ones before
+sending any request::
+
+    enable_symbol_index()
+    Stock(["aapl", "brk-b"])       # requests AAPL and BRK.B
+    Stock(["AAPL", "BADSYMBOL"])   # raises IEXSymbolError, no request sent
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+import requests
+
+from iexfinance.utils.diskcache import _default_directory
+from iexfinance.utils.exceptions import IEXQueryError
+
+_replace = getattr(os, "replace", os.rename)
+
+# Seconds before another download once a refresh failed
+_RETRY_DELAY = 60
+
+
+class SymbolIndex(object):
+    """
+    Persistent, periodically refreshed index of the IEX symbols
+
+    Parameters
+    ----------
+    path: str, default None, optional
+        JSON file persisting the index. Defaults to
+        ~/.cache/iexfinance/symbols.json
+    max_age: float, default 86400, optional
+        Age (in seconds) after which the symbol list is downloaded again.
+        None never downloads it again
+    kwargs:
+        Request options of the download (see _IEXBase)
+
+    Attributes
+    ----------
+    updated: float
+        Time (epoch seconds) of the download of the symbol list, or None
+        before it is loaded
+    """
+    def __init__(self, path=None, max_age=86400, **kwargs):
+        self.path = path or os.path.join(_default_directory(),
+                                         "symbols.json")
+        self.max_age = max_age
+        self.options = kwargs
+        self.updated = None
+        self._records = {}
+        self._sorted = []
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def _set(self, records, updated):
+        self._records = dict((record["symbol"].upper(), record)
+                             for record in records)
+        self._sorted = sorted(self._records)
+        self.updated = updated
+
+    def _stale(self):
+        if self.updated is None:
+            return True
+        if (self._failed_at is not None and
+                time.time() - self._failed_at < _RETRY_DELAY):
+            return False
+        return (self.max_age is not None and
+                time.time() - self.updated >= self.max_age)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._set(data["symbols"], data["updated"])
+        except (IOError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def _write(self, records):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"updated": self.updated, "symbols": records}, f)
+        _replace(self.path + ".tmp", self.path)
+
+    def _download(self):
+        # Imported here as the readers import this module
+        from iexfinance import get_available_symbols
+        records = get_available_symbols(**self.options)
+        self._set(records, time.time())
+        self._failed_at = None
+        self._write(records)
+
+    def refresh(self):
+        """
+        Downloads the symbol list and persists it
+        """
+        with self._lock:
+            self._download()
+
+    def _ensure(self):
+        if not self._stale():
+            return
+        # A single reader downloads the list, the others wait for it
+        with self._lock:
+            if self.updated is None:
+                self._read()
+            if not self._stale():
+                return
+            try:
+                self._download()
+            except (IEXQueryError, requests.RequestException):
+                # A stale index is still used if the download fails
+                if self.updated is None:
+                    raise
+                self._failed_at = time.time()
+
+    def __len__(self):
+        self._ensure()
+        return len(self._records)
+
+    def __contains__(self, symbol):
+        return self.normalize(symbol) is not None
+
+    def get(self, symbol):
+        """
+        Returns the reference data of symbol (name, type, iexId...), or None
+        if unknown
+        """
+        symbol = self.normalize(symbol)
+        return None if symbol is None else self._records[symbol]
+
+    def normalize(self, symbol):
+        """
+        Returns the IEX form of symbol, or None if unknown
+
+        Symbols are upper-cased, and share classes may be written with a
+        dash or a slash (BRK-B or BRK/B for BRK.B).
+        """
+        self._ensure()
+        symbol = symbol.strip().upper()
+        if symbol in self._records:
+            return symbol
+        dotted = symbol.replace("-", ".").replace("/", ".")
+        if dotted in self._records:
+            return dotted
+        return None
+
+    def search(self, prefix, limit=None):
+        """
+        Returns the symbols starting with prefix, in alphabetical order
+
+        Parameters
+        ----------
+        prefix: str
+            Beginning of the symbols
+        limit: int, default None, optional
+            Maximum number of symbols returned
+        """
+        self._ensure()
+        prefix = prefix.strip().upper()
+        symbols = self._sorted
+        first = bisect.bisect_left(symbols, prefix)
+        last = bisect.bisect_left(symbols, prefix + u"\uffff")
+        if limit is not None:
+            last = min(last, first + limit)
+        return symbols[first:last]
+
+    def validate(self, symbols):
+        """
+        Normalizes symbols, separating the unknown ones
+
+        Returns
+        -------
+        tuple
+            The known symbols (normalized) and the unknown symbols (as
+            given), in order
+        """
+        known = []
+        unknown = []
+        for symbol in symbols:
+            normalized = self.normalize(symbol)
+            if normalized is None:
+                unknown.append(symbol)
+            else:
+                known.append(normalized)
+        return known, unknown
+
+
+_SYMBOL_INDEX = None
+
+
+def enable_symbol_index(path=None, max_age=86400, **kwargs):
+    """
+    Enables the process-wide symbol index used by all readers
+
+    Parameters
+    ----------
+    path: str, default None, optional
+        JSON file persisting the index. Defaults to
+        ~/.cache/iexfinance/symbols.json
+    max_age: float, default 86400, optional
+        Age (in seconds) after which the symbol list is downloaded again
+    kwargs:
+        Request options of the download
+
+    Returns
+    -------
+    SymbolIndex
+        The process-wide symbol index
+    """
+    global _SYMBOL_INDEX
+    _SYMBOL_INDEX = SymbolIndex(path, max_age, **kwargs)
+    return _SYMBOL_INDEX
+
+
+def disable_symbol_index():
+    """
+    Disables the process-wide symbol index
+    """
+    global _SYMBOL_INDEX
+    _SYMBOL_INDEX = None
+
+
+def get_symbol_index():
+    """
+    Returns the process-wide symbol index, or None if disabled
+    """
+    return _SYMBOL_INDEX
@@ -0,0 +1,16 @@
+import sys
+
+import pytest
+
+from iexfinance.utils.standin import StandInServer
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore.append("test_aio.py")
+
+
+@pytest.fixture
+def standin():
+    """Stand-in IEX server replacing the API during the test"""
+    with StandInServer(unknown_symbols=["BADSYM"]) as server:
+        yield server
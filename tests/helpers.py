@@ -0,0 +1,27 @@
+"""
+Fakes shared by the tests
+"""
+import json
+
+from iexfinance.utils import _BufferedResponse
+
+
+class FakeResponse(_BufferedResponse):
+    """Response of status_code with body encoded as JSON (empty if None)"""
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        content = json.dumps(body) if body is not None else ""
+        super(FakeResponse, self).__init__(content.encode("utf-8"),
+                                           status_code, headers)
+
+
+class FakeSession(object):
+    """Returns the given responses in order, recording the URLs"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url=None, **kwargs):
+        self.urls.append(url)
+        return self.responses.pop(0)
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from pandas import DataFrame
+
+pytest.importorskip("aiohttp")
+
+from iexfinance import (StockReader, get_market_tops,  # noqa: E402
+                        get_market_tops_async, get_stats_monthly,
+                        get_stats_monthly_async)
+from iexfinance.aio import _IN_FLIGHT, close_session  # noqa: E402
+from iexfinance.base import _IEXBase  # noqa: E402
+from iexfinance.utils.exceptions import IEXQueryError  # noqa: E402
+from iexfinance.utils.metrics import get_metrics  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        self.server.paths.append(self.path)
+        if parsed.path == "/1.0/tops":
+            body = [{"symbol": s, "lastSalePrice": 1.0}
+                    for s in query["symbols"][0].split(",")]
+        elif parsed.path == "/1.0/stats/historical":
+            body = [{"averageDailyVolume": 1, "date": query["date"][0]}]
+        elif parsed.path == "/1.0/stock/market/batch":
+            body = dict((s, dict((t, {"type": t}) for t in
+                                 query["types"][0].split(",")))
+                        for s in query["symbols"][0].split(","))
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = HTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.paths = []
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    monkeypatch.setattr(_IEXBase, "_IEX_API_URL",
+                        "http://127.0.0.1:%d/1.0/" % httpd.server_port)
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def run(coro):
+    async def _run():
+        try:
+            return await coro
+        finally:
+            await close_session()
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_run())
+    finally:
+        loop.close()
+
+
+class TestAsync(object):
+
+    def test_tops_async(self, server):
+        data = run(get_market_tops_async(["AAPL", "TSLA"]))
+        assert data == get_market_tops(["AAPL", "TSLA"])
+        assert [d["symbol"] for d in data] == ["AAPL", "TSLA"]
+
+    def test_monthly_async(self, server):
+        year = datetime.now().year - 1
+        kwargs = dict(start=datetime(year, 1, 1), end=datetime(year, 4, 1),
+                      output_format="pandas")
+        df = run(get_stats_monthly_async(**kwargs))
+        assert isinstance(df, DataFrame)
+        assert list(df.index) == ["%d0%d" % (year, m) for m in (1, 2, 3)]
+        assert df.equals(get_stats_monthly(**kwargs))
+        assert len(server.paths) == 6
+
+    def test_stock_refresh_async(self, server):
+        reader = StockReader(["AAPL", "TSLA"])
+        sync_data = reader.get_all()
+        reader.data_set = None
+        run(reader.refresh_async())
+        assert reader.get_all() == sync_data
+        assert set(reader.get_all()["AAPL"]) == set(reader._ENDPOINTS)
+
+    def test_stock_failed_refresh_async(self, server, monkeypatch):
+        reader = StockReader(["AAPL", "TSLA"])
+        data = reader.get_all()
+        monkeypatch.setattr(_IEXBase, "_IEX_API_URL",
+                            _IEXBase._IEX_API_URL + "missing/")
+        with pytest.raises(IEXQueryError):
+            run(reader.refresh_async())
+        assert reader.get_all() == data
+
+    def test_concurrent(self, server):
+        async def many():
+            return await asyncio.gather(
+                *[get_market_tops_async("S%d" % i) for i in range(50)])
+        results = run(many())
+        assert len(results) == 50
+        assert len(server.paths) == 50
+
+    def test_coalesced(self, server):
+        async def many():
+            return await asyncio.gather(
+                *[get_market_tops_async("AAPL") for _ in range(20)])
+        results = run(many())
+        assert len(server.paths) == 1
+        assert all(r == results[0] for r in results)
+        assert results[0] is not results[1]
+        assert _IN_FLIGHT == {}
+
+    def test_leader_changes_not_shared(self, server):
+        async def first():
+            data = await get_market_tops_async("AAPL")
+            data.clear()
+            return data
+
+        async def many():
+            return await asyncio.gather(
+                first(), *[get_market_tops_async("AAPL") for _ in range(5)])
+        results = run(many())
+        assert len(server.paths) == 1
+        assert results[0] == []
+        assert all(r == [{"symbol": "AAPL", "lastSalePrice": 1.0}]
+                   for r in results[1:])
+
+    def test_not_coalesced(self, server):
+        async def many():
+            return await asyncio.gather(
+                *[get_market_tops_async("AAPL", coalesce=False)
+                  for _ in range(5)])
+        run(many())
+        assert len(server.paths) == 5
+
+    def test_metrics(self, server):
+        registry = get_metrics()
+        registry.reset()
+        events = []
+        registry.add_listener(events.append)
+        try:
+            run(get_market_tops_async("AAPL"))
+        finally:
+            registry.remove_listener(events.append)
+        assert len(events) == 1
+        assert events[0].endpoint == "tops"
+        assert events[0].status == 200
+        assert events[0].connect > 0
+        assert events[0].bytes > 0
+        assert registry.get_stats()["tops"]["requests"] == 1
+
+    def test_stock_chunked_async(self, server):
+        symbols = ["S%d" % i for i in range(150)]
+        reader = StockReader(symbols, lazy=True)
+        run(reader.refresh_async())
+        assert len(server.paths) == 0
+        reader.require("quote")
+        run(reader.refresh_async())
+        assert len(server.paths) == 2
+        assert list(reader.data_set) == symbols
@@ -0,0 +1,124 @@
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from iexfinance import get_historical_data
+from iexfinance.utils.barstore import BarStore
+
+
+def bar(day, close=1.0):
+    return {"date": day, "open": 1.0, "high": 2.0, "low": 0.5,
+            "close": close, "volume": 100, "label": day}
+
+
+@pytest.fixture
+def store(tmpdir):
+    return BarStore(str(tmpdir))
+
+
+class TestBarStore(object):
+
+    def test_append(self, store):
+        assert store.append("AAPL", [bar("2018-01-03"), bar("2018-01-02")]) \
+            == 2
+        # Bars up to the last stored one are ignored
+        assert store.append("AAPL", [bar("2018-01-03", 5.0),
+                                     bar("2018-01-04")]) == 1
+        df = store.read("AAPL")
+        assert list(df.index.strftime("%Y-%m-%d")) == [
+            "2018-01-02", "2018-01-03", "2018-01-04"]
+        assert list(df.columns) == list(BarStore.FIELDS)
+        assert df.loc["2018-01-03", "close"] == 1.0
+        assert store.symbols() == ["AAPL"]
+
+    def test_file_size(self, store):
+        store.append("AAPL", [bar("2018-01-02"), bar("2018-01-03")])
+        size = os.path.getsize(os.path.join(store.directory, "AAPL.bars"))
+        assert size == 2 * BarStore.DTYPE.itemsize
+
+    def test_range_read(self, store):
+        store.append("AAPL", [bar("2018-01-%02d" % d) for d in range(2, 20)])
+        df = store.read("AAPL", date(2018, 1, 5), "2018-01-09")
+        assert len(df) == 5
+        assert df.index[0] == pd.Timestamp("2018-01-05")
+        assert store.read("MSFT").empty
+
+    def test_load(self, store):
+        store.append("AAPL", [bar("2018-01-02"), bar("2018-01-03")])
+        store.append("TSLA", [bar("2018-01-03", 300.0)])
+        df = store.load(start="2018-01-03")
+        assert df.index.names == ["symbol", "date"]
+        assert list(df.index.get_level_values("symbol")) == ["AAPL", "TSLA"]
+        assert df.loc[("TSLA", pd.Timestamp("2018-01-03")), "close"] == 300.0
+        assert store.load([]).empty
+
+    def test_interrupted_write(self, store):
+        store.append("AAPL", [bar("2018-01-02")])
+        with open(os.path.join(store.directory, "AAPL.bars"), "ab") as f:
+            f.write(b"\0" * 5)
+        assert len(store.read("AAPL")) == 1
+        store.append("AAPL", [bar("2018-01-03")])
+        assert list(store.read("AAPL")["close"]) == [1.0, 1.0]
+
+    def test_put_bars(self, store):
+        store.put_bars("AAPL", [bar("2018-01-03"), bar("2018-01-04")],
+                       "2018-01-03", "2018-01-03")
+        assert store.get_coverage("AAPL") == ("2018-01-03", "2018-01-03")
+        # Earlier bars are merged in
+        store.put_bars("AAPL", [bar("2018-01-02"), bar("2018-01-03")],
+                       "2018-01-01", "2018-01-03")
+        assert store.get_coverage("AAPL") == ("2018-01-01", "2018-01-03")
+        assert store.covers("AAPL", datetime(2018, 1, 1), "2018-01-03")
+        bars = store.get_bars("AAPL", "2018-01-01", "2018-01-31")
+        assert [b["date"] for b in bars] == ["2018-01-02", "2018-01-03"]
+        assert bars[0]["close"] == 1.0
+
+    def test_int_volume(self, store):
+        store.append("AAPL", [bar("2018-01-02"), dict(bar("2018-01-03"),
+                                                      volume=None)])
+        volumes = [b["volume"] for b in store.get_bars("AAPL", "2018-01-01",
+                                                       "2018-01-31")]
+        assert volumes == [100, 0]
+        assert isinstance(volumes[0], int)
+        assert store.read("AAPL")["volume"].dtype == np.int64
+        assert store.load()["volume"].dtype == np.int64
+
+    def test_delete(self, store):
+        store.put_bars("AAPL", [bar("2018-01-02")], "2018-01-02",
+                       "2018-01-02")
+        store.clear()
+        assert store.symbols() == []
+        assert store.get_coverage("AAPL") is None
+
+
+class TestHistoricalStore(object):
+
+    def test_incremental(self, store, standin):
+        start = datetime.now() - timedelta(days=20)
+        end = datetime.now() - timedelta(days=3)
+        first = get_historical_data(["AAPL", "TSLA"], start, end,
+                                    store=store)
+        assert store.symbols() == ["AAPL", "TSLA"]
+        second = get_historical_data(["AAPL", "TSLA"], start, end,
+                                     store=store)
+        assert len(standin.paths) == 1
+        assert first == second
+        # Stored bars have the types of downloaded ones
+        assert [type(b["volume"]) for b in second["AAPL"].values()] == \
+            [type(b["volume"]) for b in first["AAPL"].values()]
+        df = store.load(["AAPL", "TSLA"], start, end)
+        assert len(df) == len(first["AAPL"]) + len(first["TSLA"])
+        close = [first["AAPL"][d]["close"] for d in sorted(first["AAPL"])]
+        assert np.allclose(df.loc["AAPL"]["close"], close)
+
+    def test_first_bar_after_start(self, store, standin):
+        # The first bar of the 1m range is later than start
+        start = datetime.now() - timedelta(days=30)
+        end = datetime.now() - timedelta(days=3)
+        for _ in range(3):
+            get_historical_data("AAPL", start, end, store=store)
+        assert len(standin.paths) == 1
+        assert store.get_coverage("AAPL")[0] == start.strftime("%Y-%m-%d")
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+
+from iexfinance.base import _IEXBase, _IN_FLIGHT
+from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.retry import RetryPolicy
+from iexfinance.utils.singleflight import SingleFlight
+from tests.helpers import FakeResponse, FakeSession
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr("iexfinance.base.time.sleep", calls.append)
+    return calls
+
+
+class TestRetryPolicy(object):
+
+    def test_backoff_cap(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        assert [policy.get_backoff(i) for i in range(5)] == [1, 2, 4, 5, 5]
+
+    def test_backoff_jitter(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        for i in range(5):
+            assert 0 <= policy.get_backoff(i) <= min(5, 2 ** i)
+
+    def test_retry_after_seconds(self):
+        policy = RetryPolicy(max_backoff=10)
+        resp = FakeResponse(429, headers={"Retry-After": "3"})
+        assert policy.get_backoff(0, resp) == 3
+        resp = FakeResponse(429, headers={"Retry-After": "120"})
+        assert policy.get_backoff(0, resp) == 10
+
+    def test_retry_after_date(self):
+        policy = RetryPolicy()
+        resp = FakeResponse(503, headers={
+            "Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        assert policy.get_backoff(0, resp) == 0
+
+    def test_retryable_statuses(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable(429)
+        assert policy.is_retryable(503)
+        assert not policy.is_retryable(404)
+
+    def test_invalid_values(self):
+        with pytest.raises(ValueError):
+            RetryPolicy(max_retries=-1)
+        with pytest.raises(ValueError):
+            RetryPolicy(backoff_factor=-1)
+
+
+class TestExecuteQuery(object):
+
+    def test_default_policy(self):
+        base = _IEXBase(retry_count=2, pause=0.25)
+        assert base.retry_policy.max_retries == 2
+        assert base.retry_policy.backoff_factor == 0.25
+
+    def test_retry_then_success(self, sleeps):
+        session = FakeSession([FakeResponse(503), FakeResponse(429),
+                               FakeResponse(200, {"a": 1})])
+        base = _IEXBase(session=session)
+        assert base._execute_iex_query("url") == {"a": 1}
+        assert len(session.urls) == 3
+        assert len(sleeps) == 2
+
+    def test_fail_fast_client_error(self, sleeps):
+        session = FakeSession([FakeResponse(404), FakeResponse(200, {})])
+        base = _IEXBase(session=session)
+        with pytest.raises(IEXQueryError):
+            base._execute_iex_query("url")
+        assert len(session.urls) == 1
+        assert sleeps == []
+
+    def test_retries_exhausted(self, sleeps):
+        session = FakeSession([FakeResponse(500)] * 3)
+        policy = RetryPolicy(max_retries=2, jitter=False, backoff_factor=1)
+        base = _IEXBase(session=session, retry_policy=policy)
+        with pytest.raises(IEXQueryError):
+            base._execute_iex_query("url")
+        assert len(session.urls) == 3
+        assert sleeps == [1, 2]
+
+    def test_retry_after_honoured(self, sleeps):
+        session = FakeSession([FakeResponse(429, headers={"Retry-After": "7"}),
+                               FakeResponse(200, [])])
+        base = _IEXBase(session=session)
+        assert base._execute_iex_query("url") == []
+        assert sleeps == [7]
+
+    def test_rate_limiter_consulted(self, sleeps):
+        class Limiter(object):
+            urls = []
+
+            def acquire(self, url):
+                self.urls.append(url)
+
+        session = FakeSession([FakeResponse(503), FakeResponse(200, {})])
+        base = _IEXBase(session=session, rate_limiter=Limiter())
+        base._execute_iex_query("url")
+        assert base.rate_limiter.urls == ["url", "url"]
+
+
+class BlockingSession(object):
+    """Holds every request until released, counting the requests sent"""
+
+    def __init__(self, body):
+        self.body = body
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get(self, url=None, **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        if self.body is None:
+            return FakeResponse(404)
+        return FakeResponse(200, self.body)
+
+
+class TestCoalescing(object):
+
+    def _run(self, session, n=5, **kwargs):
+        results = [None] * n
+        errors = [None] * n
+
+        def target(i):
+            try:
+                results[i] = _IEXBase(session=session,
+                                      **kwargs)._execute_iex_query("url")
+            except Exception as e:
+                errors[i] = e
+        threads = [threading.Thread(target=target, args=(i,))
+                   for i in range(n)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        session.release.set()
+        for t in threads:
+            t.join()
+        return results, errors
+
+    def test_shared_response(self):
+        session = BlockingSession({"AAPL": {"quote": {}}})
+        results, errors = self._run(session)
+        assert session.calls == 1
+        assert errors == [None] * 5
+        assert all(r == {"AAPL": {"quote": {}}} for r in results)
+        assert len(set(id(r) for r in results)) == 5
+        assert _IN_FLIGHT.in_flight == 0
+
+    def test_shared_error(self, sleeps):
+        session = BlockingSession(None)
+        results, errors = self._run(session)
+        assert session.calls == 1
+        assert all(isinstance(e, IEXQueryError) for e in errors)
+
+    def test_disabled(self):
+        session = BlockingSession({})
+        self._run(session, coalesce=False)
+        assert session.calls == 5
+
+    def test_leader_changes_not_shared(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        results = []
+
+        def func():
+            release.wait(5)
+            return {"AAPL": 1, "TSLA": 2}
+
+        def leader():
+            flight.do("url", func).clear()
+
+        def follower():
+            results.append(flight.do("url", func))
+        threads = [threading.Thread(target=leader)]
+        threads += [threading.Thread(target=follower) for _ in range(3)]
+        for t in threads:
+            t.start()
+            time.sleep(0.02)
+        release.set()
+        for t in threads:
+            t.join()
+        assert results == [{"AAPL": 1, "TSLA": 2}] * 3
+
+    def test_sequential_not_shared(self):
+        session = FakeSession([FakeResponse(200, [1]), FakeResponse(200, [2])])
+        base = _IEXBase(session=session)
+        assert base._execute_iex_query("url") == [1]
+        assert base._execute_iex_query("url") == [2]
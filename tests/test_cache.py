@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import pytest
+
+from iexfinance import TOPS
+from iexfinance.base import _IEXBase
+from iexfinance.utils import cache as cache_module
+from iexfinance.utils.cache import (ResponseCache, cache_ttl, disable_cache,
+                                    enable_cache, get_cache, HOUR)
+from tests.helpers import FakeResponse
+
+URL = "https://api.iextrading.com/1.0/"
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "_clock", clock)
+    return clock
+
+
+class CountingSession(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url=None, **kwargs):
+        self.calls += 1
+        return FakeResponse(200, [{"symbol": "AAPL", "n": self.calls}])
+
+
+class TestCacheTTL(object):
+
+    def test_stock_batch_most_volatile(self):
+        url = URL + "stock/market/batch?symbols=AAPL&types=company,logo"
+        assert cache_ttl(url) == 12 * HOUR
+        url = URL + "stock/market/batch?symbols=AAPL&types=company,quote"
+        assert cache_ttl(url) == 5
+
+    def test_stock_single(self):
+        assert cache_ttl(URL + "stock/aapl/logo") == 12 * HOUR
+        assert cache_ttl(URL + "stock/aapl/unknown") == 0
+
+    def test_market(self):
+        assert cache_ttl(URL + "tops?symbols=AAPL") == 1
+        assert cache_ttl(URL + "tops/last") == 1
+
+    def test_historical_past_months(self):
+        now = datetime(2018, 3, 15)
+        url = URL + "stats/historical?date="
+        assert cache_ttl(url + "201801", now=now) is None
+        assert cache_ttl(url + "201803", now=now) == HOUR
+        url = URL + "stats/historical/daily?date="
+        assert cache_ttl(url + "20180314", now=now) is None
+        assert cache_ttl(url + "20180315", now=now) == 300
+
+    def test_unknown(self):
+        assert cache_ttl("http://localhost/other") == 0
+
+
+class TestResponseCache(object):
+
+    def test_hit_miss(self, clock):
+        cache = ResponseCache()
+        assert cache.get(URL + "tops") is None
+        cache.put(URL + "tops", b"[]")
+        assert cache.get(URL + "tops") == b"[]"
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+        assert stats["size"] == 2
+
+    def test_expiry(self, clock):
+        cache = ResponseCache()
+        cache.put(URL + "tops", b"[]")
+        clock.now = 1.5
+        assert cache.get(URL + "tops") is None
+        assert cache.size == 0
+
+    def test_forever(self, clock):
+        cache = ResponseCache()
+        cache.put(URL + "x", b"[]", ttl=None)
+        clock.now = 1e9
+        assert cache.get(URL + "x") == b"[]"
+
+    def test_not_cacheable(self):
+        cache = ResponseCache()
+        cache.put("http://localhost/other", b"[]")
+        assert len(cache) == 0
+
+    def test_lru_eviction(self, clock):
+        cache = ResponseCache(max_bytes=10)
+        cache.put("a", b"1234", ttl=60)
+        cache.put("b", b"1234", ttl=60)
+        cache.get("a")
+        cache.put("c", b"1234", ttl=60)
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1234"
+        assert cache.get("c") == b"1234"
+        assert cache.size == 8
+        assert cache.evictions == 1
+
+    def test_custom_ttls(self):
+        cache = ResponseCache(ttls={"tops": 0})
+        cache.put(URL + "tops", b"[]")
+        assert len(cache) == 0
+
+
+class TestReaderCache(object):
+
+    def teardown_method(self):
+        disable_cache()
+
+    def test_disabled_by_default(self):
+        assert get_cache() is None
+        assert _IEXBase().cache is None
+
+    def test_reader_cache(self, clock):
+        cache = ResponseCache()
+        session = CountingSession()
+        first = TOPS("AAPL", session=session, cache=cache).fetch()
+        first[0]["n"] = "changed"
+        second = TOPS("AAPL", session=session, cache=cache).fetch()
+        assert session.calls == 1
+        assert second[0]["n"] == 1
+        clock.now = 2
+        TOPS("AAPL", session=session, cache=cache).fetch()
+        assert session.calls == 2
+
+    def test_process_wide(self, clock):
+        cache = enable_cache(max_bytes=1024)
+        session = CountingSession()
+        TOPS("AAPL", session=session).fetch()
+        TOPS("AAPL", session=session).fetch()
+        TOPS("AAPL", session=session, cache=False).fetch()
+        assert session.calls == 2
+        assert cache.get_stats()["hits"] == 1
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+
+from iexfinance.utils.compact import Records, compact, deep_sizeof, expand
+
+
+def bars(n):
+    return [{"date": "2018-01-%02d" % (i % 28 + 1), "close": 1.5 + i,
+             "volume": 100 * i, "label": "Jan %d" % i} for i in range(n)]
+
+
+class TestRecords(object):
+
+    def test_columns(self):
+        records = Records(bars(20))
+        assert len(records) == 20
+        assert records.fields == ("date", "close", "volume", "label")
+        assert isinstance(records.columns[1], np.ndarray)
+        assert records.columns[2].dtype == np.int64
+        assert isinstance(records.columns[3], list)
+
+    def test_access(self):
+        records = Records(bars(20))
+        assert records[3] == bars(20)[3]
+        assert records[-1] == bars(20)[-1]
+        assert records[2:4] == bars(20)[2:4]
+        assert records == bars(20)
+        # Values are plain Python values
+        assert json.dumps(records[5]) == json.dumps(bars(20)[5])
+
+    def test_missing_fields(self):
+        data = [{"a": 1}, {"b": "x"}, {"a": 2, "b": "y"}]
+        assert Records(data).tolist() == data
+
+    def test_nested(self):
+        data = {"symbol": "AAPL",
+                "financials": [{"reportDate": "2017-12-31", "sub": [{"x": 1},
+                                                                    {"x": 2}]},
+                               {"reportDate": "2017-09-30", "sub": []}]}
+        compacted = compact(data)
+        assert isinstance(compacted["financials"], Records)
+        assert expand(compacted) == data
+
+
+class TestCompact(object):
+
+    def test_unchanged(self):
+        data = {"peers": ["MSFT", "GOOGL"], "quote": {"latestPrice": 1.5}}
+        assert expand(data) is data
+        assert compact(data) == data
+
+    def test_smaller(self):
+        data = {"chart": bars(100), "news": bars(10)}
+        assert deep_sizeof(compact(data)) < deep_sizeof(data) / 2
+
+    def test_deep_sizeof_shared(self):
+        item = {"a": 1.5}
+        assert deep_sizeof([item, item]) < deep_sizeof([item, {"a": 2.5}])
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from iexfinance.base import _IEXBase
+from iexfinance.utils import decoders
+from iexfinance.utils.decoders import get_json_decoder, set_json_decoder
+from iexfinance.utils.exceptions import IEXQueryError
+
+
+class FakeResponse(object):
+
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+    @property
+    def text(self):
+        raise AssertionError("Body should not be decoded to text")
+
+
+class TestDecoders(object):
+
+    def teardown_method(self):
+        set_json_decoder("json")
+
+    def test_stdlib(self):
+        loads = get_json_decoder("json")
+        assert loads(b'{"a": [1, 2.5, "\\u00e9"]}') == {"a": [1, 2.5, u"\xe9"]}
+
+    def test_auto(self):
+        assert callable(get_json_decoder("auto"))
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            get_json_decoder("yaml")
+
+    def test_process_wide(self):
+        calls = []
+
+        def loads(content):
+            calls.append(content)
+            return json.loads(content.decode("utf-8"))
+        set_json_decoder(loads)
+        assert decoders.json_loads(b"[]") == []
+        assert _IEXBase()._validate_response(FakeResponse(b"{}")) == {}
+        assert len(calls) == 2
+
+
+class TestValidateResponse(object):
+
+    def test_single_pass(self):
+        base = _IEXBase()
+        body = {"AAPL": {"quote": {"latestPrice": 1.5}}}
+        response = FakeResponse(json.dumps(body).encode("utf-8"))
+        assert base._validate_response(response) == body
+
+    def test_reader_decoder(self):
+        base = _IEXBase(json_decoder=lambda content: "decoded")
+        assert base._validate_response(FakeResponse(b"[]")) == "decoded"
+
+    def test_unknown_symbol(self):
+        with pytest.raises(IEXQueryError):
+            _IEXBase()._validate_response(FakeResponse(b"Unknown symbol"))
+
+    def test_error_message(self):
+        with pytest.raises(IEXQueryError):
+            _IEXBase()._validate_response(
+                FakeResponse(b'{"Error Message": "Bad"}'))
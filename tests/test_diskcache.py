@@ -0,0 +1,233 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from iexfinance import HistoricalReader, MonthlySummaryReader
+from iexfinance.utils.diskcache import (DiskCache, disable_disk_cache,
+                                        enable_disk_cache, get_disk_cache)
+from tests.helpers import FakeResponse
+
+URL = "https://api.iextrading.com/1.0/"
+
+
+def make_bars(days=40):
+    today = date.today()
+    return [{"date": (today - timedelta(days=n)).strftime("%Y-%m-%d"),
+             "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5,
+             "volume": n} for n in range(days, -1, -1)]
+
+
+class ChartSession(object):
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url=None, **kwargs):
+        self.urls.append(url)
+        if "stats/historical" in url:
+            return FakeResponse(200, [{"averageDailyVolume": len(self.urls)}])
+        symbols = url.split("symbols=")[1].split("&")[0].split(",")
+        return FakeResponse(200, dict((s, {"chart": make_bars()})
+                                      for s in symbols))
+
+
+class TestDiskCache(object):
+
+    def test_immutable_responses_only(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        past = URL + "stats/historical?date=201701"
+        cache.put(past, b"[1, 2]")
+        cache.put(URL + "tops", b"[]")
+        assert cache.get(past) == b"[1, 2]"
+        assert cache.get(URL + "tops") is None
+        assert cache.get_stats()["responses"] == 1
+
+    def test_shared_between_instances(self, tmpdir):
+        past = URL + "stats/historical/daily?date=20170103"
+        DiskCache(str(tmpdir)).put(past, b"{}")
+        assert DiskCache(str(tmpdir)).get(past) == b"{}"
+
+    def test_bars_coverage(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        bars = [{"date": "2018-01-0%d" % d, "close": d} for d in (2, 3, 4)]
+        cache.put_bars("AAPL", bars, "2018-01-02", "2018-01-03")
+        assert cache.get_coverage("AAPL") == ("2018-01-02", "2018-01-03")
+        assert cache.covers("AAPL", datetime(2018, 1, 2), date(2018, 1, 3))
+        assert not cache.covers("AAPL", "2018-01-02", "2018-01-04")
+        assert [b["close"] for b in
+                cache.get_bars("AAPL", "2018-01-01", "2018-01-31")] == [2, 3]
+
+    def test_bars_coverage_merge(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        cache.put_bars("AAPL", [], "2018-01-02", "2018-01-10")
+        cache.put_bars("AAPL", [], "2018-01-11", "2018-01-20")
+        assert cache.get_coverage("AAPL") == ("2018-01-02", "2018-01-20")
+        cache.put_bars("AAPL", [], "2018-02-01", "2018-02-10")
+        assert cache.get_coverage("AAPL") == ("2018-02-01", "2018-02-10")
+
+
+class TestReaderDiskCache(object):
+
+    def teardown_method(self):
+        disable_disk_cache()
+
+    def test_disabled_by_default(self):
+        assert get_disk_cache() is None
+
+    def test_historical_reader(self, tmpdir):
+        cache = enable_disk_cache(str(tmpdir))
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=30)
+        end = datetime.now() - timedelta(days=5)
+        first = HistoricalReader(["AAPL", "TSLA"], start, end,
+                                 session=session).fetch()
+        second = HistoricalReader(["AAPL", "TSLA"], start, end,
+                                  session=session).fetch()
+        assert len(session.urls) == 1
+        assert first == second
+        assert cache.get_stats()["symbols"] == 2
+        # Today's bar is not settled: ranges ending today are downloaded
+        HistoricalReader("AAPL", start, datetime.now(),
+                         session=session).fetch()
+        assert len(session.urls) == 2
+        assert session.urls[1].count("AAPL") == 1
+
+    def test_historical_reader_partial(self, tmpdir):
+        enable_disk_cache(str(tmpdir))
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=30)
+        end = datetime.now() - timedelta(days=5)
+        HistoricalReader(["AAPL", "TSLA"], start, end,
+                         session=session).fetch()
+        df = HistoricalReader(["AAPL", "MSFT"], start, end, session=session,
+                              output_format="pandas").fetch()
+        assert "symbols=MSFT&" in session.urls[1]
+        assert isinstance(df["AAPL"], pd.DataFrame)
+        assert df["AAPL"].equals(df["MSFT"])
+
+    def test_monthly_past(self, tmpdir):
+        enable_disk_cache(str(tmpdir))
+        session = ChartSession()
+        year = datetime.now().year - 1
+        kwargs = dict(start=datetime(year, 1, 1), end=datetime(year, 3, 1),
+                      session=session)
+        first = MonthlySummaryReader(**kwargs).fetch()
+        second = MonthlySummaryReader(**kwargs).fetch()
+        assert len(session.urls) == 2
+        assert first == second
+
+
+class TestChartRange(object):
+
+    def test_smallest_range(self, monkeypatch):
+        monkeypatch.setattr("iexfinance.stock._today",
+                            lambda: date(2018, 3, 15))
+        expected = [(datetime(2018, 3, 1), "1m"),
+                    (datetime(2018, 2, 15), "1m"),
+                    (datetime(2018, 1, 20), "ytd"),
+                    (datetime(2017, 11, 1), "6m"),
+                    (datetime(2017, 6, 1), "1y"),
+                    (datetime(2016, 6, 1), "2y"),
+                    (datetime(2014, 1, 1), "5y")]
+        for start, chart_range in expected:
+            reader = HistoricalReader("AAPL", start, datetime(2018, 3, 15))
+            assert reader.chart_range == chart_range
+
+    def test_too_old(self, monkeypatch):
+        monkeypatch.setattr("iexfinance.stock._today",
+                            lambda: date(2018, 3, 15))
+        reader = HistoricalReader("AAPL", datetime(2013, 3, 1),
+                                  datetime(2018, 3, 15))
+        with pytest.raises(ValueError):
+            reader.chart_range
+
+    def test_range_in_query(self):
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=20)
+        HistoricalReader("AAPL", start, datetime.now(),
+                         session=session).fetch()
+        assert "range=1m" in session.urls[0]
+
+
+class TestGapFetching(object):
+
+    def test_missing_tail_only(self, tmpdir):
+        enable_disk_cache(str(tmpdir))
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=35)
+        end = datetime.now() - timedelta(days=3)
+        HistoricalReader(["AAPL", "TSLA"], start, end,
+                         session=session).fetch()
+        assert "range=3m" in session.urls[0]
+        data = HistoricalReader(["AAPL", "TSLA"], start, datetime.now(),
+                                session=session).fetch()
+        # Only the days after the stored bars are downloaded
+        assert "range=1m" in session.urls[1]
+        disable_disk_cache()
+        assert data == HistoricalReader(["AAPL", "TSLA"], start,
+                                        datetime.now(),
+                                        session=ChartSession()).fetch()
+
+    def test_one_query_per_range(self, tmpdir):
+        enable_disk_cache(str(tmpdir))
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=35)
+        end = datetime.now() - timedelta(days=3)
+        HistoricalReader("AAPL", start, end, session=session).fetch()
+        df = HistoricalReader(["AAPL", "MSFT"], start, datetime.now(),
+                              session=session, output_format="pandas",
+                              max_workers=1).fetch()
+        assert len(session.urls) == 3
+        assert "symbols=AAPL&" in session.urls[1]
+        assert "range=1m" in session.urls[1]
+        assert "symbols=MSFT&" in session.urls[2]
+        assert "range=3m" in session.urls[2]
+        assert df["AAPL"].equals(df["MSFT"])
+
+
+class TestChunking(object):
+
+    syms = ["SYM%d" % i for i in range(250)]
+
+    def test_symbol_count(self):
+        session = ChartSession()
+        start = datetime.now() - timedelta(days=20)
+        data = HistoricalReader(self.syms, start, datetime.now(),
+                                session=session).fetch()
+        assert len(session.urls) == 3
+        assert sorted(len(url.split("symbols=")[1].split("&")[0].split(","))
+                      for url in session.urls) == [50, 100, 100]
+        assert list(data) == self.syms
+
+    def test_payload_size(self):
+        reader = HistoricalReader(self.syms[:40], datetime.now() -
+                                  timedelta(days=4 * 365), datetime.now())
+        # 5 years of bars: 19 symbols per query
+        assert reader._chunk_size("5y") == 19
+        assert len(reader._get_urls()) == 3
+        assert [len(chunk) for chunk in reader._url_chunks] == [19, 19, 2]
+
+    def test_iter_fetch(self):
+        start = datetime.now() - timedelta(days=20)
+        reader = HistoricalReader(self.syms, start, datetime.now(),
+                                  output_format="pandas", layout="long",
+                                  session=ChartSession())
+        parts = list(reader.iter_fetch())
+        assert len(parts) == 3
+        df = pd.concat(parts).sort_index()
+        assert df.equals(reader.fetch().sort_index())
+
+    def test_iter_fetch_stored_first(self, tmpdir):
+        enable_disk_cache(str(tmpdir))
+        start = datetime.now() - timedelta(days=20)
+        end = datetime.now() - timedelta(days=3)
+        HistoricalReader(["AAPL", "TSLA"], start, end,
+                         session=ChartSession()).fetch()
+        session = ChartSession()
+        parts = list(HistoricalReader(["AAPL", "MSFT", "TSLA"], start, end,
+                                      session=session).iter_fetch())
+        disable_disk_cache()
+        assert [sorted(part) for part in parts] == [["AAPL", "TSLA"],
+                                                    ["MSFT"]]
+        assert len(session.urls) == 1
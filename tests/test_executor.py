@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from iexfinance import TOPS, Last, ReaderExecutor, fetch_readers
+from iexfinance.utils.exceptions import IEXQueryError
+from tests.helpers import FakeResponse
+
+
+class FakeSession(object):
+    """Answers each URL with its symbols, failing any URL containing BAD"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get(self, url=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if "BAD" in url:
+            return FakeResponse(404)
+        symbols = url.split("symbols=")[1].split(",")
+        return FakeResponse(200, [{"symbol": s} for s in symbols])
+
+
+class TestReaderExecutor(object):
+
+    def test_ordered_results(self):
+        session = FakeSession()
+        readers = [TOPS(s, session=session) for s in ("A", "B", "C")]
+        results = fetch_readers(readers)
+        assert [r.index for r in results] == [0, 1, 2]
+        assert [r.result[0]["symbol"] for r in results] == ["A", "B", "C"]
+        assert all(r.ok for r in results)
+
+    def test_errors_collected(self):
+        session = FakeSession()
+        readers = [TOPS("A", session=session), Last("BAD", session=session),
+                   TOPS("C", session=session)]
+        results = fetch_readers(readers)
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, IEXQueryError)
+        assert results[1].result is None
+        assert results[1].reader is readers[1]
+
+    def test_as_completed(self):
+        session = FakeSession()
+        readers = [TOPS(str(i), session=session) for i in range(10)]
+        with ReaderExecutor(max_workers=3) as executor:
+            results = list(executor.fetch_as_completed(readers))
+        assert sorted(r.index for r in results) == list(range(10))
+
+    def test_bounded(self):
+        session = FakeSession(delay=0.02)
+        readers = [TOPS(str(i), session=session) for i in range(12)]
+        with ReaderExecutor(max_workers=3) as executor:
+            executor.fetch(readers)
+        assert 1 < session.max_active <= 3
+
+    def test_invalid_workers(self):
+        with pytest.raises(ValueError):
+            ReaderExecutor(max_workers=0)
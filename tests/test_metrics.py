@@ -0,0 +1,176 @@
+import json
+import threading
+
+import pytest
+
+from iexfinance import TOPS
+from iexfinance.base import _IEXBase
+from iexfinance.utils import _build_session
+from iexfinance.utils.exceptions import IEXQueryError
+from iexfinance.utils.metrics import (FormatEvent, Histogram, MetricsRegistry,
+                                      RequestEvent, endpoint_name,
+                                      get_metrics)
+from tests.helpers import FakeResponse, FakeSession
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+URL = "https://api.iextrading.com/1.0/"
+
+
+@pytest.fixture
+def events():
+    registry = get_metrics()
+    registry.reset()
+    recorded = []
+    registry.add_listener(recorded.append)
+    yield recorded
+    registry.remove_listener(recorded.append)
+    registry.reset()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr("iexfinance.base.time.sleep", calls.append)
+    return calls
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = json.dumps([{"symbol": "AAPL"}]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield "http://127.0.0.1:%d/1.0/" % httpd.server_port
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHistogram(object):
+
+    def test_summary(self):
+        h = Histogram()
+        for value in (0.0005, 0.003, 0.003, 0.04, 2.5):
+            h.observe(value)
+        stats = h.to_dict()
+        assert stats["count"] == 5
+        assert stats["min"] == 0.0005
+        assert stats["max"] == 2.5
+        assert stats["p50"] == 0.005
+        assert stats["p99"] == 2.5
+        assert stats["buckets"]["0.005"] == 2
+
+    def test_empty(self):
+        assert Histogram().percentile(50) is None
+
+
+class TestEndpointName(object):
+
+    def test_stock(self):
+        assert endpoint_name(URL + "stock/AAPL/quote") == "stock/quote"
+        assert endpoint_name(URL + "stock/market/batch?symbols=AAPL"
+                             "&types=quote") == "stock/batch"
+
+    def test_other(self):
+        assert endpoint_name(URL + "tops?symbols=AAPL") == "tops"
+        assert endpoint_name(URL + "stats/historical/daily?last=5") == \
+            "stats/historical/daily"
+        assert endpoint_name(URL + "daily-list/dividends/20180101") == \
+            "daily-list"
+
+
+class TestRegistry(object):
+
+    def test_record(self):
+        registry = MetricsRegistry()
+        event = RequestEvent("tops", URL + "tops")
+        event.attempts = 3
+        event.bytes = 10
+        event.total = 0.2
+        event.error = "IEXQueryError"
+        registry.record(event)
+        registry.record(FormatEvent("tops", "pandas", 0.01))
+        stats = registry.get_stats()["tops"]
+        assert stats["requests"] == 1
+        assert stats["retries"] == 2
+        assert stats["errors"] == 1
+        assert stats["bytes"] == 10
+        assert stats["total"]["count"] == 1
+        assert stats["format"]["sum"] == 0.01
+
+    def test_listeners(self):
+        registry = MetricsRegistry()
+        seen = []
+        registry.add_listener(seen.append)
+        registry.record(FormatEvent("tops", "pandas", 0.0))
+        registry.remove_listener(seen.append)
+        registry.record(FormatEvent("tops", "pandas", 0.0))
+        assert len(seen) == 1
+
+    def test_reset(self):
+        registry = MetricsRegistry()
+        registry.increment("tops", "cache_hits")
+        registry.reset()
+        assert registry.get_stats() == {}
+
+
+class TestInstrumentation(object):
+
+    def test_request_event(self, events, sleeps):
+        session = FakeSession([FakeResponse(503),
+                               FakeResponse(200, [{"symbol": "AAPL"}])])
+        base = _IEXBase(session=session)
+        base._execute_iex_query(URL + "tops?symbols=AAPL")
+        event = events[0]
+        assert event.endpoint == "tops"
+        assert event.status == 200
+        assert event.attempts == 2
+        assert event.retries == 1
+        assert event.bytes == len(b'[{"symbol": "AAPL"}]')
+        assert event.error is None
+        assert event.total >= event.ttfb + event.download + event.decode
+
+    def test_failed_request(self, events):
+        base = _IEXBase(session=FakeSession([FakeResponse(404)]))
+        with pytest.raises(IEXQueryError):
+            base._execute_iex_query(URL + "tops")
+        assert events[0].status == 404
+        assert events[0].error == "IEXQueryError"
+        assert get_metrics().get_stats()["tops"]["errors"] == 1
+
+    def test_connect_timing(self, events, server):
+        session = _build_session(0, 1, 1, False, True)
+        base = _IEXBase(session=session, cache=False)
+        base._execute_iex_query(server + "tops")
+        base._execute_iex_query(server + "tops")
+        session.close()
+        assert events[0].connect > 0
+        # The pooled connection is reused
+        assert events[1].connect == 0
+
+    def test_format_event(self, events):
+        session = FakeSession([FakeResponse(200, [{"symbol": "AAPL"}])])
+        TOPS("AAPL", output_format="pandas", session=session).fetch()
+        assert [e.kind for e in events] == ["request", "format"]
+        assert events[1].endpoint == "tops"
+        stats = get_metrics().get_stats()["tops"]
+        assert stats["prepare"]["count"] == 1
+        assert stats["format"]["count"] == 1
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from iexfinance.base import _IEXBase
+from iexfinance.utils import ratelimit
+from iexfinance.utils.ratelimit import (RateLimiter, TokenBucket,
+                                        _endpoint_family, get_rate_limiter,
+                                        get_rate_limit_stats,
+                                        reset_rate_limits, set_rate_limit)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "_clock", clock)
+    return clock
+
+
+class TestTokenBucket(object):
+
+    def test_burst_then_wait(self, clock):
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1)
+        assert bucket.reserve() == pytest.approx(0.2)
+        stats = bucket.get_stats()
+        assert stats["requests"] == 4
+        assert stats["delayed"] == 2
+        assert stats["max_wait"] == pytest.approx(0.2)
+        assert stats["wait_time"] == pytest.approx(0.3)
+
+    def test_refill(self, clock):
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.reserve()
+        bucket.reserve()
+        clock.now = 10.0
+        assert bucket.wait_time == 0
+        assert bucket.reserve() == 0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+        with pytest.raises(ValueError):
+            TokenBucket(rate=10, capacity=0.5)
+
+    def test_thread_safe(self, clock):
+        bucket = TokenBucket(rate=1, capacity=1)
+        threads = [threading.Thread(target=bucket.reserve)
+                   for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert bucket.requests == 20
+        assert bucket.max_wait == pytest.approx(19)
+
+
+class TestRateLimiter(object):
+
+    def teardown_method(self):
+        reset_rate_limits()
+
+    def test_endpoint_family(self):
+        base = "https://api.iextrading.com/1.0/"
+        assert _endpoint_family(base + "stock/market/batch?x=1") == "stock"
+        assert _endpoint_family(base + "tops/last") == "market"
+        assert _endpoint_family(base + "deep/book") == "market"
+        assert _endpoint_family(base + "stats/intraday") == "stats"
+        assert _endpoint_family(base + "ref-data/symbols") == "ref-data"
+        assert _endpoint_family(base + "daily-list/dividends") == "ref-data"
+        assert _endpoint_family("http://localhost/other") is None
+
+    def test_family_limits(self, clock):
+        limiter = RateLimiter()
+        limiter.set_limit("stats", 1, 1)
+        url = "https://api.iextrading.com/1.0/stats/intraday"
+        assert limiter.reserve(url) == 0
+        assert limiter.reserve(url) == pytest.approx(1)
+        assert limiter.reserve("https://api.iextrading.com/1.0/tops") == 0
+        assert set(limiter.get_stats()) == {"stats"}
+
+    def test_overall_limit(self, clock):
+        limiter = RateLimiter(rate=1, capacity=1)
+        assert limiter.reserve("https://api.iextrading.com/1.0/tops") == 0
+        assert limiter.reserve("https://api.iextrading.com/1.0/stats") == 1
+
+    def test_invalid_family(self):
+        with pytest.raises(ValueError):
+            RateLimiter().set_limit("options", 5)
+
+    def test_process_wide(self):
+        assert _IEXBase().rate_limiter is get_rate_limiter()
+        set_rate_limit("market", 50)
+        assert get_rate_limit_stats()["market"]["rate"] == 50
+        assert get_rate_limit_stats()["all"]["rate"] == ratelimit.DEFAULT_RATE
@@ -0,0 +1,84 @@
+import pytest
+
+from iexfinance import Stock, get_market_tops
+from iexfinance.utils import _build_session
+from iexfinance.utils.exceptions import IEXQueryError, IEXReplayError
+from iexfinance.utils.replay import (Cassette, RecordingSession,
+                                     ReplaySession, request_key)
+from iexfinance.utils.standin import StandInServer
+
+
+@pytest.fixture
+def session():
+    session = _build_session(0, 1, 1, False, True)
+    yield session
+    session.close()
+
+
+class TestRequestKey(object):
+
+    def test_ignores_host_and_param_order(self):
+        a = request_key("https://api.iextrading.com/1.0/tops?symbols=A&x=1")
+        b = request_key("http://127.0.0.1:8000/1.0/tops?x=1&symbols=A")
+        assert a == b == "1.0/tops?symbols=A&x=1"
+
+
+class TestCassette(object):
+
+    def test_sequence(self):
+        cassette = Cassette()
+        cassette.record("http://h/1.0/tops", 503, {}, b"")
+        cassette.record("http://h/1.0/tops", 200, {}, b"[]")
+        assert cassette.play("http://h/1.0/tops")[0] == 503
+        assert cassette.play("http://h/1.0/tops")[0] == 200
+        # The last response is repeated
+        assert cassette.play("http://h/1.0/tops")[0] == 200
+        cassette.rewind()
+        assert cassette.play("http://h/1.0/tops")[0] == 503
+        assert cassette.play("http://h/1.0/deep") is None
+
+    def test_save_load(self, tmpdir):
+        path = str(tmpdir.join("cassette.json"))
+        cassette = Cassette(path)
+        cassette.record("http://h/1.0/tops", 200, {"a": "b"}, b"[1]")
+        cassette.record("http://h/1.0/deep", 200, {}, b"\xff\x00")
+        cassette.save()
+        loaded = Cassette(path)
+        assert len(loaded) == 2
+        assert loaded.play("http://x/1.0/tops") == (200, {"a": "b"}, b"[1]")
+        assert loaded.play("http://x/1.0/deep")[2] == b"\xff\x00"
+
+
+class TestRecordReplay(object):
+
+    def test_round_trip(self, tmpdir, session):
+        path = str(tmpdir.join("stock.json"))
+        with StandInServer():
+            with RecordingSession(path, session) as recorder:
+                recorded = Stock(["AAPL", "TSLA"], session=recorder)
+                tops = get_market_tops("AAPL", session=recorder)
+        replay = ReplaySession(path)
+        replayed = Stock(["AAPL", "TSLA"], session=replay)
+        assert replayed.get_all() == recorded.get_all()
+        assert get_market_tops("AAPL", session=replay) == tops
+        assert len(replay.urls) == 3
+
+    def test_strict_miss(self):
+        with pytest.raises(IEXReplayError):
+            get_market_tops("AAPL", session=ReplaySession(Cassette()))
+
+    def test_lenient_miss(self):
+        session = ReplaySession(Cassette(), strict=False)
+        with pytest.raises(IEXQueryError):
+            get_market_tops("AAPL", session=session)
+
+    def test_replayed_retries(self, monkeypatch):
+        monkeypatch.setattr("iexfinance.base.time.sleep", lambda s: None)
+        cassette = Cassette()
+        url = "https://api.iextrading.com/1.0/tops?symbols=AAPL"
+        cassette.record(url, 503, {}, b"")
+        cassette.record(url, 200, {}, b'[{"symbol": "AAPL"}]')
+        session = ReplaySession(cassette)
+        assert get_market_tops("AAPL", session=session) == [
+            {"symbol": "AAPL"}]
+        assert len(session.urls) == 2
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from iexfinance.utils.schema import (OHLCV, SCHEMAS, build_chart_frame,
+                                     build_frame)
+
+
+class TestBuildFrame(object):
+
+    def test_dtypes(self):
+        columns = {
+            "symbol": ["AAPL", "TSLA"],
+            "companyName": ["Apple Inc.", "Tesla Inc."],
+            "sector": ["Technology", "Consumer Cyclical"],
+            "latestPrice": [170.5, 350],
+            "latestVolume": [25000000, 4000000],
+            "latestUpdate": [1517000000000, 1517000001000]
+        }
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["quote"])
+        assert list(df.index) == ["AAPL", "TSLA"]
+        assert list(df.columns) == ["companyName", "sector", "latestPrice",
+                                    "latestUpdate", "latestVolume"]
+        assert df["latestPrice"].dtype == np.float64
+        assert df["latestVolume"].dtype == np.int64
+        assert isinstance(df["sector"].dtype, pd.CategoricalDtype)
+        assert df.loc["AAPL", "latestUpdate"] == \
+            pd.Timestamp("2018-01-26 20:53:20")
+
+    def test_missing_values(self):
+        columns = {"latestVolume": [100, None], "peRatio": [None, "12.5"],
+                   "marketCap": [10 ** 9, 1.5]}
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["quote"])
+        assert df["latestVolume"].dtype == np.float64
+        assert np.isnan(df.loc["TSLA", "latestVolume"])
+        assert df.loc["TSLA", "peRatio"] == 12.5
+        assert df.loc["TSLA", "marketCap"] == 1.5
+
+    def test_dates(self):
+        columns = {"shortDate": ["2018-01-12", 0],
+                   "exDividendDate": ["", "2017-11-10 00:00:00.0"]}
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["stats"])
+        assert df.loc["AAPL", "shortDate"] == pd.Timestamp("2018-01-12")
+        assert pd.isnull(df.loc["TSLA", "shortDate"])
+        assert pd.isnull(df.loc["AAPL", "exDividendDate"])
+
+    def test_nested(self):
+        columns = {"open": [{"price": 170.0, "time": 1517000000000}, None],
+                   "high": [171.0, 352.0]}
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["ohlc"])
+        assert list(df.columns) == ["open", "openTime", "high"]
+        assert df.loc["AAPL", "open"] == 170.0
+        assert np.isnan(df.loc["TSLA", "open"])
+
+    def test_unknown_fields(self):
+        columns = {"url": ["a.png", "b.png"], "extra": [1, 2]}
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["logo"])
+        assert list(df.columns) == ["url", "extra"]
+        assert list(df["extra"]) == [1, 2]
+
+    def test_lists(self):
+        columns = {"tags": [["Technology"], ["Auto", "Energy"]]}
+        df = build_frame(["AAPL", "TSLA"], columns, SCHEMAS["company"])
+        assert df.loc["TSLA", "tags"] == ["Auto", "Energy"]
+
+
+class TestBuildChartFrame(object):
+
+    charts = {
+        "AAPL": [{"date": "2018-01-02", "open": 170.2, "close": 172.3,
+                  "volume": 25555934, "label": "Jan 2"},
+                 {"date": "2018-01-03", "open": 172.5, "close": 172.2,
+                  "volume": 29517899, "label": "Jan 3"}],
+        "TSLA": [{"date": "2018-01-03", "open": 302.0, "close": 317.2,
+                  "volume": 4521843, "label": "Jan 3"}]
+    }
+
+    def test_long(self):
+        df = build_chart_frame(self.charts)
+        assert df.index.names == ["symbol", "date"]
+        assert len(df) == 3
+        assert list(df.columns) == ["open", "close", "volume", "label"]
+        assert df["volume"].dtype == np.float64
+        assert df.loc[("TSLA", pd.Timestamp("2018-01-03")), "open"] == 302.0
+
+    def test_wide(self):
+        df = build_chart_frame(self.charts, OHLCV, layout="wide")
+        assert list(df.index) == [pd.Timestamp("2018-01-02"),
+                                  pd.Timestamp("2018-01-03")]
+        assert df[("close", "AAPL")].tolist() == [172.3, 172.2]
+        assert np.isnan(df.loc[pd.Timestamp("2018-01-02"), ("close", "TSLA")])
+
+    def test_date_range(self):
+        df = build_chart_frame(self.charts, OHLCV,
+                               start=datetime(2018, 1, 3, 12),
+                               end=datetime(2018, 1, 3, 9))
+        assert list(df.index.get_level_values("symbol")) == ["AAPL", "TSLA"]
+
+    def test_intraday(self):
+        charts = {"AAPL": [{"date": "20180103", "minute": "09:30",
+                            "open": 172.5},
+                           {"date": "20180103", "minute": "09:31",
+                            "open": 172.6}]}
+        df = build_chart_frame(charts, OHLCV)
+        assert df.index[1] == ("AAPL", pd.Timestamp("2018-01-03 09:31"))
+
+    def test_empty(self):
+        df = build_chart_frame({"AAPL": []}, OHLCV)
+        assert df.empty
+        assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+
+    def test_invalid_layout(self):
+        with pytest.raises(ValueError):
+            build_chart_frame(self.charts, layout="panel")
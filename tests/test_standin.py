@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pandas import DataFrame
+
+from iexfinance import (Stock, get_available_symbols, get_historical_data,
+                        get_iex_dividends, get_market_deep, get_market_tops,
+                        get_stats_daily, get_stats_monthly)
+from iexfinance.base import _IEXBase
+from iexfinance.utils.exceptions import IEXQueryError, IEXSymbolError
+from iexfinance.utils.standin import StandInServer
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr("iexfinance.base.time.sleep", calls.append)
+    return calls
+
+
+class TestStandInServer(object):
+
+    def test_drop_in(self):
+        url = _IEXBase._IEX_API_URL
+        with StandInServer() as server:
+            assert _IEXBase._IEX_API_URL == server.url
+            assert server.port != 0
+        assert _IEXBase._IEX_API_URL == url
+
+    def test_stock(self):
+        with StandInServer() as server:
+            stock = Stock(["AAPL", "TSLA"])
+            quote = stock.get_quote()
+            assert stock.get_open()["AAPL"] == quote["AAPL"]["open"]
+            assert len(stock.get_news()["TSLA"]) == 10
+            assert len(server.paths) == 2
+        # Synthetic data is deterministic
+        with StandInServer():
+            assert Stock(["AAPL", "TSLA"]).get_quote() == quote
+
+    def test_unknown_symbol(self):
+        with StandInServer(unknown_symbols=["BADSYM"]):
+            with pytest.raises(IEXSymbolError):
+                Stock(["AAPL", "BADSYM"])
+
+    def test_historical(self):
+        start = datetime.now() - timedelta(days=60)
+        with StandInServer():
+            df = get_historical_data("AAPL", start, datetime.now(),
+                                     output_format="pandas")
+        assert list(df.columns) == ["open", "high", "low", "close",
+                                    "volume"]
+        assert 30 < len(df) < 50
+
+    def test_market(self):
+        with StandInServer(records=7):
+            assert len(get_market_tops()) == 7
+            tops = get_market_tops(["AAPL", "TSLA"], output_format="pandas")
+            assert list(tops["symbol"]) == ["AAPL", "TSLA"]
+            assert get_market_deep("AAPL")["symbol"] == "AAPL"
+
+    def test_market_filter(self):
+        with StandInServer() as server:
+            tops = get_market_tops(["AAPL", "TSLA"],
+                                   filter=["symbol", "lastSalePrice"])
+        assert server.paths[0].endswith("filter=symbol,lastSalePrice")
+        assert [sorted(t) for t in tops] == [["lastSalePrice", "symbol"]] * 2
+
+    def test_stats_and_ref(self):
+        year = datetime.now().year - 1
+        with StandInServer(records=3):
+            df = get_stats_monthly(datetime(year, 1, 1), datetime(year, 3, 1),
+                                   output_format="pandas")
+            assert isinstance(df, DataFrame)
+            assert len(get_stats_daily(last=5)) == 5
+            assert len(get_iex_dividends()) == 3
+            assert len(get_available_symbols()) == 3
+
+    def test_padding(self):
+        with StandInServer(padding=1000):
+            assert len(get_market_tops("AAPL")[0]["padding"]) == 1000
+
+    def test_error_injection(self, sleeps):
+        with StandInServer(error_rate=1.0) as server:
+            with pytest.raises(IEXQueryError):
+                get_market_tops("AAPL", retry_count=2)
+            assert len(server.paths) == 3
+        assert len(sleeps) == 2
+
+    def test_partial_errors_recovered(self, sleeps):
+        with StandInServer(error_rate=0.5, seed=1):
+            for i in range(10):
+                assert get_market_tops("S%d" % i, retry_count=10)
+
+    def test_latency(self):
+        with StandInServer(latency=0.2):
+            start = datetime.now()
+            get_market_tops("AAPL")
+            assert datetime.now() - start >= timedelta(seconds=0.2)
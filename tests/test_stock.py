@@ -1,11 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import json
 
 import pytest
 import pandas as pd
 
-from iexfinance import get_historical_data
+import iexfinance.stock
+from iexfinance import get_historical_data, get_market_tops
 from iexfinance import Stock
-from iexfinance.utils.exceptions import IEXSymbolError, IEXEndpointError
+from iexfinance.stock import HistoricalReader, StockReader
+from iexfinance.utils import _BufferedResponse
+from iexfinance.utils.exceptions import (IEXQueryError, IEXSymbolError,
+                                         IEXEndpointError, IEXFieldError)
+from iexfinance.utils.standin import StandInServer
 
 
 class TestBase(object):
@@ -19,10 +26,11 @@ class TestBase(object):
             ls = []
             Stock(ls)
 
-    def test_symbol_list_too_long(self):
-        with pytest.raises(ValueError):
-            x = ["tsla"] * 102
-            Stock(x)
+    def test_symbol_list_too_long(self, standin):
+        # Lists beyond 100 symbols are split into several batch requests
+        x = ["tsla"] * 102
+        Stock(x)
+        assert len(standin.paths) == 4
 
     def test_wrong_option_values(self):
         with pytest.raises(ValueError):
@@ -385,3 +393,517 @@ class TestHistorical(object):
         end = datetime(2017, 5, 24)
         with pytest.raises(IEXSymbolError):
             get_historical_data(["BADSYMBOL", "TSLA"], start, end)
+
+
+def requested_types(server):
+    types = []
+    for path in server.paths:
+        query = path.split("?")[1]
+        params = dict(p.split("=") for p in query.split("&"))
+        types.append(params["types"].split(","))
+    return types
+
+
+class TestLazy(object):
+
+    def test_eager_default(self, standin):
+        Stock(["AAPL", "TSLA"])
+        assert requested_types(standin) == [
+            StockReader.ALL_ENDPOINTS_STR_1.split(","),
+            StockReader.ALL_ENDPOINTS_STR_2.split(",")]
+
+    def test_no_download_at_construction(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        assert standin.paths == []
+        assert stock.data_set == {}
+
+    def test_selective(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        price = stock.get_price()
+        assert set(price) == {"AAPL", "TSLA"}
+        assert requested_types(standin) == [["price"]]
+        stock.get_open()
+        stock.get_close()
+        stock.get_quote()
+        assert requested_types(standin) == [["price"], ["quote"]]
+        assert set(stock.data_set["AAPL"]) == {"price", "quote"}
+
+    def test_failed_refresh(self, standin):
+        batch = Stock(["AAPL", "TSLA"], retry_count=0)
+        share = Stock("AAPL", retry_count=0)
+        quotes = batch.get_quote()
+        with StandInServer(error_rate=1.0):
+            for stock in (batch, share):
+                with pytest.raises(IEXQueryError):
+                    stock.refresh()
+        # The previous data is kept
+        assert batch.get_quote() == quotes
+        assert share.get_quote() == quotes["AAPL"]
+
+    def test_share(self, standin):
+        stock = Stock("AAPL", lazy=True)
+        assert stock.get_beta() == stock.get_key_stats()["beta"]
+        assert requested_types(standin) == [["stats"]]
+
+    def test_required_batched(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        stock.require(["news", "chart"])
+        stock.get_quote()
+        assert requested_types(standin) == [["chart", "quote", "news"]]
+        stock.get_news()
+        assert len(standin.paths) == 1
+
+    def test_get_all_minimum_requests(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        stock.get_quote()
+        data = stock.get_all()
+        types = requested_types(standin)
+        assert [len(t) for t in types] == [1, 10, 9]
+        assert set(data["AAPL"]) == set(StockReader._ENDPOINTS)
+
+    def test_select_endpoints(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        data = stock.get_select_endpoints(["logo", "peers"])
+        assert set(data["TSLA"]) == {"logo", "peers"}
+        assert requested_types(standin) == [["peers", "logo"]]
+        with pytest.raises(IEXEndpointError):
+            stock.get_select_endpoints("invalid")
+
+    def test_lazy_refresh(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        stock.refresh()
+        assert standin.paths == []
+        stock.get_quote()
+        stock.refresh()
+        assert requested_types(standin) == [["quote"], ["quote"]]
+        assert set(stock.data_set["AAPL"]) == {"quote"}
+
+    def test_invalid(self, standin):
+        stock = Stock(["AAPL", "BADSYM"], lazy=True)
+        with pytest.raises(IEXSymbolError):
+            stock.get_quote()
+        with pytest.raises(IEXEndpointError):
+            stock.require("invalid")
+
+
+class ChunkSession(object):
+    """Serves stand-in payloads, failing requests for the given symbols"""
+
+    def __init__(self, failing=()):
+        self.server = StandInServer()
+        self.failing = set(failing)
+        self.urls = []
+
+    def get(self, url=None, **kwargs):
+        self.urls.append(url)
+        symbols = url.split("symbols=")[1].split("&")[0].split(",")
+        if self.failing.intersection(symbols):
+            return _BufferedResponse(b"", 404)
+        payload = self.server.payload(url)
+        return _BufferedResponse(json.dumps(payload).encode("utf-8"))
+
+
+def universe(n):
+    return ["SYM%d" % i for i in range(n)]
+
+
+class TestChunked(object):
+
+    def test_chunks(self, standin):
+        stock = Stock(universe(250))
+        assert stock.max_workers == 4
+        assert len(standin.paths) == 6
+        assert list(stock.data_set) == universe(250)
+        assert stock.failures == []
+        prices = stock.get_price()
+        assert len(prices) == 250
+
+    def test_chunk_sizes(self):
+        session = ChunkSession()
+        Stock(universe(201), session=session, lazy=True).get_quote()
+        sizes = sorted(len(u.split("symbols=")[1].split("&")[0].split(","))
+                       for u in session.urls)
+        assert sizes == [1, 100, 100]
+
+    def test_failed_chunk(self):
+        session = ChunkSession(failing=["SYM150"])
+        stock = Stock(universe(250), session=session, lazy=True)
+        quotes = stock.get_quote()
+        assert len(quotes) == 150
+        assert "SYM150" not in quotes
+        assert len(stock.failures) == 1
+        symbols, error = stock.failures[0]
+        assert symbols == universe(200)[100:]
+        assert isinstance(error, IEXQueryError)
+
+    def test_unknown_symbols_reported(self, standin):
+        stock = Stock(universe(150) + ["BADSYM"])
+        assert len(stock.data_set) == 150
+        assert stock.failures[0][0] == ["BADSYM"]
+        assert isinstance(stock.failures[0][1], IEXSymbolError)
+
+    def test_all_failed(self):
+        session = ChunkSession(failing=universe(150))
+        with pytest.raises(IEXQueryError):
+            Stock(universe(150), session=session)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRefreshStale(object):
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr("iexfinance.stock._clock", clock)
+        return clock
+
+    def test_nothing_stale(self, standin, clock):
+        stock = Stock(["AAPL", "TSLA"])
+        assert stock.refresh_stale() == []
+        assert len(standin.paths) == 2
+
+    def test_volatile_endpoints(self, standin, clock):
+        stock = Stock(["AAPL", "TSLA"])
+        data_set = stock.data_set
+        company = data_set["AAPL"]["company"]
+        clock.now = 5
+        refetched = stock.refresh_stale()
+        assert refetched == ["quote", "book", "open-close", "price",
+                             "delayed-quote", "ohlc"]
+        assert requested_types(standin)[2:] == [refetched]
+        # Merged in place
+        assert stock.data_set is data_set
+        assert data_set["AAPL"]["company"] is company
+        assert set(data_set["AAPL"]) == set(StockReader._ENDPOINTS)
+        clock.now = 6
+        assert stock.refresh_stale() == ["book"]
+
+    def test_static_endpoints(self, standin, clock):
+        stock = Stock(["AAPL", "TSLA"])
+        clock.now = 13 * 60 * 60
+        assert len(stock.refresh_stale()) == 20
+        assert len(standin.paths) == 4
+
+    def test_custom_ttls(self, standin, clock):
+        stock = Stock("AAPL", ttls={"quote": None, "book": 10})
+        clock.now = 5
+        assert "quote" not in stock.refresh_stale()
+        assert "book" not in stock.refresh_stale()
+
+    def test_lazy(self, standin, clock):
+        stock = Stock("AAPL", lazy=True)
+        stock.get_company()
+        stock.get_price()
+        clock.now = 10
+        assert stock.refresh_stale() == ["price"]
+
+    def test_failed_chunk(self, clock):
+        session = ChunkSession()
+        stock = Stock(universe(150), session=session, lazy=True)
+        quote = stock.get_quote()["SYM120"]
+        session.failing = {"SYM120"}
+        for clock.now in (5, 10):
+            assert stock.refresh_stale() == ["quote"]
+            assert len(stock.failures) == 1
+            assert stock.failures[0][0] == universe(150)[100:]
+        # The failed symbols keep their previous data
+        quotes = stock.get_quote()
+        assert len(quotes) == 150
+        assert quotes["SYM120"] == quote
+
+
+class TestFields(object):
+
+    def test_field_getters(self, standin):
+        stock = Stock(["AAPL", "TSLA"])
+        names = stock.get_company_name()
+        assert names == {"AAPL": "AAPL Inc.", "TSLA": "TSLA Inc."}
+        quote = stock.get_quote()
+        assert stock.get_open() == {s: quote[s]["open"] for s in quote}
+        stats = stock.get_key_stats()
+        assert stock.get_beta() == {s: stats[s]["beta"] for s in stats}
+
+    def test_share(self, standin):
+        stock = Stock("AAPL")
+        assert stock.get_sector() == "Technology"
+        assert stock.get_latest_eps() == stock.get_key_stats()["latestEPS"]
+
+    def test_index_built_once(self, standin, monkeypatch):
+        stock = Stock(["AAPL", "TSLA"])
+        built = []
+        original = iexfinance.stock._FieldIndex
+
+        def counting(data_set, endpoint, *args):
+            built.append(endpoint)
+            return original(data_set, endpoint, *args)
+        monkeypatch.setattr("iexfinance.stock._FieldIndex", counting)
+        stock.get_open()
+        stock.get_close()
+        stock.get_volume()
+        stock.get_beta()
+        assert built == ["quote", "stats"]
+        stock.refresh()
+        stock.get_open()
+        assert built == ["quote", "stats", "quote"]
+
+    def test_get_fields(self, standin):
+        stock = Stock(["AAPL", "TSLA"])
+        fields = stock.get_fields(["latestPrice", "beta"])
+        symbols = fields["symbol"]
+        assert symbols == ["AAPL", "TSLA"]
+        assert fields["latestPrice"] == [
+            stock.data_set[s]["quote"]["latestPrice"] for s in symbols]
+        assert fields["beta"] == [
+            stock.data_set[s]["stats"]["beta"] for s in symbols]
+
+    def test_get_fields_pandas(self, standin):
+        stock = Stock(["AAPL", "TSLA"], output_format="pandas")
+        df = stock.get_fields(["companyName", "shortRatio"])
+        assert isinstance(df, pd.DataFrame)
+        assert list(df.columns) == ["companyName", "shortRatio"]
+        assert df.loc["TSLA", "companyName"] == "TSLA Inc."
+
+    def test_get_fields_endpoint(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        fields = stock.get_fields("companyName", endpoint="stats")
+        assert fields["companyName"] == ["AAPL Inc.", "TSLA Inc."]
+        assert requested_types(standin) == [["stats"]]
+
+    def test_get_fields_compact(self, standin):
+        plain = Stock(["AAPL", "TSLA"], lazy=True)
+        stock = Stock(["AAPL", "TSLA"], lazy=True, compact=True)
+        fields = stock.get_fields("financials", endpoint="financials")
+        assert type(fields["financials"][0]) is list
+        assert fields == plain.get_fields("financials",
+                                          endpoint="financials")
+
+    def test_get_fields_lazy(self, standin):
+        stock = Stock(["AAPL", "TSLA"], lazy=True)
+        stock.get_fields(["open"])
+        assert requested_types(standin) == [["quote"]]
+
+    def test_invalid(self, standin):
+        stock = Stock(["AAPL", "TSLA"])
+        with pytest.raises(IEXFieldError):
+            stock.get_fields(["notAField"])
+        with pytest.raises(IEXEndpointError):
+            stock.get_fields(["open"], endpoint="notAnEndpoint")
+
+
+class TestTypedFrames(object):
+
+    def test_quote(self, standin):
+        stock = Stock(["AAPL", "TSLA"], output_format="pandas")
+        df = stock.get_quote()
+        assert list(df.index) == ["AAPL", "TSLA"]
+        assert df.loc["TSLA", "companyName"] == "TSLA Inc."
+        assert df["latestPrice"].dtype == "float64"
+        assert df["marketCap"].dtype == "int64"
+        assert df["sector"].dtype == "category"
+
+    def test_share(self, standin):
+        df = Stock("AAPL", output_format="pandas").get_key_stats()
+        assert list(df.index) == ["AAPL"]
+        assert df["sharesOutstanding"].dtype == "int64"
+
+    def test_ohlc(self, standin):
+        df = Stock(["AAPL", "TSLA"], output_format="pandas").get_ohlc()
+        assert df["open"].dtype == "float64"
+        assert df["openTime"].dtype.kind == "M"
+
+    def test_without_schema(self, standin):
+        stock = Stock(["AAPL", "TSLA"], output_format="pandas")
+        assert list(stock.get_news().columns) == ["AAPL", "TSLA"]
+
+
+class TestChartFrames(object):
+
+    def test_get_chart(self, standin):
+        stock = Stock(["AAPL", "TSLA"], output_format="pandas")
+        df = stock.get_chart()
+        assert df.index.names == ["symbol", "date"]
+        assert set(df.index.get_level_values("symbol")) == {"AAPL", "TSLA"}
+        assert len(df) == sum(len(stock.data_set[s]["chart"])
+                              for s in ["AAPL", "TSLA"])
+        assert df["close"].dtype == "float64"
+
+    def test_time_series_wide(self, standin):
+        stock = Stock(["AAPL", "TSLA"], output_format="pandas")
+        df = stock.get_time_series(layout="wide")
+        assert df.columns.names == [None, "symbol"]
+        assert ("close", "TSLA") in df.columns
+
+    def test_historical(self, standin):
+        end = datetime.today()
+        start = end - timedelta(days=14)
+        df = get_historical_data(["AAPL", "TSLA"], start, end,
+                                 output_format="pandas", layout="long")
+        assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+        dates = df.index.get_level_values("date")
+        assert dates.min() >= pd.Timestamp(start.date())
+        legacy = get_historical_data(["AAPL", "TSLA"], start, end,
+                                     output_format="pandas")
+        assert len(df.loc["TSLA"]) == len(legacy["TSLA"])
+        assert df.loc["TSLA"]["close"].tolist() == \
+            legacy["TSLA"]["close"].tolist()
+
+    def test_historical_wide(self, standin):
+        end = datetime.today()
+        start = end - timedelta(days=14)
+        df = get_historical_data("AAPL", start, end, output_format="pandas",
+                                 layout="wide")
+        assert list(df.columns.get_level_values("symbol").unique()) == \
+            ["AAPL"]
+
+    def test_invalid_layout(self):
+        with pytest.raises(ValueError):
+            get_historical_data("AAPL", datetime(2017, 1, 1),
+                                datetime(2017, 2, 1), layout="panel")
+
+
+class TestCompactDataSet(object):
+
+    syms = ["AAPL", "TSLA", "MSFT"]
+
+    def test_compact(self, standin):
+        plain = StockReader(self.syms)
+        reader = StockReader(self.syms, compact=True)
+        assert reader.get_chart() == plain.get_chart()
+        assert type(reader.get_news()["AAPL"]) is list
+        assert reader.get_all() == plain.get_all()
+        report = reader.memory_report()
+        assert sorted(report) == sorted(StockReader._ENDPOINTS)
+        assert sum(report.values()) < sum(plain.memory_report().values())
+
+    def test_memory_budget(self, standin):
+        reader = StockReader(self.syms, lazy=True, memory_budget=0)
+        reader.get_chart()
+        reader.get_quote()
+        # The least recently used endpoint is dropped
+        assert list(reader.memory_report()) == ["quote"]
+        assert "chart" not in reader.data_set["AAPL"]
+        assert len(reader.get_chart()["AAPL"]) > 0
+        assert len(standin.paths) == 3
+
+    def test_budget_keeps_fields_endpoints(self, standin):
+        reader = StockReader(self.syms, lazy=True, memory_budget=1)
+        fields = reader.get_fields(["latestPrice", "beta"])
+        assert len(fields["latestPrice"]) == len(fields["beta"]) == 3
+
+    def test_budget_eager(self, standin):
+        reader = StockReader(self.syms, memory_budget=1)
+        # The endpoints downloaded at construction are kept
+        assert sorted(reader.memory_report()) == sorted(StockReader._ENDPOINTS)
+        reader.get_quote()
+        assert len(standin.paths) == 2
+        reader.refresh()
+        assert len(reader.memory_report()) == len(StockReader._ENDPOINTS)
+
+    def test_budget_keeps_recent(self, standin):
+        reader = StockReader(self.syms, lazy=True, memory_budget=10 ** 9)
+        reader.get_chart()
+        reader.get_quote()
+        assert sorted(reader.memory_report()) == ["chart", "quote"]
+
+
+class TestFilter(object):
+
+    fields = ["latestPrice", "latestVolume", "change"]
+
+    def test_all_endpoints(self, standin):
+        reader = Stock(["AAPL", "TSLA"], lazy=True,
+                       filter=",".join(self.fields))
+        quote = reader.get_quote()
+        assert sorted(quote["AAPL"]) == sorted(self.fields)
+        assert standin.paths[0].endswith(
+            "filter=latestPrice,latestVolume,change")
+
+    def test_per_endpoint(self, standin):
+        reader = Stock(["AAPL", "TSLA"], lazy=True,
+                       filter={"quote": self.fields, "stats": ["beta"]})
+        reader.require(["company", "stats"])
+        reader.get_quote()
+        paths = sorted(standin.paths)
+        assert len(paths) == 2
+        assert paths[0].endswith("types=company")
+        assert "types=quote,stats&filter=latestPrice" in paths[1]
+        assert sorted(reader.data_set["AAPL"]["stats"]) == ["beta"]
+        assert "companyName" in reader.data_set["AAPL"]["company"]
+        with pytest.raises(IEXFieldError):
+            reader.get_company_name()
+
+    def test_typed_frame(self, standin):
+        df = Stock(["AAPL", "TSLA"], output_format="pandas", lazy=True,
+                   filter={"quote": self.fields}).get_quote()
+        assert list(df.columns) == ["latestPrice", "latestVolume",
+                                    "change"]
+
+    def test_invalid_endpoint(self):
+        with pytest.raises(IEXEndpointError):
+            Stock("AAPL", lazy=True, filter={"quotes": ["latestPrice"]})
+
+    def test_invalid_type(self):
+        # Only stock readers take the fields of each endpoint
+        with pytest.raises(ValueError):
+            get_market_tops("AAPL", filter={"symbol": 1})
+        with pytest.raises(ValueError):
+            HistoricalReader("AAPL", datetime(2017, 1, 1),
+                             datetime(2017, 2, 1), filter={"chart": ["close"]})
+        with pytest.raises(ValueError):
+            Stock("AAPL", lazy=True, filter=1)
+
+    def test_historical(self):
+        with pytest.raises(ValueError):
+            get_historical_data("AAPL", datetime(2017, 1, 1),
+                                datetime(2017, 2, 1), filter="close")
+
+
+class TestHistoricalOutput(object):
+
+    bars = [{"date": "2017-01-%02d" % day, "open": 1.5, "high": 2.0,
+             "low": 1.0, "close": float(day), "volume": 100 * day,
+             "label": "Jan %d" % day} for day in (5, 3, 9, 4, 10, 2)]
+
+    def output(self, output_format, symbols="AAPL"):
+        reader = HistoricalReader(symbols, datetime(2017, 1, 3),
+                                  datetime(2017, 1, 9, 16), output_format)
+        syms = symbols if isinstance(symbols, list) else [symbols]
+        return reader._output_format(dict((s, {"chart": list(self.bars)})
+                                          for s in syms))
+
+    def test_json(self):
+        data = self.output("json")
+        assert sorted(data["AAPL"]) == ["2017-01-03", "2017-01-04",
+                                        "2017-01-05", "2017-01-09"]
+        assert data["AAPL"]["2017-01-09"] == {
+            "open": 1.5, "high": 2.0, "low": 1.0, "close": 9.0,
+            "volume": 900}
+
+    def test_pandas(self):
+        df = self.output("pandas")
+        assert isinstance(df.index, pd.DatetimeIndex)
+        assert df.index.name == "date"
+        assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+        assert df["close"].tolist() == [3.0, 4.0, 5.0, 9.0]
+        assert df["volume"].dtype == "int64"
+        assert df.loc["2017-01-04", "close"] == 4.0
+
+    def test_batch(self):
+        data = self.output("pandas", ["AAPL", "TSLA"])
+        assert sorted(data) == ["AAPL", "TSLA"]
+        assert data["AAPL"].equals(data["TSLA"])
+
+    def test_empty(self):
+        reader = HistoricalReader("AAPL", datetime(2017, 1, 3),
+                                  datetime(2017, 1, 9), "pandas")
+        df = reader._output_format({"AAPL": {"chart": []}})
+        assert df.empty
+        assert list(df.columns) == ["open", "high", "low", "close", "volume"]
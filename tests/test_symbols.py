@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from iexfinance import Stock, get_historical_data
+from iexfinance.base import _IEXBase
+from iexfinance.stock import StockReader
+from iexfinance.utils.exceptions import IEXQueryError, IEXSymbolError
+from iexfinance.utils.standin import StandInServer
+from iexfinance.utils.symbols import (SymbolIndex, disable_symbol_index,
+                                      enable_symbol_index, get_symbol_index)
+
+
+@pytest.fixture
+def index(tmpdir):
+    return SymbolIndex(str(tmpdir.join("symbols.json")))
+
+
+class TestSymbolIndex(object):
+
+    def test_lookup(self, standin, index):
+        assert len(index) == 100
+        assert "SYM42" in index
+        assert " sym42 " in index
+        assert "BADSYMBOL" not in index
+        assert index.get("SYM7")["name"] == "Company 7"
+        assert index.get("BADSYMBOL") is None
+        assert len(standin.paths) == 1
+
+    def test_search(self, standin, index):
+        assert index.search("sym9") == ["SYM9"] + ["SYM9%d" % i
+                                                   for i in range(10)]
+        assert index.search("SYM1", limit=3) == ["SYM1", "SYM10", "SYM11"]
+        assert index.search("X") == []
+
+    def test_normalize(self, tmpdir):
+        path = str(tmpdir.join("symbols.json"))
+        with open(path, "w") as f:
+            json.dump({"updated": time.time(),
+                       "symbols": [{"symbol": "BRK.B"}]}, f)
+        index = SymbolIndex(path)
+        assert index.normalize("brk-b") == "BRK.B"
+        assert index.normalize("BRK/B") == "BRK.B"
+        assert index.validate(["brk.b", "BRK-A"]) == (["BRK.B"], ["BRK-A"])
+
+    def test_persisted(self, standin, index):
+        assert "SYM1" in index
+        warm = SymbolIndex(index.path)
+        assert "SYM2" in warm
+        assert warm.updated == index.updated
+        assert len(standin.paths) == 1
+
+    def test_periodic_refresh(self, standin, index):
+        index.max_age = 60
+        assert "SYM1" in index
+        index.updated -= 61
+        assert "SYM1" in index
+        assert len(standin.paths) == 2
+        assert time.time() - index.updated < 60
+
+    def test_stale_on_failure(self, index):
+        with StandInServer():
+            assert "SYM1" in index
+        index.updated -= 2 * 86400
+        with StandInServer(error_rate=1.0, error_status=404):
+            assert "SYM1" in index
+        os.remove(index.path)
+        with StandInServer(error_rate=1.0, error_status=404):
+            with pytest.raises(IEXQueryError):
+                len(SymbolIndex(index.path))
+
+    def test_stale_offline(self, index, monkeypatch):
+        with StandInServer():
+            assert "SYM1" in index
+        index.options = {"retry_count": 0}
+        index.updated -= 2 * 86400
+        monkeypatch.setattr(_IEXBase, "_IEX_API_URL",
+                            "http://127.0.0.1:1/1.0/")
+        assert "SYM1" in index
+        # No other attempt before the retry delay
+        assert index._failed_at is not None
+        assert not index._stale()
+
+    def test_single_download(self, index):
+        with StandInServer(latency=0.2) as server:
+            threads = [threading.Thread(target=len, args=(index,))
+                       for _ in range(5)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert len(server.paths) == 1
+
+    def test_process_wide(self, tmpdir):
+        index = enable_symbol_index(str(tmpdir.join("symbols.json")))
+        assert get_symbol_index() is index
+        disable_symbol_index()
+        assert get_symbol_index() is None
+
+
+class TestReaderValidation(object):
+
+    def test_stock(self, standin, index):
+        with pytest.raises(IEXSymbolError):
+            Stock(["SYM1", "BADSYMBOL"], symbol_index=index)
+        # Only the symbol list was downloaded
+        assert len(standin.paths) == 1
+        reader = Stock(["sym1", "sym2"], symbol_index=index, lazy=True)
+        assert reader.symbols == ["SYM1", "SYM2"]
+
+    def test_stock_partial(self, standin, index):
+        symbols = ["SYM%d" % (i % 100) for i in range(150)] + ["BADSYMBOL"]
+        reader = StockReader(symbols, symbol_index=index, lazy=True)
+        assert "BADSYMBOL" not in reader.symbols
+        assert [f[0] for f in reader.failures] == [["BADSYMBOL"]]
+        reader.get_price()
+        assert [f[0] for f in reader.failures] == [["BADSYMBOL"]]
+
+    def test_historical(self, standin, index):
+        start = datetime.now() - timedelta(days=10)
+        with pytest.raises(IEXSymbolError):
+            get_historical_data(["SYM1", "BADSYMBOL"], start, datetime.now(),
+                                symbol_index=index)
+        data = get_historical_data("sym1", start, datetime.now(),
+                                   symbol_index=index)
+        assert list(data) == ["SYM1"]
+
+    def test_process_wide(self, standin, tmpdir):
+        enable_symbol_index(str(tmpdir.join("symbols.json")))
+        try:
+            with pytest.raises(IEXSymbolError):
+                Stock("BADSYMBOL")
+            assert Stock("SYM1", symbol_index=False, lazy=True)
+        finally:
+            disable_symbol_index()
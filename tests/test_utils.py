@@ -0,0 +1,54 @@
+import pytest
+
+from iexfinance import TOPS
+from iexfinance.utils import (_init_session, configure_transport,
+                              get_transport_stats, reset_transport)
+
+
+class TestTransport(object):
+
+    def teardown_method(self):
+        reset_transport()
+
+    def test_shared_session(self):
+        a = TOPS()
+        b = TOPS("AAPL")
+        assert a.session is b.session
+
+    def test_retry_count_session(self):
+        a = TOPS()
+        b = TOPS(retry_count=5)
+        assert a.session is not b.session
+        assert b.session.get_adapter("https://").max_retries.total == 5
+
+    def test_user_session_kept(self):
+        import requests
+        session = requests.session()
+        assert _init_session(session) is session
+        assert TOPS(session=session).session is session
+
+    def test_configure_transport(self):
+        configure_transport(pool_maxsize=25, keep_alive=False)
+        session = TOPS().session
+        adapter = session.get_adapter("https://")
+        assert adapter._pool_maxsize == 25
+        assert session.headers["Connection"] == "close"
+
+    def test_configure_transport_invalid(self):
+        with pytest.raises(ValueError):
+            configure_transport(pool_size=5)
+
+    def test_configure_transport_new_session(self):
+        old = TOPS().session
+        configure_transport(pool_connections=2)
+        assert TOPS().session is not old
+
+    def test_transport_stats(self):
+        session = TOPS().session
+        adapter = session.get_adapter("https://")
+        adapter.poolmanager.connection_from_url(TOPS._IEX_API_URL)
+        stats = get_transport_stats()
+        assert len(stats) == 1
+        assert stats[0]["host"] == "https://api.iextrading.com:443"
+        assert stats[0]["maxsize"] == 10
+        assert stats[0]["num_requests"] == 0